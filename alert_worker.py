@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+TANZIM MS — headless alert worker (no Streamlit imports).
+
+Keeps every registered device's mirror current and, every --interval seconds, scores
+their newest readings against the owner's home-city weather (tanzim_alerts.tick). Alerts
+land in the journal as ALERT_AUTO entries whether or not anyone has the monitor open.
+Settings come from .streamlit/secrets.toml, overridden by environment variables.
+
+    python alert_worker.py
+    python alert_worker.py --interval 30 --sync-workers 8
+    python alert_worker.py --once
+"""
+import argparse, os, signal, threading, time, tomllib
+from concurrent.futures import ThreadPoolExecutor
+
+import tanzim_alerts, tanzim_db, tanzim_realtime, tanzim_sensors, tanzim_weather
+
+SECRETS_PATH = os.path.join(".streamlit", "secrets.toml")
+WEATHER_TTL_SEC = 10 * 60    # same revalidation age as the app; both share the weather store
+
+def load_settings(path: str = SECRETS_PATH) -> dict:
+    cfg = {}
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            cfg = tomllib.load(f)
+    for k in ("OPENWEATHER_API_KEY", "OPENWEATHER_CALLS_PER_MIN", "SUPABASE_URL", "SUPABASE_ANON_KEY",
+              "SENSOR_REALTIME", "SENSOR_RAW_RETENTION_DAYS"):
+        if os.environ.get(k):
+            cfg[k] = os.environ[k]
+    return cfg
+
+def weather_client(cfg: dict) -> tanzim_weather.WeatherClient:
+    """Same quota as the app (OPENWEATHER_CALLS_PER_MIN): over it, ticks get the last answer."""
+    calls = float(cfg.get("OPENWEATHER_CALLS_PER_MIN", 60))
+    return tanzim_weather.WeatherClient(cfg.get("OPENWEATHER_API_KEY", ""),
+                                        limiter=tanzim_weather.TokenBucket.per_minute(calls))
+
+class AlertWorker:
+    """
+    One tick: pull the registered devices (skipped for devices the realtime feed covers),
+    then one tanzim_alerts.tick over all of them. Pulls run on a small thread pool; the
+    scoring itself is a single NumPy pass and one write transaction.
+    """
+    def __init__(self, db, sync=None, weather=None, feed=None, sync_workers: int = 8,
+                 default_city: str = tanzim_alerts.DEFAULT_CITY):
+        self.db = db                    # tanzim_db.ConnectionManager
+        self.sync = sync                # tanzim_sensors.SensorSync, None = the app keeps the mirror current
+        self.weather = weather          # tanzim_weather.WeatherStore
+        self.feed = feed                # tanzim_realtime.RealtimeFeed or None
+        self.default_city = default_city
+        self._pool = ThreadPoolExecutor(max_workers=sync_workers, thread_name_prefix="tanzim-alert-sync")
+        self.last_error: str | None = None
+
+    def _pull(self, device_id: str):
+        try:
+            if self.feed is not None and self.feed.watch(device_id):
+                return 0
+            return self.sync.sync(device_id)
+        except Exception as e:
+            self.last_error = f"{device_id}: {e}"
+            return 0
+
+    def _weather(self, city: str):
+        if self.weather is None:
+            return None
+        data, err, _ = self.weather.get(city)
+        if err:
+            self.last_error = f"weather {city}: {err}"
+        return data
+
+    def run_once(self, now_ms: int | None = None) -> dict:
+        pulled = 0
+        if self.sync is not None:
+            pulled = sum(self._pool.map(self._pull, tanzim_alerts.devices(self.db.reader())))
+        stats = tanzim_alerts.tick(self.db, self._weather, now_ms, self.default_city)
+        stats["pulled"] = pulled
+        return stats
+
+    def run(self, interval: float, stop: threading.Event):
+        while not stop.is_set():
+            t0 = time.monotonic()
+            try:
+                s = self.run_once()
+                print(f"{time.strftime('%H:%M:%S')} devices={s['devices']} evaluated={s['evaluated']} "
+                      f"alerts={s['alerts']} pulled={s['pulled']} ({s.get('elapsed_ms', 0):.0f} ms)", flush=True)
+            except Exception as e:
+                print(f"{time.strftime('%H:%M:%S')} tick failed: {e}", flush=True)
+            if self.last_error:
+                print(f"  last error: {self.last_error}", flush=True)
+                self.last_error = None
+            stop.wait(max(0.0, interval - (time.monotonic() - t0)))
+
+    def close(self):
+        self._pool.shutdown(wait=False)
+        if self.feed is not None:
+            self.feed.close()
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--db", default=tanzim_db.DB_PATH)
+    ap.add_argument("--interval", type=float, default=30.0, help="seconds between ticks")
+    ap.add_argument("--sync-workers", type=int, default=8, help="parallel Supabase pulls")
+    ap.add_argument("--no-sync", action="store_true", help="only evaluate; another process keeps the mirror")
+    ap.add_argument("--once", action="store_true", help="run one tick and exit")
+    a = ap.parse_args()
+
+    cfg = load_settings()
+    db = tanzim_db.ConnectionManager(a.db)
+    sync = feed = None
+    if not a.no_sync and cfg.get("SUPABASE_URL"):
+        from supabase import create_client
+        retention = float(cfg.get("SENSOR_RAW_RETENTION_DAYS", 14))
+        sync = tanzim_sensors.SensorSync(db, create_client(cfg["SUPABASE_URL"], cfg.get("SUPABASE_ANON_KEY", "")),
+                                         min_interval=min(a.interval, 30.0), raw_retention_days=retention or None)
+        if str(cfg.get("SENSOR_REALTIME", True)).lower() not in ("0", "false") and not a.once:
+            feed = tanzim_realtime.RealtimeFeed(sync, tanzim_realtime.realtime_url(cfg["SUPABASE_URL"]),
+                                                cfg.get("SUPABASE_ANON_KEY", ""))
+    weather = tanzim_weather.WeatherStore(db, weather_client(cfg), ttl=WEATHER_TTL_SEC)
+    worker = AlertWorker(db, sync, weather, feed, a.sync_workers)
+    try:
+        if a.once:
+            print(worker.run_once())
+        else:
+            stop = threading.Event()
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(sig, lambda *_: stop.set())
+            worker.run(a.interval, stop)
+    finally:
+        worker.close()
+        weather.close()
+        weather.client.close()
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+TANZIM MS — risk-model backtest (no Streamlit imports).
+
+Replays sensor history joined with weather through one of the two risk models and the
+Uhthoff latch, and reports what would have fired: Uhthoff episodes (the monitor's
+journaled alert), escalations to High+ (the alert worker's rule), time in each status,
+how often the status flaps, and evaluation throughput (NumPy batch vs the scalar
+functions, which must agree on every point).
+
+    minimal  compute_risk_minimal + apply_uhthoff_floor (the live monitor)
+    full     compute_risk with optional logged triggers / symptoms
+
+History comes from the local mirror (--db/--device, opened read-only; the database must
+already exist) or from the synthetic generator.
+Weather is joined as-of (the newest observation at most --weather-max-age h older than
+each reading) from the observations the app stored for a city (--weather-city), from a
+CSV with time, feels_like, humidity columns, or held constant.
+
+    python backtest.py --synthetic --days 30
+    python backtest.py --synthetic --model full --triggers Exercise "Direct sun exposure"
+    python backtest.py --db tanzim_ms.db --device esp8266-01 --days 14 --weather-city "Abu Dhabi,AE"
+    python backtest.py --db tanzim_ms.db --device esp8266-01 --days 14 --weather-csv auh.csv
+"""
+import argparse, os, sqlite3, time
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+import tanzim_alerts, tanzim_db, tanzim_episodes, tanzim_risk, tanzim_rollup, tanzim_sensors, tanzim_weather
+
+MODELS = ("minimal", "full")
+FLAP_RUN_MS = 5 * 60_000       # a status that lasts less than this counts as a flap
+
+class Replay(NamedTuple):
+    t_ms: np.ndarray          # int64, sorted
+    core: np.ndarray          # float64, NaN = missing
+    feels_like: np.ndarray    # float64, NaN = no weather
+    humidity: np.ndarray
+
+# ================== SOURCES ==================
+def synthetic_weather(t0_ms: int, days: float, seed: int = 0):
+    """Hourly Gulf-summer observations: feels-like peaking mid-afternoon, humidity at dawn."""
+    rnd = np.random.default_rng(seed)
+    t = t0_ms + np.arange(int(days * 24) + 1, dtype=np.int64) * 3_600_000
+    hour = (t // 3_600_000 + 4) % 24                       # Gulf local time (UTC+4)
+    day_heat = rnd.normal(0, 1.5, len(t) // 24 + 1).repeat(24)[:len(t)]
+    fl = 35 + 8 * np.sin((hour - 9) / 24 * 2 * np.pi) + day_heat + rnd.normal(0, 0.8, len(t))
+    hum = np.clip(55 - 25 * np.sin((hour - 9) / 24 * 2 * np.pi) + rnd.normal(0, 6, len(t)), 5, 100)
+    return t, np.round(fl, 1), np.round(hum, 0)
+
+def synthetic(days: float, step_s: float = 10, seed: int = 0, baseline: float = tanzim_risk.DEFAULT_BASELINE,
+              t0_ms: int = 1_719_792_000_000) -> Replay:
+    """Readings every step_s with noise, warm afternoons, Uhthoff excursions, device-off gaps and NaNs."""
+    rnd = np.random.default_rng(seed)
+    n = int(days * 86400 / step_s)
+    t = t0_ms + np.arange(n, dtype=np.int64) * int(step_s * 1000)
+    for g in rnd.choice(n, size=max(1, int(days)), replace=False):
+        t[g:] += int(rnd.choice([5, 45, 180])) * 60_000          # device off for a while
+    hour = (t // 3_600_000 + 4) % 24
+    core = baseline + 0.15 * np.sin((hour - 9) / 24 * 2 * np.pi) + rnd.normal(0, 0.05, n)
+    for s in rnd.choice(max(1, n - 600), size=max(1, int(days * 2)), replace=False):
+        core[s:s + rnd.integers(30, 600)] += rnd.uniform(0.35, 1.3)
+    core[rnd.choice(n, size=n // 200, replace=False)] = np.nan
+    wt, fl, hum = synthetic_weather(t0_ms, (t[-1] - t0_ms) / 86_400_000 + 1, seed + 1)
+    return join_weather(t, np.round(core, 2), wt, fl, hum)
+
+def load_history(db_path: str, device_id: str, days: float) -> tuple[np.ndarray, np.ndarray]:
+    """(t_ms, core) of the device's raw readings in the mirror over the last `days`."""
+    conn = tanzim_db.connect_readonly(db_path)
+    try:
+        s = tanzim_sensors.history(conn, device_id, int((time.time() - days * 86400) * 1000))
+    finally:
+        conn.close()
+    return s.t_ms, s.core.astype(np.float64)
+
+def load_weather_store(db_path: str, city: str):
+    """(t_ms, feels_like, humidity) of every observation stored for the city (tanzim_weather)."""
+    conn = tanzim_db.connect_readonly(db_path)
+    try:
+        return tanzim_weather.history(conn, city)
+    finally:
+        conn.close()
+
+def load_weather_csv(path: str):
+    """(t_ms, feels_like, humidity) from a CSV with a time (ISO or epoch s) column."""
+    df = pd.read_csv(path)
+    col = next(c for c in ("time", "dt", "at", "date") if c in df.columns)
+    ts = df[col]
+    if pd.api.types.is_numeric_dtype(ts):
+        t = ts.to_numpy(np.int64) * 1000
+    else:
+        t = tanzim_sensors.epoch_ms(ts.astype(str).tolist())
+    order = np.argsort(t, kind="stable")
+    return (t[order], df["feels_like"].to_numpy(np.float64)[order],
+            df["humidity"].to_numpy(np.float64)[order])
+
+def join_weather(t_ms, core, w_t, fl, hum, max_age_ms: int = 3 * 3_600_000) -> Replay:
+    """As-of join: each reading takes the newest observation not after it, if fresh enough."""
+    i = np.searchsorted(w_t, t_ms, side="right") - 1
+    ok = (i >= 0) & (t_ms - w_t[np.maximum(i, 0)] <= max_age_ms)
+    pick = lambda a: np.where(ok, np.asarray(a, dtype=np.float64)[np.maximum(i, 0)], np.nan)
+    return Replay(np.asarray(t_ms, dtype=np.int64), np.asarray(core, dtype=np.float64), pick(fl), pick(hum))
+
+# ================== EVALUATION ==================
+def evaluate(r: Replay, model: str, baseline: float, extra: float = 0.0) -> tanzim_risk.RiskArrays:
+    if model == "minimal":
+        return tanzim_risk.assess(r.feels_like, r.humidity, r.core, baseline)
+    return tanzim_risk.assess_full(r.feels_like, r.humidity, r.core, baseline, extra)
+
+def evaluate_scalar(r: Replay, model: str, baseline: float, triggers=(), symptoms=()) -> np.ndarray:
+    """Levels from the scalar functions, one call per reading."""
+    none = lambda v: None if v != v else v
+    out = np.empty(len(r.t_ms), dtype=np.int8)
+    for k, (f, h, c) in enumerate(zip(r.feels_like.tolist(), r.humidity.tolist(), r.core.tolist())):
+        f, h, c = none(f), none(h), none(c)
+        if model == "minimal":
+            risk = tanzim_risk.apply_uhthoff_floor(tanzim_risk.compute_risk_minimal(f, h, c, baseline), c, baseline)
+        else:
+            risk = tanzim_risk.compute_risk(f, h, c, baseline, list(triggers), list(symptoms))
+        out[k] = tanzim_risk.STATUS_LEVEL[risk["status"]]
+    return out
+
+def summarize(r: Replay, risk: tanzim_risk.RiskArrays, baseline: float) -> dict:
+    """Alert counts, hours per status and flapping for one replay."""
+    t, level = r.t_ms, risk.level
+    dt = np.clip(np.diff(t, prepend=t[:1]), 0, tanzim_rollup.GAP_CAP_MS)   # as the rollups count time
+    covered_h = dt.sum() / 3.6e6
+    hours = np.bincount(level, weights=dt, minlength=len(tanzim_risk.STATUSES)) / 3.6e6
+    prev = np.r_[-1, level[:-1]]
+    escalations = int(((level >= tanzim_alerts.ALERT_LEVEL) & (level > prev)).sum())
+    active, begin, _, _, _ = tanzim_episodes.latch(t, r.core - baseline)
+    spans = tanzim_risk.runs(t, level)
+    short = sum(1 for a, b, _ in spans[:-1] if b - a < FLAP_RUN_MS)
+    changes = len(spans) - 1
+    return {
+        "readings": len(t), "covered_h": covered_h,
+        "hours": dict(zip(tanzim_risk.STATUSES, hours.tolist())),
+        "uhthoff_episodes": int(begin.sum()), "uhthoff_h": float(dt[active].sum() / 3.6e6),
+        "risk_alerts": escalations, "floored": int(risk.floored.sum()),
+        "changes": changes, "changes_per_h": changes / covered_h if covered_h else 0.0,
+        "flaps": short, "flap_share": short / changes if changes else 0.0,
+        "weather_missing": int(np.isnan(r.feels_like).sum()),
+    }
+
+def run(r: Replay, model: str, baseline: float, triggers=(), symptoms=(), scalar_limit: int = 200_000) -> dict:
+    extra = tanzim_risk.trigger_score(list(triggers), list(symptoms))
+    t0 = time.perf_counter()
+    risk = evaluate(r, model, baseline, extra)
+    batch_s = time.perf_counter() - t0
+    rep = summarize(r, risk, baseline)
+    k = min(len(r.t_ms), scalar_limit)
+    sub = Replay(*(a[:k] for a in r))
+    t0 = time.perf_counter()
+    ref = evaluate_scalar(sub, model, baseline, triggers, symptoms)
+    scalar_s = time.perf_counter() - t0
+    rep.update(model=model, batch_per_s=len(r.t_ms) / batch_s if batch_s else float("inf"),
+               scalar_per_s=k / scalar_s if scalar_s else float("inf"), checked=k,
+               agree=bool(np.array_equal(ref, risk.level[:k])))
+    return rep
+
+def print_report(rep: dict):
+    print(f"model={rep['model']}: {rep['readings']:,} readings over {rep['covered_h']:,.1f} h "
+          f"({rep['weather_missing']:,} without weather)")
+    print("  time in status: " + ", ".join(f"{s} {h:,.1f} h ({h / rep['covered_h']:.0%})"
+                                          for s, h in rep["hours"].items() if rep["covered_h"]))
+    print(f"  alerts: {rep['uhthoff_episodes']} Uhthoff episodes ({rep['uhthoff_h']:.1f} h latched), "
+          f"{rep['risk_alerts']} escalations to High+; {rep['floored']:,} readings raised by the floor")
+    print(f"  flapping: {rep['changes']:,} status changes ({rep['changes_per_h']:.2f}/h), "
+          f"{rep['flaps']:,} runs shorter than {FLAP_RUN_MS // 60_000} min ({rep['flap_share']:.0%})")
+    print(f"  throughput: batch {rep['batch_per_s']:,.0f} readings/s, scalar {rep['scalar_per_s']:,.0f} readings/s; "
+          f"scalar == batch on {rep['checked']:,} readings: {rep['agree']}")
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--model", choices=MODELS + ("both",), default="both")
+    ap.add_argument("--synthetic", action="store_true", help="generate readings + weather instead of --db")
+    ap.add_argument("--db", help="existing app database to replay (required without --synthetic)")
+    ap.add_argument("--device", default="esp8266-01")
+    ap.add_argument("--days", type=float, default=30)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--baseline", type=float, default=tanzim_risk.DEFAULT_BASELINE)
+    ap.add_argument("--weather-city", help="join the weather observations stored in --db for this city")
+    ap.add_argument("--weather-csv", help="time, feels_like, humidity per observation")
+    ap.add_argument("--weather-max-age", type=float, default=3, help="hours an observation stays valid")
+    ap.add_argument("--feels-like", type=float, help="constant weather when there is no CSV")
+    ap.add_argument("--humidity", type=float)
+    ap.add_argument("--triggers", nargs="*", default=[], help="full model: triggers held for the whole replay")
+    ap.add_argument("--symptoms", type=int, default=0, help="full model: number of symptoms held")
+    ap.add_argument("--scalar-limit", type=int, default=200_000, help="readings timed/checked with the scalar loop")
+    a = ap.parse_args()
+
+    if a.synthetic:
+        r = synthetic(a.days, seed=a.seed, baseline=a.baseline)
+    else:
+        if not a.db:
+            ap.error("--db is required without --synthetic")
+        if not os.path.isfile(a.db):
+            ap.error(f"no database at {a.db}")
+        try:
+            t, core = load_history(a.db, a.device, a.days)
+            if not len(t):
+                ap.error(f"no readings for {a.device} in the last {a.days:g} days of {a.db}")
+            if a.weather_city:
+                wt, fl, hum = load_weather_store(a.db, a.weather_city)
+            elif a.weather_csv:
+                wt, fl, hum = load_weather_csv(a.weather_csv)
+            else:
+                wt = np.array([t[0]], dtype=np.int64)
+                fl, hum = [np.nan if a.feels_like is None else a.feels_like], [np.nan if a.humidity is None else a.humidity]
+        except sqlite3.Error as e:
+            ap.error(f"cannot read {a.db}: {e}")
+        joined = a.weather_city or a.weather_csv
+        r = join_weather(t, core, wt, fl, hum, int(a.weather_max_age * 3.6e6) if joined else np.inf)
+    symptoms = [f"symptom {i + 1}" for i in range(a.symptoms)]
+    for model in (MODELS if a.model == "both" else (a.model,)):
+        print_report(run(r, model, a.baseline, a.triggers, symptoms, a.scalar_limit))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Headless alert evaluation (tanzim_alerts.tick, as run by alert_worker.py) over thousands
+of registered devices: one snapshot query, one NumPy scoring pass, one write transaction.
+Compares the statuses with a per-device loop (latest reading + open episode + prefs
+queries, compute_risk_minimal + apply_uhthoff_floor), then checks deduplication: a repeat
+tick, a tick with the alert state wiped, and a tick after one new reading per device.
+
+    python -m benchmarks.bench_alert_worker
+    python -m benchmarks.bench_alert_worker --devices 20000 --cities 12
+"""
+import argparse, os, tempfile, time
+from datetime import datetime, timezone
+
+import numpy as np
+
+import tanzim_alerts, tanzim_db, tanzim_episodes, tanzim_risk, tanzim_sensors, tanzim_weather
+
+STEP_MS = 10_000
+
+def _iso(ms):
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc).isoformat(timespec="milliseconds")
+
+def _seed(db, devices, cities, readings, now_ms, rnd):
+    city = [f"City{c},AE" for c in range(cities)]
+    with db.transaction() as conn:
+        for d in range(devices):
+            dev, user = f"dev-{d:05d}", f"user-{d:05d}"
+            conn.execute("INSERT INTO users(username, password) VALUES (?, 'x')", (user,))
+            conn.execute("INSERT INTO user_prefs(username, home_city) VALUES (?,?)", (user, city[d % cities]))
+            tanzim_alerts.register_device(conn, user, dev)
+            if d % 10 == 0:                                          # a carer watching the same device
+                tanzim_alerts.register_device(conn, "carer", dev)
+            tanzim_sensors.set_baseline(conn, dev, round(float(rnd.normal(36.9, 0.2)), 1))
+            stale = d % 25 == 0                                     # device switched off an hour ago
+            end = now_ms - (3_600_000 if stale else int(rnd.integers(0, 60_000)))
+            t = end - np.arange(readings)[::-1] * STEP_MS
+            core = np.round(37.0 + rnd.normal(0, 0.15) + rnd.normal(0, 0.05, readings), 2)
+            if rnd.random() < 0.15:
+                core[-rnd.integers(3, readings):] += rnd.uniform(0.5, 1.4)    # Uhthoff rise
+            tanzim_sensors.store_rows(conn, dev, [{"created_at": _iso(a), "core_c": c, "peripheral_c": 33.0}
+                                                  for a, c in zip(t.tolist(), core.tolist())])
+        conn.execute("INSERT INTO users(username, password) VALUES ('carer', 'x')")
+    return city
+
+def reference(conn, weather_for, now_ms):
+    """Per-registration queries + the scalar model, as a per-device loop would do it."""
+    out = {}
+    for user, dev in conn.execute("SELECT username, device_id FROM user_devices").fetchall():
+        prefs = tanzim_db.read_user_prefs(conn, user)
+        w = weather_for(prefs.get("home_city") or tanzim_alerts.DEFAULT_CITY)
+        row = conn.execute("SELECT t_ms, core_c FROM sensor_readings WHERE device_id=? ORDER BY t_ms DESC LIMIT 1",
+                           (dev,)).fetchone()
+        base = conn.execute("SELECT baseline FROM sensor_sync WHERE device_id=?", (dev,)).fetchone()[0]
+        tanzim_episodes.open_episode(conn, dev)
+        if row is None or now_ms - row[0] > tanzim_alerts.STALE_MS:
+            continue
+        r = tanzim_risk.compute_risk_minimal(w["feels_like"], w["humidity"], row[1], base)
+        r = tanzim_risk.apply_uhthoff_floor(r, row[1], base)
+        out[(user, dev)] = tanzim_risk.STATUS_LEVEL[r["status"]]
+    return out
+
+def run(devices, cities, readings, seed):
+    rnd = np.random.default_rng(seed)
+    now_ms = int(time.time() * 1000)
+    with tempfile.TemporaryDirectory() as tmp:
+        db = tanzim_db.ConnectionManager(os.path.join(tmp, "alerts.db"))
+        t = time.perf_counter()
+        city = _seed(db, devices, cities, readings, now_ms, rnd)
+        print(f"seeded {devices:,} devices x {readings} readings in {time.perf_counter() - t:.1f} s")
+        wx = {c: {"feels_like": float(rnd.uniform(30, 46)), "humidity": float(rnd.uniform(20, 80))}
+              for c in city + [tanzim_alerts.DEFAULT_CITY]}
+        weather = tanzim_weather.WeatherStore(db, None, fetch_fn=lambda c: {**wx[c], "temp": 0.0, "desc": ""})
+        weather_for = lambda c: weather.get(c)[0]
+
+        s = tanzim_alerts.tick(db, weather_for, now_ms)
+        conn = db.reader()
+        t = time.perf_counter()
+        ref = reference(conn, weather_for, now_ms)
+        loop_ms = (time.perf_counter() - t) * 1000
+        got = dict(((u, d), lv) for u, d, lv in conn.execute("SELECT username, device_id, level FROM alert_state"))
+        print(f"first tick: {s['devices']:,} registrations, {s['evaluated']:,} fresh, {s['cities']} cities, "
+              f"{s['alerts']:,} alerts journaled in {s['elapsed_ms']:.0f} ms; "
+              f"same status as the scalar model for every fresh device: {got == ref}")
+
+        again = tanzim_alerts.tick(db, weather_for, now_ms)
+        print(f"steady tick (nothing new): {again['elapsed_ms']:.0f} ms, "
+              f"{again['devices'] / again['elapsed_ms'] * 1000:,.0f} registrations/s, {again['alerts']} alerts; "
+              f"per-device loop without writes {loop_ms:.0f} ms ({loop_ms / again['elapsed_ms']:.1f}x)")
+        with db.transaction() as w:
+            w.execute("DELETE FROM alert_state")
+        replay = tanzim_alerts.tick(db, weather_for, now_ms)
+        print(f"  alert state wiped + replayed: {replay['alerts']} alerts")
+
+        later = now_ms + STEP_MS
+        with db.transaction() as w:
+            for d in range(devices):
+                dev = f"dev-{d:05d}"
+                core = 38.6 if d % 50 == 1 else 37.0
+                tanzim_sensors.store_rows(w, dev, [{"created_at": _iso(later), "core_c": core, "peripheral_c": 33.0}])
+        nxt = tanzim_alerts.tick(db, weather_for, later)
+        logged = conn.execute("SELECT COUNT(*) FROM alert_log").fetchone()[0]
+        journaled = conn.execute("SELECT COUNT(*) FROM journal WHERE entry LIKE '%ALERT_AUTO%'").fetchone()[0]
+        print(f"  one new reading per device: {nxt['alerts']} new alerts in {nxt['elapsed_ms']:.0f} ms; "
+              f"alert_log {logged:,} keys -> {journaled:,} journal entries")
+        db.close()
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--devices", type=int, default=5000)
+    ap.add_argument("--cities", type=int, default=8)
+    ap.add_argument("--readings", type=int, default=30, help="recent readings per device")
+    ap.add_argument("--seed", type=int, default=5)
+    a = ap.parse_args()
+    run(a.devices, a.cities, a.readings, a.seed)
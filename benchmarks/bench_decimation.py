@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+Chart payload and spike fidelity for the monitor's range selector: raw points vs
+tanzim_decimate.minmax (what the app uses) vs LTTB, at 10 s sampling.
+
+    python -m benchmarks.bench_decimation
+    python -m benchmarks.bench_decimation --buckets 800
+"""
+import argparse, json, time
+
+import numpy as np
+
+import tanzim_decimate
+
+RANGES = {"1h": 3600, "6h": 6 * 3600, "24h": 86400, "7d": 7 * 86400, "30d": 30 * 86400}
+
+def _series(seconds, seed=5):
+    rnd = np.random.default_rng(seed)
+    n = seconds // 10
+    t = np.arange(n, dtype=np.int64) * 10_000
+    y = (37.0 + 0.3 * np.sin(np.arange(n) / 900) + rnd.normal(0, 0.03, n)).astype(np.float32)
+    spikes = rnd.choice(n, size=max(1, n // 20_000), replace=False)
+    y[spikes] += 1.2                      # brief Uhthoff-range excursions
+    y[rnd.choice(n, size=n // 500, replace=False)] = np.nan   # dropped readings
+    return t, y, spikes
+
+def _bytes(t, y):
+    return len(json.dumps({"x": t.tolist(), "y": [None if np.isnan(v) else round(float(v), 2) for v in y]}))
+
+def run(buckets):
+    print(f"{'range':<5} {'raw pts':>8} {'raw KB':>8} | {'minmax pts':>10} {'KB':>6} {'ms':>6} {'spikes':>7} | "
+          f"{'lttb pts':>8} {'KB':>6} {'ms':>6} {'spikes':>7}")
+    for name, sec in RANGES.items():
+        t, y, spikes = _series(sec)
+        row = [name, len(t), _bytes(t, y) / 1024]
+        for fn in (lambda: tanzim_decimate.minmax(t, y, buckets), lambda: tanzim_decimate.lttb(t, y, 2 * buckets)):
+            s = time.perf_counter(); td, yd = fn(); ms = (time.perf_counter() - s) * 1000
+            kept = np.isin(t[spikes], td).sum()
+            row += [len(td), _bytes(td, yd) / 1024, ms, f"{kept}/{len(spikes)}"]
+        print("{:<5} {:>8} {:>8.1f} | {:>10} {:>6.1f} {:>6.2f} {:>7} | {:>8} {:>6.1f} {:>6.2f} {:>7}".format(*row))
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--buckets", type=int, default=600)
+    a = ap.parse_args()
+    run(a.buckets)
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Per-rerun cost of the monitor's live window when many sessions watch the same devices:
+each session parsing its own 240 Supabase rows (the old render_monitor path) vs reading
+views of the shared tanzim_sensors.DeviceRing.
+
+    python -m benchmarks.bench_device_buffer
+    python -m benchmarks.bench_device_buffer --devices 5 --viewers 50
+"""
+import argparse, time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+import tanzim_sensors
+
+def _rows(n, t0):
+    return [{"created_at": (t0 + timedelta(seconds=10 * i)).isoformat(), "core_c": 37.0 + (i % 7) * 0.05,
+             "peripheral_c": 33.0} for i in range(n)]
+
+def legacy_session(rows, tz):
+    times = [datetime.fromisoformat(r["created_at"].replace("Z", "+00:00")).astimezone(tz) for r in rows]
+    core = [float(r["core_c"]) if r.get("core_c") is not None else None for r in rows]
+    peri = [float(r["peripheral_c"]) if r.get("peripheral_c") is not None else None for r in rows]
+    return times, core, peri
+
+def ring_session(ring, n, tz):
+    w = ring.last(n)
+    return pd.to_datetime(w.t_ms, unit="ms", utc=True).tz_convert(tz), w.core, w.peripheral
+
+def run(devices, viewers, reruns, window):
+    tz = "Asia/Dubai"
+    t0 = datetime(2024, 7, 1, tzinfo=timezone.utc)
+    rows = {f"dev{d}": _rows(window, t0) for d in range(devices)}
+    rings = {}
+    t = time.perf_counter()
+    for dev, rs in rows.items():
+        rings[dev] = tanzim_sensors.DeviceRing(4096)
+        rings[dev].extend_rows(rs)
+    seed_ms = (time.perf_counter() - t) * 1000
+
+    t = time.perf_counter()
+    for _ in range(reruns):
+        for dev in rows:
+            for _ in range(viewers):
+                legacy_session(rows[dev], timezone(timedelta(hours=4)))
+    legacy = time.perf_counter() - t
+
+    t = time.perf_counter()
+    for _ in range(reruns):
+        for dev in rings:
+            for _ in range(viewers):
+                ring_session(rings[dev], window, tz)
+    shared = time.perf_counter() - t
+
+    w = rings["dev0"].last(window)
+    views = all(np.shares_memory(a, b) for a, b in ((w.t_ms, rings["dev0"]._t), (w.core, rings["dev0"]._core)))
+    n = reruns * devices * viewers
+    print(f"{devices} devices x {viewers} viewers x {reruns} reruns, {window}-point window")
+    print(f"per-session parse : {legacy / n * 1000:.3f} ms/rerun   total {legacy:.2f} s")
+    print(f"shared ring views : {shared / n * 1000:.3f} ms/rerun   total {shared:.2f} s   ({legacy / shared:.1f}x)")
+    print(f"one-time ring fill: {seed_ms:.2f} ms for all devices; window arrays are views: {views}")
+    ring = rings["dev0"]
+    t = time.perf_counter()
+    for i in range(1000):
+        ring.extend_rows(_rows(1, t0 + timedelta(days=1, seconds=10 * i)))
+    print(f"append one reading: {(time.perf_counter() - t):.3f} ms each (per device, not per viewer)")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--devices", type=int, default=3)
+    ap.add_argument("--viewers", type=int, default=20)
+    ap.add_argument("--reruns", type=int, default=20)
+    ap.add_argument("--window", type=int, default=240)
+    a = ap.parse_args()
+    run(a.devices, a.viewers, a.reruns, a.window)
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Uhthoff episode detector (tanzim_episodes): feeds a month of 10 s readings with NaNs,
+upload gaps and excursions through store_rows in random-sized batches (pulls and
+single-row pushes), reopening the database part-way through as a restart would, and
+compares the stored episodes with a plain per-reading hysteresis loop.
+
+    python -m benchmarks.bench_episodes
+    python -m benchmarks.bench_episodes --days 7 --seed 3
+"""
+import argparse, os, tempfile, time
+from datetime import datetime, timezone
+
+import numpy as np
+
+import tanzim_db, tanzim_episodes, tanzim_risk, tanzim_sensors
+
+DEVICE = "esp8266-01"
+
+def _readings(days, seed):
+    rnd = np.random.default_rng(seed)
+    n = days * 8640
+    t = 1_717_200_000_000 + np.arange(n, dtype=np.int64) * 10_000
+    for g in rnd.choice(n, size=days, replace=False):
+        t[g:] += int(rnd.choice([5, 45, 120])) * 60_000          # device off for a while
+    core = 37.0 + 0.15 * np.sin(np.arange(n) / 700) + rnd.normal(0, 0.04, n)
+    for s in rnd.choice(n - 400, size=days * 3, replace=False):
+        core[s:s + rnd.integers(20, 400)] += rnd.uniform(0.4, 1.3)   # excursions, some below +0.5
+    core[rnd.choice(n, size=n // 200, replace=False)] = np.nan
+    return t, np.round(core, 2)
+
+def reference(t, core, base):
+    """The Monitor's latch, applied to every reading in order (plus the silence rule)."""
+    out, cur, last = [], None, None
+    for ti, c in zip(t.tolist(), core.tolist()):
+        if cur is not None and last is not None and ti - last > tanzim_episodes.GAP_CLOSE_MS:
+            cur["end_ms"] = last; out.append(cur); cur = None
+        d = c - base if c == c else None
+        if cur is None and d is not None and d >= tanzim_risk.UHTHOFF_RAISE:
+            cur = {"start_ms": ti, "peak_core": c, "end_ms": None}
+        elif cur is not None and d is not None:
+            if d < tanzim_risk.UHTHOFF_CLEAR:
+                cur["end_ms"] = ti; out.append(cur); cur = None
+            elif c > cur["peak_core"]:
+                cur["peak_core"] = c
+        last = ti
+    if cur is not None:
+        out.append(cur)
+    return [(e["start_ms"], e["end_ms"], round(e["peak_core"], 2)) for e in out]
+
+def run(days, seed):
+    t, core = _readings(days, seed)
+    iso = [datetime.fromtimestamp(v / 1000, tz=timezone.utc).isoformat(timespec="milliseconds") for v in t.tolist()]
+    rows = [{"created_at": a, "core_c": None if c != c else c, "peripheral_c": 33.0} for a, c in zip(iso, core.tolist())]
+    rnd = np.random.default_rng(seed + 1)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "ep.db")
+        db, i, calls, spent, restarted = tanzim_db.ConnectionManager(path), 0, 0, 0.0, False
+        while i < len(rows):
+            k = int(rnd.choice([1, 1, 1, 7, 60, 500]))
+            if not restarted and i > len(rows) // 2:
+                db.close(); db = tanzim_db.ConnectionManager(path); restarted = True   # process restart
+            s = time.perf_counter()
+            with db.transaction() as conn:
+                tanzim_sensors.store_rows(conn, DEVICE, rows[i:i + k])
+            spent += time.perf_counter() - s
+            i, calls = i + k, calls + 1
+        got = [(e["start_ms"], e["end_ms"], round(e["peak_core"], 2))
+               for e in reversed(tanzim_episodes.recent(db.reader(), DEVICE, 10_000))]
+        db.close()
+    ref = reference(t, core, tanzim_risk.DEFAULT_BASELINE)
+    durations = [(e - s) / 60_000 for s, e, _ in ref if e is not None]
+    print(f"{len(rows):,} readings in {calls:,} store calls ({len(rows) / spent:,.0f} rows/s incl. mirror + rollups), "
+          f"restart at {len(rows) // 2:,}")
+    print(f"episodes: detector {len(got)}, per-reading loop {len(ref)}; identical: {got == ref}; "
+          f"median duration {np.median(durations):.1f} min, open at end: {sum(e is None for _, e, _ in ref)}")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--days", type=int, default=30)
+    ap.add_argument("--seed", type=int, default=1)
+    a = ap.parse_args()
+    run(a.days, a.seed)
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Journal insert throughput: one transaction per insert (insert_journal today) vs the
+GroupCommitWriter write-behind queue, with many sessions writing at once.
+
+Reports inserts/s and the submit -> committed latency, and asserts that no write took
+longer than --max-delay-ms to commit and read-your-writes: after wait_seq(<last seq>) each
+writer must see all of its own rows.
+
+    python -m benchmarks.bench_group_commit
+    python -m benchmarks.bench_group_commit --threads 32 --inserts 500 --sync FULL
+"""
+import argparse, os, statistics, sys, tempfile, threading, time
+
+import tanzim_db, tanzim_journal
+
+def _entry(i):
+    return {"type": "ALERT_AUTO", "at": f"2024-06-01T12:00:{i % 60:02d}Z", "core_temp": 37.9, "baseline": 37.0,
+            "reasons": ["Core ≥ baseline+0.5°C"], "symptoms": ["Fatigue"], "note": f"bench insert {i}"}
+
+def _setup(path, n_threads, sync):
+    mgr = tanzim_db.ConnectionManager(path)
+    mgr._writer.execute(f"PRAGMA synchronous = {sync}")
+    with mgr.transaction() as conn:
+        conn.executemany("INSERT INTO users VALUES (?, 'x')", [(f"user{i}",) for i in range(n_threads)])
+    return mgr
+
+def _threads(fn, n):
+    barrier = threading.Barrier(n + 1)
+    def body(tid):
+        barrier.wait(); fn(tid)
+    ts = [threading.Thread(target=body, args=(i,)) for i in range(n)]
+    for t in ts: t.start()
+    barrier.wait()
+    t0 = time.perf_counter()
+    for t in ts: t.join()
+    return time.perf_counter() - t0
+
+def per_row(path, n_threads, n_inserts, sync):
+    mgr = _setup(path, n_threads, sync)
+    lat = []
+    def work(tid):
+        for i in range(n_inserts):
+            t = time.perf_counter()
+            with mgr.transaction() as conn:
+                tanzim_journal.insert_entry(conn, f"user{tid}", f"2024-06-01T{tid:03d}:{i:06d}", _entry(i))
+            lat.append((time.perf_counter() - t) * 1000)
+    wall = _threads(work, n_threads)
+    mgr.close()
+    return wall, lat, {}
+
+def group(path, n_threads, n_inserts, sync, max_delay_ms):
+    mgr = _setup(path, n_threads, sync)
+    wb = tanzim_db.GroupCommitWriter(mgr, max_delay_ms=max_delay_ms)
+    submit_lat, stale = [], []
+    def work(tid):
+        user = f"user{tid}"
+        for i in range(n_inserts):
+            t = time.perf_counter()
+            last = wb.submit(user, tanzim_journal.insert_entry, user, f"2024-06-01T{tid:03d}:{i:06d}", _entry(i))
+            submit_lat.append((time.perf_counter() - t) * 1000)
+        wb.wait_seq(last)
+        if tanzim_journal.count_entries(mgr.reader(), user) != n_inserts:
+            stale.append(user)
+    wall = _threads(work, n_threads)
+    wb.close()
+    info = {"batches": wb.stats["batches"], "avg batch": wb.stats["rows"] / max(1, wb.stats["batches"]),
+            "max commit latency ms": round(wb.stats["max_latency_ms"], 1), "late rows": wb.stats["late_rows"],
+            "failed": wb.stats["failed"], "read-your-writes": "ok" if not stale else f"STALE for {len(stale)} users"}
+    mgr.close()
+    assert not stale and not wb.stats["failed"], info
+    assert wb.stats["max_latency_ms"] <= max_delay_ms, f"commit latency over {max_delay_ms:g} ms: {info}"
+    return wall, submit_lat, info
+
+def run(n_threads, n_inserts, sync, max_delay_ms):
+    total = n_threads * n_inserts
+    with tempfile.TemporaryDirectory() as tmp:
+        wall, lat, _ = per_row(os.path.join(tmp, "a.db"), n_threads, n_inserts, sync)
+        base = total / wall
+        print(f"per-row commit : {base:>9.0f} inserts/s   request-thread p50={statistics.median(lat):.3f} ms")
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            wall, lat, info = group(os.path.join(tmp, "b.db"), n_threads, n_inserts, sync, max_delay_ms)
+        except AssertionError as e:
+            sys.exit(f"FAIL: {e}")
+        print(f"group commit   : {total / wall:>9.0f} inserts/s   request-thread p50={statistics.median(lat):.3f} ms"
+              f"   ({total / wall / base:.1f}x)")
+        print(f"                 {info}")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--threads", type=int, default=16)
+    ap.add_argument("--inserts", type=int, default=500, help="per thread")
+    ap.add_argument("--sync", default="NORMAL", choices=["OFF", "NORMAL", "FULL"])
+    ap.add_argument("--max-delay-ms", type=float, default=50)
+    a = ap.parse_args()
+    run(a.threads, a.inserts, a.sync, a.max_delay_ms)
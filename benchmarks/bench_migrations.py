@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+What the once-per-process migration runner takes off each Streamlit rerun.
+
+Compares the old module-level init_db() + ensure_*_schema() sequence (run on every
+rerun) with tanzim_db.ensure_schema() after the first call, and checks that several
+processes starting at once on a fresh database apply every migration exactly once.
+
+    python -m benchmarks.bench_migrations
+"""
+import argparse, multiprocessing as mp, os, statistics, tempfile, time
+
+import tanzim_db
+
+def legacy_init(conn):
+    """The pre-migration per-rerun schema checks from tanzim_ms.py."""
+    c = conn.cursor()
+    c.execute("""CREATE TABLE IF NOT EXISTS users(username TEXT PRIMARY KEY, password TEXT)""")
+    c.execute("""CREATE TABLE IF NOT EXISTS temps(
+        username TEXT, date TEXT, body_temp REAL, peripheral_temp REAL,
+        weather_temp REAL, feels_like REAL, humidity REAL, status TEXT
+    )""")
+    c.execute("""CREATE TABLE IF NOT EXISTS journal(username TEXT, date TEXT, entry TEXT)""")
+    c.execute(tanzim_db.SCHEMA_SQL[3])
+    conn.commit()
+    c.execute("PRAGMA table_info(emergency_contacts)")
+    cols = [r[1] for r in c.fetchall()]
+    if "updated_at" not in cols:
+        c.execute("ALTER TABLE emergency_contacts ADD COLUMN updated_at TEXT")
+        conn.commit()
+    c.execute(tanzim_db.USER_PREFS_SQL)
+    conn.commit()
+
+def _median_ms(fn, repeat):
+    xs = []
+    for _ in range(repeat):
+        t = time.perf_counter(); fn(); xs.append((time.perf_counter() - t) * 1000)
+    return statistics.median(xs)
+
+def _race_worker(path, q):
+    conn = tanzim_db.connect(path)
+    q.put(tanzim_db.migrate(conn)["applied"])
+
+def run(repeat, procs):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        conn = tanzim_db.connect(path)
+        first = tanzim_db.ensure_schema(conn, path)
+        legacy = _median_ms(lambda: legacy_init(conn), repeat)
+        cached = _median_ms(lambda: tanzim_db.ensure_schema(conn, path), repeat)
+        print(f"first run (fresh db): applied {first['applied']} in {first['elapsed_ms']:.2f} ms")
+        print(f"legacy per-rerun schema checks: {legacy:.3f} ms")
+        print(f"ensure_schema per rerun:        {cached * 1000:.2f} µs")
+        print(f"saved per rerun:                {legacy - cached:.3f} ms")
+        conn.close()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "race.db")
+        q = mp.Queue()
+        ps = [mp.Process(target=_race_worker, args=(path, q)) for _ in range(procs)]
+        for p in ps: p.start()
+        for p in ps: p.join()
+        results = [q.get() for _ in ps]
+        conn = tanzim_db.connect(path)
+        versions = [r[0] for r in conn.execute("SELECT version FROM schema_version ORDER BY version")]
+        applied = sorted(v for r in results for v in r)
+        ok = applied == versions == [m[0] for m in tanzim_db.MIGRATIONS]
+        print(f"{procs} concurrent starts: versions={versions} applied-once={'yes' if ok else 'NO'}")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--repeat", type=int, default=200)
+    ap.add_argument("--procs", type=int, default=8)
+    a = ap.parse_args()
+    run(a.repeat, a.procs)
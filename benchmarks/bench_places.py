@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+tanzim_places.Gazetteer (bundled gcc_places.json): build time, chat city inference over
+synthetic English/Arabic messages against the old substring scan (agreement where the
+old mapping knew the city, plus what it missed) and against a substring scan of every
+alias, and per-call latency of planner place lookups, prefix completion and exact lookups.
+
+    python -m benchmarks.bench_places
+    python -m benchmarks.bench_places --messages 20000
+"""
+import argparse, random, time
+
+import tanzim_places
+
+OLD_MAPPING = {
+    "abu dhabi": "Abu Dhabi,AE", "abudhabi": "Abu Dhabi,AE", "أبوظبي": "Abu Dhabi,AE",
+    "dubai": "Dubai,AE", "دبي": "Dubai,AE", "sharjah": "Sharjah,AE", "الشارقة": "Sharjah,AE",
+    "doha": "Doha,QA", "qatar": "Doha,QA", "الدوحة": "Doha,QA", "قطر": "Doha,QA",
+    "kuwait": "Kuwait City,KW", "الكويت": "Kuwait City,KW",
+    "manama": "Manama,BH", "المنامة": "Manama,BH",
+    "riyadh": "Riyadh,SA", "الرياض": "Riyadh,SA", "jeddah": "Jeddah,SA", "جدة": "Jeddah,SA",
+    "dammam": "Dammam,SA", "الدمام": "Dammam,SA", "muscat": "Muscat,OM", "مسقط": "Muscat,OM",
+    "al rayyan": "Al Rayyan,QA", "الريان": "Al Rayyan,QA",
+}
+
+def legacy(text):
+    """The old resolve_city_for_chat scan (before the session/prefs fallbacks)."""
+    txt = (text or "").lower()
+    for k, v in OLD_MAPPING.items():
+        if k in txt:
+            return v
+    return None
+
+EN = ["Is it safe to walk {} this evening?", "How hot will it be {} tomorrow?",
+      "I feel tired after a trip {}, any tips?", "Planning a family day {} on Friday, when is it coolest?",
+      "My legs feel heavy, I was outside {} at noon."]
+AR = ["هل الجو مناسب للمشي {} هذا المساء؟", "كم ستكون الحرارة {} غدًا؟", "أشعر بالتعب بعد رحلة {}، هل من نصائح؟",
+      "نخطط ليوم عائلي {} يوم الجمعة، متى يكون الجو أبرد؟"]
+
+def messages(gz, n, rnd):
+    """(text, expected city or None) mixing city names, landmarks and no place at all."""
+    cities = [p for p in gz.places if p.kind == "city"]
+    spots = [p for p in gz.places if p.kind != "city"]
+    out = []
+    for _ in range(n):
+        ar = rnd.random() < 0.4
+        tmpl = rnd.choice(AR if ar else EN)
+        r = rnd.random()
+        if r < 0.5:
+            p = rnd.choice(cities)
+            where, expect = ("في " + p.name_ar) if ar else ("in " + p.name), p.city
+        elif r < 0.8:
+            p = rnd.choice(spots)
+            where, expect = ("في " + p.name_ar) if ar else ("at " + p.name), p.city
+        else:
+            where, expect = ("في البيت" if ar else "at home"), None
+        out.append((tmpl.format(where), expect))
+    return out
+
+def _us(fn, items):
+    t = time.perf_counter()
+    for x in items:
+        fn(x)
+    return (time.perf_counter() - t) / len(items) * 1e6
+
+def run(n, seed):
+    t = time.perf_counter()
+    gz = tanzim_places.Gazetteer.load()
+    build = (time.perf_counter() - t) * 1000
+    print(f"gazetteer: {len(gz.places)} places, {len(gz.keys)} aliases, "
+          f"{len(gz._goto)} automaton states, loaded in {build:.1f} ms")
+
+    msgs = messages(gz, n, random.Random(seed))
+    texts = [m for m, _ in msgs]
+    new = [gz.find_city(m) for m in texts]
+    old = [legacy(m) for m in texts]
+    right_new = sum(a == e for a, (_, e) in zip(new, msgs))
+    right_old = sum(a == e for a, (_, e) in zip(old, msgs))
+    known = [(o, w) for o, w in zip(old, new) if o is not None]
+    print(f"chat inference on {n} messages: gazetteer right {right_new}/{n}, old scan right {right_old}/{n}; "
+          f"agree wherever the old scan found a city: {sum(o == w for o, w in known)}/{len(known)}")
+    every = [(k, gz.index[k]) for k in gz.keys]
+
+    def scan_all(text):                           # the old approach stretched to every alias
+        s = f" {tanzim_places.normalize(text)} "
+        return [k for k, _ in every if f" {k} " in s]
+
+    print(f"  find_city {_us(gz.find_city, texts):.1f} µs/message; old scan ({len(OLD_MAPPING)} city names) "
+          f"{_us(legacy, texts):.1f} µs, substring scan of all {len(every)} aliases {_us(scan_all, texts):.1f} µs")
+
+    queries = [p.name for p in gz.places] + [p.name_ar for p in gz.places] + \
+              ["corniche", "Corniche Doha", "qurum beach muscat", "the dubai mall downtown", "Nowhere Lane"]
+    hits = sum(gz.resolve(q) is not None for q in queries)
+    print(f"planner lookups: {hits}/{len(queries)} resolved locally (the rest would go to the API); "
+          f"resolve {_us(gz.resolve, queries):.1f} µs, lookup {_us(gz.lookup, queries):.1f} µs, "
+          f"complete {_us(lambda q: gz.complete(q[:3]), queries):.1f} µs")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--messages", type=int, default=5000)
+    ap.add_argument("--seed", type=int, default=3)
+    a = ap.parse_args()
+    run(a.messages, a.seed)
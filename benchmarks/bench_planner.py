@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+tanzim_planner.best_windows on synthetic 5-day forecasts for every GCC city: agreement
+with a brute-force reference (every window scored slot by slot in Python), per-city
+latency for top-k at hourly and 15-minute grids and several window lengths, against the
+old best_windows_from_forecast (first 16 slots, adjacent 3-hour pairs only); then
+compare() over all cities in one pass against best_windows city by city.
+
+    python -m benchmarks.bench_planner
+    python -m benchmarks.bench_planner --top-k 12 --repeat 2000
+"""
+import argparse, math, random, time
+from datetime import datetime as _dt, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+import tanzim_planner
+
+CITIES = {"Abu Dhabi,AE": "Asia/Dubai", "Dubai,AE": "Asia/Dubai", "Doha,QA": "Asia/Qatar",
+          "Kuwait City,KW": "Asia/Kuwait", "Manama,BH": "Asia/Bahrain", "Riyadh,SA": "Asia/Riyadh",
+          "Muscat,OM": "Asia/Muscat"}
+T0 = 1_719_792_000                          # 2024-07-01 00:00 UTC
+
+def synthetic_forecast(rnd: random.Random, items: int = 40) -> list[dict]:
+    out = []
+    for i in range(items):
+        dt = T0 + 10800 * i
+        hour = (dt // 3600 + 4) % 24       # roughly local
+        fl = 34 + 8 * math.sin((hour - 9) / 24 * 2 * math.pi) + rnd.uniform(-1.5, 1.5)
+        out.append({"dt": dt, "time": _dt.fromtimestamp(dt, timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+                    "temp": fl - 3, "feels_like": round(fl, 2), "humidity": round(rnd.uniform(35, 75), 1),
+                    "desc": "clear sky"})
+    return out
+
+def legacy(forecast, window_hours=2, top_k=8, max_feels_like=35.0, max_humidity=65, avoid_hours=(10, 16)):
+    """The planner's old best_windows_from_forecast (window_hours unused)."""
+    slots = []
+    for it in forecast[:16]:
+        t = it["time"]; hour = int(t[11:13])
+        if avoid_hours[0] <= hour < avoid_hours[1]: continue
+        if it["feels_like"] <= max_feels_like and it["humidity"] <= max_humidity:
+            slots.append(it)
+    cand = []
+    for i in range(len(slots)):
+        group = [slots[i]]
+        if i + 1 < len(slots):
+            t1, t2 = slots[i]["time"], slots[i + 1]["time"]
+            if t1[:10] == t2[:10] and (int(t2[11:13]) - int(t1[11:13]) == 3):
+                group.append(slots[i + 1])
+        avg_feels = round(sum(g["feels_like"] for g in group) / len(group), 1)
+        avg_hum = int(sum(g["humidity"] for g in group) / len(group))
+        start_dt = _dt.strptime(group[0]["time"][:16], "%Y-%m-%d %H:%M")
+        end_dt = (_dt.strptime(group[-1]["time"][:16], "%Y-%m-%d %H:%M") + timedelta(hours=3)) if len(group) > 1 else (start_dt + timedelta(hours=3))
+        cand.append({"start_dt": start_dt, "end_dt": end_dt, "avg_feels": avg_feels, "avg_hum": avg_hum})
+    cand.sort(key=lambda x: x["start_dt"])
+    return cand[:top_k]
+
+def reference(forecast, hours, top_k, step_min, tz, now, max_feels_like=35.0, max_humidity=65.0, avoid_hours=(10, 16)):
+    """Brute force: interpolate point by point, score every window in a loop, greedy non-overlap."""
+    step = step_min * 60
+    t0 = [it["dt"] for it in forecast]
+    grid = list(range(t0[0], t0[-1] + 1, step))
+    fl = np.interp(grid, t0, [it["feels_like"] for it in forecast])
+    hum = np.interp(grid, t0, [it["humidity"] for it in forecast])
+    n = max(1, round(hours * 3600 / step))
+    cand = []
+    for i in range(len(grid) - n + 1):
+        if grid[i] < now - step / 2:
+            continue
+        good = True
+        for j in range(i, i + n):
+            h = _dt.fromtimestamp(grid[j], tz).hour + _dt.fromtimestamp(grid[j], tz).minute / 60
+            if fl[j] > max_feels_like or hum[j] > max_humidity or avoid_hours[0] <= h < avoid_hours[1]:
+                good = False
+                break
+        if good:
+            cost = sum(fl[j] + max(hum[j] - 50, 0) * 0.1 for j in range(i, i + n)) / n
+            cand.append((cost, i))
+    cand.sort()
+    taken, out = set(), []
+    for cost, i in cand:
+        if len(out) == top_k:
+            break
+        if any(abs(i - k) < n for k in taken):
+            continue
+        taken.add(i)
+        out.append((_dt.fromtimestamp(grid[i], tz), cost))
+    return out
+
+def _same(got, ref):
+    """Same windows, allowing exact cost ties to come in either order."""
+    return len(got) == len(ref) and all(w["start_dt"] == s or abs(w["score"] - round(c, 2)) < 0.011
+                                        for w, (s, c) in zip(got, ref))
+
+def _per_call_us(fn, repeat):
+    t = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t) / repeat * 1e6
+
+def run(top_k, repeat, seed):
+    rnd = random.Random(seed)
+    forecasts = {c: synthetic_forecast(rnd) for c in CITIES}
+    now = T0 + 5400
+    mismatches = checks = 0
+    for city, zone in CITIES.items():
+        tz = ZoneInfo(zone)
+        for step in (60, 15):
+            for hours in (0.5, 1, 2, 3.5):
+                got = tanzim_planner.best_windows(forecasts[city], hours, top_k, step, tz, now)
+                checks += 1
+                mismatches += not _same(got, reference(forecasts[city], hours, top_k, step, tz, now))
+    print(f"agreement with the brute-force reference: {checks - mismatches}/{checks} (city × grid × length; cost ties in either order)")
+
+    fc = forecasts["Abu Dhabi,AE"]
+    tz = ZoneInfo("Asia/Dubai")
+    w = tanzim_planner.best_windows(fc, 2, top_k, 15, tz, now)
+    print(f"Abu Dhabi, 2 h on a 15-min grid: {len(w)} windows, best {w[0]['start_dt']:%a %H:%M}–{w[0]['end_dt']:%H:%M} "
+          f"(≈{w[0]['avg_feels']}°C, {w[0]['avg_hum']}%)" if w else "no window")
+    print(f"old best_windows_from_forecast: {_per_call_us(lambda: legacy(fc, top_k=top_k), repeat):7.1f} µs "
+          f"(first 48 h, 3-6 h windows only, UTC hours)")
+    for step in (60, 15):
+        for hours in (1, 2, 4):
+            us = _per_call_us(lambda: tanzim_planner.best_windows(fc, hours, top_k, step, tz, now), repeat)
+            print(f"best_windows {hours} h on a {step:>2}-min grid, top {top_k}: {us:7.1f} µs per city")
+    us = _per_call_us(lambda: [tanzim_planner.best_windows(forecasts[c], 2, top_k, 15, ZoneInfo(z), now)
+                               for c, z in CITIES.items()], max(1, repeat // 10))
+    print(f"all {len(CITIES)} cities one by one, 2 h / 15 min: {us / 1000:.2f} ms")
+
+    tzs = {c: ZoneInfo(z) for c, z in CITIES.items()}
+    for step in (60, 15):
+        cmp = tanzim_planner.compare(forecasts, tzs, 2, top_k, step, now=now)
+        same = all(cmp.windows[c] == tanzim_planner.best_windows(forecasts[c], 2, top_k, step, tzs[c], now)
+                   for c in CITIES)
+        us = _per_call_us(lambda: tanzim_planner.compare(forecasts, tzs, 2, top_k, step, now=now), max(1, repeat // 10))
+        print(f"compare(), {len(CITIES)} cities × {len(cmp.days)} days on a {step:>2}-min grid: {us / 1000:.2f} ms, "
+              f"same windows as best_windows: {same}")
+    print("heatmap (best 2 h window's feels-like °C per local day):")
+    for c, row in zip(cmp.cities, cmp.best_feels):
+        print(f"  {c:<15} " + " ".join("   —  " if np.isnan(v) else f"{v:6.1f}" for v in row))
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--top-k", type=int, default=8)
+    ap.add_argument("--repeat", type=int, default=1000)
+    ap.add_argument("--seed", type=int, default=7)
+    a = ap.parse_args()
+    run(a.top_k, a.repeat, a.seed)
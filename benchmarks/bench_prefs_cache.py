@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+SQLite reads behind load_user_prefs / load_emergency_contacts with the shared UserCache.
+
+Simulates several browser sessions per user rerunning pages (each rerun resolves the
+timezone a few times, the sidebar loads contacts), with an occasional settings save.
+Without the cache every call is a query; with it, reads stay at one per user, since
+saves write through instead of invalidating.
+
+    python -m benchmarks.bench_prefs_cache
+    python -m benchmarks.bench_prefs_cache --users 50 --reruns 500
+"""
+import argparse, os, random, tempfile, time
+
+import tanzim_db
+
+PREFS_CALLS_PER_RERUN = 6     # get_active_tz x3, _system_prompt, resolve_city_for_chat, page render
+CONTACT_CALLS_PER_RERUN = 1   # sidebar
+
+def run(n_users, sessions, reruns, save_every, seed=3):
+    rnd = random.Random(seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        conn = tanzim_db.connect(path)
+        tanzim_db.ensure_schema(conn, path)
+        users = [f"user{i}" for i in range(n_users)]
+        conn.executemany("INSERT INTO users VALUES (?, 'x')", [(u,) for u in users])
+        for u in users:
+            tanzim_db.write_user_prefs(conn, u, {"timezone": "Asia/Dubai", "language": "English"}, "2024-01-01T00:00:00Z")
+            tanzim_db.write_emergency_contacts(conn, u, "+971500000000", "", "2024-01-01T00:00:00Z")
+        conn.commit()
+
+        cache = tanzim_db.UserCache()
+        uncached_queries, saves = 0, 0
+        t_plain = t_cached = 0.0
+        for i in range(n_users * sessions * reruns):
+            u = users[rnd.randrange(n_users)]
+            if save_every and i % save_every == 0:
+                prefs = cache.get("prefs", u, lambda: tanzim_db.read_user_prefs(conn, u))
+                prefs["home_city"] = rnd.choice(["Dubai,AE", "Abu Dhabi,AE", "Doha,QA"])
+                tanzim_db.write_user_prefs(conn, u, prefs, "2024-01-02T00:00:00Z")
+                conn.commit()
+                cache.put("prefs", u, prefs)
+                saves += 1
+            t = time.perf_counter()
+            for _ in range(PREFS_CALLS_PER_RERUN):
+                tanzim_db.read_user_prefs(conn, u)
+            for _ in range(CONTACT_CALLS_PER_RERUN):
+                tanzim_db.read_emergency_contacts(conn, u)
+            t_plain += time.perf_counter() - t
+            uncached_queries += PREFS_CALLS_PER_RERUN + CONTACT_CALLS_PER_RERUN
+            t = time.perf_counter()
+            for _ in range(PREFS_CALLS_PER_RERUN):
+                cache.get("prefs", u, lambda: tanzim_db.read_user_prefs(conn, u))
+            for _ in range(CONTACT_CALLS_PER_RERUN):
+                cache.get("contacts", u, lambda: tanzim_db.read_emergency_contacts(conn, u))
+            t_cached += time.perf_counter() - t
+
+        stats = cache.stats()
+        prefs_reads = {k[1]: v["reads"] for k, v in stats.items() if k[0] == "prefs"}
+        prefs_writes = {k[1]: v["writes"] for k, v in stats.items() if k[0] == "prefs"}
+        worst = max(prefs_reads[u] / (1 + prefs_writes[u]) for u in prefs_reads)
+        total_reads = sum(v["reads"] for v in stats.values())
+        print(f"reruns: {n_users * sessions * reruns}  saves: {saves}")
+        print(f"SQLite queries without cache: {uncached_queries}  ({t_plain * 1000:.1f} ms)")
+        print(f"SQLite queries with cache:    {total_reads}  ({t_cached * 1000:.1f} ms)")
+        print(f"max prefs reads per user per change: {worst:.2f}  ({'ok' if worst <= 1 else 'FAIL'})")
+        conn.close()
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--users", type=int, default=20)
+    ap.add_argument("--sessions", type=int, default=3)
+    ap.add_argument("--reruns", type=int, default=200)
+    ap.add_argument("--save-every", type=int, default=250)
+    a = ap.parse_args()
+    run(a.users, a.sessions, a.reruns, a.save_every)
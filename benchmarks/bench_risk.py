@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+Batch risk scoring (tanzim_risk.assess) vs a Python loop over compute_risk_minimal +
+apply_uhthoff_floor, on random feels-like / humidity / core readings with gaps.
+Checks that score, status and the Uhthoff-advice flag agree at every point.
+
+    python -m benchmarks.bench_risk
+    python -m benchmarks.bench_risk --points 200000
+"""
+import argparse, time
+
+import numpy as np
+
+import tanzim_risk
+
+def _inputs(n, seed=11):
+    rnd = np.random.default_rng(seed)
+    fl = rnd.uniform(25, 48, n).round(1)
+    hum = rnd.uniform(10, 95, n).round(0)
+    core = rnd.normal(37.3, 0.5, n).round(2).astype(np.float32)     # as stored in the device ring
+    for a in (fl, hum):
+        a[rnd.choice(n, n // 100, replace=False)] = np.nan
+    core[rnd.choice(n, n // 100, replace=False)] = np.nan
+    return fl, hum, core
+
+def loop(fl, hum, core, baseline):
+    none = lambda v: None if v != v else v
+    out = []
+    for f, h, c in zip(fl.tolist(), hum.tolist(), core.tolist()):
+        f, h, c = none(f), none(h), none(c)
+        r = tanzim_risk.compute_risk_minimal(f, h, c, baseline)
+        status = r["status"]
+        r = tanzim_risk.apply_uhthoff_floor(r, c, baseline)
+        out.append((r["score"], r["status"], r["status"] != status))
+    return out
+
+def run(points, baseline):
+    fl, hum, core = _inputs(points)
+    t = time.perf_counter()
+    ref = loop(fl, hum, core, baseline)
+    loop_s = time.perf_counter() - t
+    t = time.perf_counter()
+    res = tanzim_risk.assess(fl, hum, core, baseline)
+    batch_s = time.perf_counter() - t
+    score, status, floored = zip(*ref)
+    same = (np.array_equal(res.score, np.array(score))
+            and np.array_equal(res.level, np.array([tanzim_risk.STATUS_LEVEL[s] for s in status]))
+            and np.array_equal(res.floored, np.array(floored)))
+    counts = np.bincount(res.level, minlength=4)
+    print(f"{points:,} points: python loop {loop_s:.2f} s, assess() {batch_s * 1000:.1f} ms "
+          f"({loop_s / batch_s:.0f}x); identical score/status/floor: {same}")
+    print("  " + ", ".join(f"{s} {c:,}" for s, c in zip(tanzim_risk.STATUSES, counts)) +
+          f"; raised by Uhthoff floor {int(res.floored.sum()):,}")
+    t = time.perf_counter()
+    spans = tanzim_risk.runs(np.arange(points, dtype=np.int64) * 10_000, res.level)
+    print(f"  risk band runs: {len(spans):,} spans in {(time.perf_counter() - t) * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--points", type=int, default=1_000_000)
+    ap.add_argument("--baseline", type=float, default=37.0)
+    a = ap.parse_args()
+    run(a.points, a.baseline)
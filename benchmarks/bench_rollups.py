@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+Sensor rollups (tanzim_rollup): cost of merging on every store, correctness against a
+from-scratch NumPy aggregate, long-range chart reads (rollups vs raw + min/max), and the
+on-disk size before/after compacting raw readings past the retention.
+
+    python -m benchmarks.bench_rollups
+    python -m benchmarks.bench_rollups --days 30 --raw-days 7
+"""
+import argparse, os, statistics, tempfile, time
+from datetime import datetime, timezone
+
+import numpy as np
+
+import tanzim_db, tanzim_decimate, tanzim_rollup, tanzim_sensors
+
+DEVICE = "esp8266-01"
+STEP_MS = 10_000
+
+def _readings(days, seed=7):
+    rnd = np.random.default_rng(seed)
+    n = days * 86400_000 // STEP_MS
+    t = 1_717_200_000_000 + np.arange(n, dtype=np.int64) * STEP_MS
+    t[rnd.choice(n, size=n // 1000, replace=False)] += 3 * STEP_MS // 2   # jittered uploads
+    t = np.unique(t)
+    n = len(t)
+    core = np.round(37.0 + 0.3 * np.sin(np.arange(n) / 900) + rnd.normal(0, 0.03, n), 2)
+    for s in rnd.choice(n - 60, size=max(1, n // 20_000), replace=False):
+        core[s:s + 60] += 0.8                  # ten-minute Uhthoff-range episodes
+    core[rnd.choice(n, size=n // 500, replace=False)] = np.nan
+    peri = np.round(core - 3.5 + rnd.normal(0, 0.1, n), 2)
+    iso = [datetime.fromtimestamp(v / 1000, tz=timezone.utc).isoformat(timespec="milliseconds") for v in t.tolist()]
+    rows = [{"created_at": a, "core_c": None if c != c else c, "peripheral_c": p}
+            for a, c, p in zip(iso, core.tolist(), peri.tolist())]
+    return t, core, peri, rows
+
+def _expected(t, core, res):
+    """Hourly (or any res) aggregates from scratch, same rules as tanzim_rollup.merge."""
+    b = t - t % (res * 1000)
+    starts = np.flatnonzero(np.r_[True, b[1:] != b[:-1]])
+    dt = np.clip(np.diff(t, prepend=t[0]), 0, tanzim_rollup.GAP_CAP_MS)
+    thr = tanzim_rollup.DEFAULT_BASELINE + tanzim_rollup.ABOVE_DELTA
+    with np.errstate(invalid="ignore"):
+        above = np.where(core >= thr, dt, 0)
+    ok = ~np.isnan(core)
+    mean = np.add.reduceat(np.where(ok, core, 0), starts) / np.add.reduceat(ok, starts)
+    return (b[starts], np.diff(np.r_[starts, len(t)]), np.fmin.reduceat(core, starts),
+            np.fmax.reduceat(core, starts), mean, np.add.reduceat(above, starts))
+
+def _size_mb(path):
+    return sum(os.path.getsize(path + s) for s in ("", "-wal") if os.path.exists(path + s)) / 2**20
+
+def run(days, raw_days, batch):
+    t, core, peri, rows = _readings(days)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "roll.db")
+        db = tanzim_db.ConnectionManager(path)
+        tail = 200
+        s = time.perf_counter()
+        for i in range(0, len(rows) - tail, batch):           # cursor pulls
+            with db.transaction() as conn:
+                tanzim_sensors.store_rows(conn, DEVICE, rows[i:min(i + batch, len(rows) - tail)])
+        bulk = time.perf_counter() - s
+        lat = []
+        for r in rows[-tail:]:                                # realtime pushes, one row each
+            s = time.perf_counter()
+            with db.transaction() as conn:
+                tanzim_sensors.store_rows(conn, DEVICE, [r])
+            lat.append((time.perf_counter() - s) * 1000)
+        with db.transaction() as conn:                        # overlap re-delivery must not double count
+            dup = tanzim_sensors.store_rows(conn, DEVICE, rows[-batch:])
+        print(f"{len(rows):,} readings over {days} d: batched store {len(rows) / bulk:,.0f} rows/s, "
+              f"single-row store p50={statistics.median(lat):.2f} ms max={max(lat):.2f} ms, re-delivered added={dup}")
+
+        conn = db.reader()
+        for res in tanzim_rollup.RESOLUTIONS:
+            r = tanzim_rollup.read(conn, DEVICE, res, 0)
+            b, n, lo, hi, mean, above = _expected(t, core, res)
+            ok = (np.array_equal(r.bucket, b) and np.array_equal(r.n, n)
+                  and np.allclose(r.core_min, lo, equal_nan=True, atol=1e-4)
+                  and np.allclose(r.core_max, hi, equal_nan=True, atol=1e-4)
+                  and np.allclose(r.core_mean, mean, equal_nan=True, atol=1e-4)
+                  and np.array_equal(r.above_ms, above))
+            print(f"  {res:>5}s rollup: {len(r.bucket):>7,} buckets, {int(r.above_ms.sum()) / 3.6e6:7.1f} h above "
+                  f"baseline+0.5  {'matches recompute' if ok else 'MISMATCH'}")
+
+        now = int(t[-1]) + 1
+        for label, sec, res in (("7d", 7 * 86400, 900), ("30d", 30 * 86400, 3600)):
+            since = now - sec * 1000
+            s = time.perf_counter()
+            w = tanzim_sensors.history(conn, DEVICE, since)
+            tanzim_decimate.minmax(w.t_ms, w.core, 600, since, now)
+            raw_ms = (time.perf_counter() - s) * 1000
+            s = time.perf_counter()
+            tanzim_rollup.read(conn, DEVICE, res, since).envelope("core")
+            roll_ms = (time.perf_counter() - s) * 1000
+            print(f"  {label} chart: raw history + minmax {raw_ms:7.1f} ms   rollups {roll_ms:5.1f} ms")
+
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        db._writer.execute("VACUUM")
+        before = _size_mb(path)
+        with db.transaction() as w:
+            gone = tanzim_rollup.compact(w, DEVICE, now, raw_days)
+        db._writer.execute("VACUUM")
+        db._writer.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        left = conn.execute("SELECT COUNT(*) FROM sensor_readings").fetchone()[0]
+        hourly = tanzim_rollup.read(conn, DEVICE, 3600, 0)
+        print(f"compact to {raw_days} d raw: deleted {gone:,} raw rows, {left:,} left; "
+              f"db {before:.1f} MB -> {_size_mb(path):.1f} MB; hourly rollups still cover "
+              f"{len(hourly.bucket):,} h / {int(hourly.n.sum()):,} readings")
+        db.close()
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--days", type=int, default=90)
+    ap.add_argument("--raw-days", type=float, default=14)
+    ap.add_argument("--batch", type=int, default=500, help="rows per cursor pull")
+    a = ap.parse_args()
+    run(a.days, a.raw_days, a.batch)
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Journal full-text search latency (FTS5, tanzim_journal.search) over a large history.
+
+    python -m benchmarks.bench_search                  # 100k entries, 50 users
+    python -m benchmarks.bench_search --entries 300000
+"""
+import argparse, os, random, statistics, tempfile, time
+from datetime import datetime, timedelta, timezone
+
+import tanzim_db, tanzim_journal
+
+WORDS_EN = ["walk", "corniche", "dizzy", "tired", "beach", "mall", "heat", "shade", "water", "vision",
+            "blurred", "after", "prayer", "car", "outside", "morning", "evening", "fan", "numb", "legs"]
+WORDS_AR = ["مشي", "الكورنيش", "دوخة", "تعب", "الشاطئ", "حرارة", "ظل", "ماء", "الرؤية", "بعد",
+            "الصلاة", "السيارة", "صباح", "مساء", "خدر", "الساقين"]
+SYMPTOMS = [("Dizziness", "دوخة"), ("Fatigue", "إرهاق"), ("Numbness", "خدر"), ("Blurred vision", "تشوش الرؤية")]
+TRIGGERS = [("Exercise", "رياضة"), ("Direct sun exposure", "تعرض مباشر للشمس"), ("Car without AC", "سيارة بدون تكييف")]
+ACTIONS = [("Cool shower", "دش بارد"), ("Drank water", "شرب ماء"), ("Ice pack", "كمادة ثلج")]
+
+QUERIES = ["dizzy", "corniche walk", "دوخة", "بالشاطئ", "cool shower", "numbness", "ice", "حرارة بعد"]
+
+def populate(conn, n, n_users, seed=11):
+    rnd = random.Random(seed)
+    t0 = datetime(2023, 1, 1, tzinfo=timezone.utc)
+    for i in range(n):
+        ar = rnd.random() < 0.4
+        words = WORDS_AR if ar else WORDS_EN
+        pick = (lambda pairs: [p[1 if ar else 0] for p in rnd.sample(pairs, rnd.randint(0, 2))])
+        dt = (t0 + timedelta(minutes=17 * i)).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+        entry = {"type": rnd.choice(["DAILY", "NOTE", "RECOVERY", "ALERT"]), "at": dt,
+                 "note": " ".join(rnd.choices(words, k=rnd.randint(4, 14))),
+                 "symptoms": pick(SYMPTOMS), "triggers": pick(TRIGGERS), "actions": pick(ACTIONS)}
+        tanzim_journal.insert_entry(conn, f"user{rnd.randrange(n_users)}", dt, entry)
+        if i % 20_000 == 0:
+            conn.commit()
+    conn.commit()
+
+def run(n, n_users, repeat):
+    aliases = tanzim_journal.build_aliases([tuple(zip(*SYMPTOMS)), tuple(zip(*TRIGGERS)), tuple(zip(*ACTIONS))])
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        conn = tanzim_db.connect(path)
+        tanzim_db.ensure_schema(conn, path)
+        t = time.perf_counter()
+        populate(conn, n, n_users)
+        print(f"indexed {n} entries for {n_users} users in {time.perf_counter() - t:.1f} s")
+        print(f"{'query':<16} {'hits':>5} {'median ms':>10} {'p95 ms':>8}")
+        for q in QUERIES:
+            xs, hits = [], 0
+            for i in range(repeat):
+                t = time.perf_counter()
+                hits = len(tanzim_journal.search(conn, f"user{i % n_users}", q, limit=20, aliases=aliases))
+                xs.append((time.perf_counter() - t) * 1000)
+            xs.sort()
+            print(f"{q:<16} {hits:>5} {statistics.median(xs):>10.2f} {xs[int(len(xs) * 0.95) - 1]:>8.2f}")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--entries", type=int, default=100_000)
+    ap.add_argument("--users", type=int, default=50)
+    ap.add_argument("--repeat", type=int, default=40)
+    a = ap.parse_args()
+    run(a.entries, a.users, a.repeat)
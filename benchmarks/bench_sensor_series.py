@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Monitor data prep from Supabase-shaped rows: the old per-row path (fromisoformat +
+astimezone per reading, list comprehensions, a gap loop + statistics.median, a second
+DataFrame for the raw table) vs tanzim_sensors.SensorSeries (one vectorized parse, then
+tz conversion, gap stats and the table frame from the columns).
+
+    python -m benchmarks.bench_sensor_series
+    python -m benchmarks.bench_sensor_series --sizes 240 4096 100000
+"""
+import argparse, statistics, time
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+
+import tanzim_sensors
+
+TZ = ZoneInfo("Asia/Dubai")
+
+def _rows(n):
+    t0 = datetime(2024, 7, 1, tzinfo=timezone.utc)
+    return [{"created_at": (t0 + timedelta(seconds=10 * i)).isoformat(), "core_c": 37.0 + (i % 7) * 0.05,
+             "peripheral_c": None if i % 97 == 0 else 33.0} for i in range(n)]
+
+def legacy(rows):
+    times = [datetime.fromisoformat(r["created_at"].replace("Z", "+00:00")).astimezone(TZ) for r in rows]
+    core_s = [float(r["core_c"]) if r.get("core_c") is not None else None for r in rows]
+    peri_s = [float(r["peripheral_c"]) if r.get("peripheral_c") is not None else None for r in rows]
+    gaps = [(times[i] - times[i - 1]).total_seconds() for i in range(1, len(times))]
+    med = statistics.median(gaps) if gaps else None
+    df = pd.DataFrame({"Time (Local)": [t.strftime("%Y-%m-%d %H:%M:%S") for t in times],
+                       "Core (°C)": core_s, "Peripheral (°C)": peri_s})
+    return med, df
+
+def columnar(rows):
+    s = tanzim_sensors.SensorSeries.from_rows(rows)
+    g = s.gaps()
+    df = s.to_frame(TZ)
+    df["time"] = s.labels(TZ)
+    return g.median_s, df
+
+def _time(fn, rows, reps):
+    best = float("inf")
+    for _ in range(reps):
+        t = time.perf_counter(); out = fn(rows); best = min(best, time.perf_counter() - t)
+    return best * 1000, out
+
+def run(sizes, reps):
+    print(f"{'rows':>8} {'per-row ms':>11} {'columnar ms':>12} {'speedup':>8}  same gaps/table")
+    for n in sizes:
+        rows = _rows(n)
+        a_ms, (a_med, a_df) = _time(legacy, rows, reps)
+        b_ms, (b_med, b_df) = _time(columnar, rows, reps)
+        same = (a_med == b_med and (a_df.iloc[:, 0].to_numpy() == b_df["time"].to_numpy()).all()
+                and np.allclose(a_df.iloc[:, 2].astype(float), b_df["peripheral"], equal_nan=True))
+        print(f"{n:>8} {a_ms:>11.2f} {b_ms:>12.2f} {a_ms / b_ms:>7.1f}x  {same}")
+    s = tanzim_sensors.SensorSeries.from_rows(_rows(4096))
+    t = time.perf_counter()
+    for _ in range(1000):
+        s.between(s.t_ms[1000], s.t_ms[3000])
+    print(f"time slice of 4096 readings (views): {(time.perf_counter() - t):.3f} ms each")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", type=int, nargs="+", default=[240, 4096, 50_000])
+    ap.add_argument("--reps", type=int, default=5)
+    a = ap.parse_args()
+    run(a.sizes, a.reps)
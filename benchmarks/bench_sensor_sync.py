@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Network traffic of the monitor's sensor reads: the old per-rerun Supabase queries
+(latest row uncached + 240-row series every 30 s) vs tanzim_sensors.SensorSync, which
+mirrors readings locally and pulls only rows past each device's cursor.
+
+A device posts one reading every `--period` seconds of simulated time while `--viewers`
+sessions rerun the monitor every `--rerun` seconds.
+
+    python -m benchmarks.bench_sensor_sync
+    python -m benchmarks.bench_sensor_sync --minutes 120 --viewers 5
+"""
+import argparse, os, tempfile
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+import tanzim_db, tanzim_sensors
+from benchmarks.fake_supabase import FakeSupabase
+
+DEVICE = "esp8266-01"
+
+def _post(sb, t):
+    sb.table("sensor_readings").insert({"device_id": DEVICE, "created_at": t.isoformat(),
+                                        "core_c": 37.1, "peripheral_c": 33.4})
+
+def legacy_rerun(sb, now_s, cache):
+    """fetch_latest_sensor_sample (uncached) + fetch_sensor_series (st.cache_data ttl=30)."""
+    sb.table("sensor_readings").select("core_c,peripheral_c,created_at").eq("device_id", DEVICE) \
+      .order("created_at", desc=True).limit(1).execute()
+    if now_s - cache.get("t", -1e9) >= 30:
+        sb.table("sensor_readings").select("core_c,peripheral_c,created_at").eq("device_id", DEVICE) \
+          .order("created_at", desc=True).limit(240).execute()
+        cache["t"] = now_s
+
+def run(minutes, viewers, period, rerun):
+    t0 = datetime(2024, 7, 1, 9, tzinfo=timezone.utc)
+    steps = int(minutes * 60)
+    with tempfile.TemporaryDirectory() as tmp:
+        old, new = FakeSupabase(), FakeSupabase()
+        for i in range(240):      # history already on the server
+            for sb in (old, new):
+                _post(sb, t0 - timedelta(seconds=period * (240 - i)))
+        path = os.path.join(tmp, "bench.db")
+        db = tanzim_db.ConnectionManager(path)
+        clock = {"now": 0.0}
+        with mock.patch.object(tanzim_sensors.time, "monotonic", lambda: clock["now"]):
+            sync = tanzim_sensors.SensorSync(db, new)
+            cache, served = {}, 0
+            for s in range(steps):
+                clock["now"] = float(s)
+                if s % period == 0:
+                    for sb in (old, new):
+                        _post(sb, t0 + timedelta(seconds=s))
+                if s % rerun == 0:
+                    for _ in range(viewers):
+                        legacy_rerun(old, s, cache)
+                        sync.sync(DEVICE)
+                        served += len(tanzim_sensors.series(db.reader(), DEVICE, 240))
+        posted = steps // period
+        print(f"{minutes} min, {viewers} viewers, reading every {period}s, rerun every {rerun}s "
+              f"({posted} new readings)")
+        for label, sb in (("per-rerun queries", old), ("mirror + cursor", new)):
+            st_ = sb.stats
+            print(f"{label:<18} requests={st_['requests']:>6}  rows={st_['rows']:>7}  bytes={st_['bytes']:>9}")
+        print(f"mirror rows pulled after initial sync: {new.stats['rows'] - 240} (new readings: {posted})")
+        db.close()
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--minutes", type=float, default=60)
+    ap.add_argument("--viewers", type=int, default=3)
+    ap.add_argument("--period", type=int, default=10)
+    ap.add_argument("--rerun", type=int, default=5)
+    a = ap.parse_args()
+    run(a.minutes, a.viewers, a.period, a.rerun)
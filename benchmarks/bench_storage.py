@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Journal/temps read latency at growing history sizes, on the schema
+tanzim_db.ensure_schema migrates to, with and without its journal/temps indexes.
+
+    python -m benchmarks.bench_storage                 # 10k / 100k / 1M rows
+    python -m benchmarks.bench_storage --sizes 10000 --users 50
+"""
+import argparse, json, os, random, statistics, tempfile, time
+from datetime import datetime, timedelta, timezone
+
+import tanzim_db, tanzim_journal
+
+SINCE = "2024-01-01T00:00:00.000Z"
+
+# The hot per-rerun reads issued by tanzim_ms.py, through the same tanzim_journal calls
+QUERIES = {
+    "recent_entries": lambda conn, u: tanzim_journal.recent_entries(conn, u),
+    "journal_page": lambda conn, u: tanzim_journal.page(conn, u),
+    "page_recovery": lambda conn, u: tanzim_journal.page(conn, u, types=["RECOVERY"]),
+    "count_entries": lambda conn, u: tanzim_journal.count_entries(conn, u),
+    "top_actions": lambda conn, u: tanzim_journal.top_actions(conn, u, SINCE),
+    "recovery_stats": lambda conn, u: tanzim_journal.recovery_stats(conn, u, SINCE),
+    "fetch_temps_df": lambda conn, u: conn.execute(
+        """SELECT date, body_temp, peripheral_temp, weather_temp, feels_like, humidity, status
+           FROM temps WHERE username=? ORDER BY date ASC""", (u,)).fetchall(),
+}
+
+def _iso(dt):
+    return dt.isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+def populate(conn, n_rows: int, n_users: int, seed: int = 7):
+    rnd = random.Random(seed)
+    t0 = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    types = ["DAILY", "ALERT_AUTO", "RECOVERY", "PLAN", "NOTE"]
+    batch_j, batch_a, batch_t = [], [], []
+    def flush():
+        conn.executemany("""INSERT INTO journal(id, username, date, entry, type, at, core, baseline, note,
+                            duration_min, core_before, core_after) VALUES (?,?,?,?,?,?,?,?,?,?,?,?)""", batch_j)
+        conn.executemany("INSERT INTO journal_actions(journal_id, value) VALUES (?,?)", batch_a)
+        conn.executemany("INSERT INTO temps VALUES (?,?,?,?,?,?,?,?)", batch_t)
+        conn.commit(); batch_j.clear(); batch_a.clear(); batch_t.clear()
+    for i in range(1, n_rows + 1):
+        u = f"user{rnd.randrange(n_users)}"
+        dt = _iso(t0 + timedelta(seconds=i * 30))
+        typ, core = rnd.choice(types), round(36.5 + rnd.random() * 1.5, 2)
+        entry = {"type": typ, "at": dt, "core_temp": core, "baseline": 37.0, "note": "bench"}
+        rec = typ == "RECOVERY"
+        batch_j.append((i, u, dt, json.dumps(entry), typ, dt, core, 37.0, "bench",
+                        rnd.randrange(10, 60) if rec else None, core if rec else None, 37.0 if rec else None))
+        if rec:
+            batch_a += [(i, "Cool shower"), (i, "Drank water")]
+        batch_t.append((u, dt, 37.0, 33.0, 40.0, 43.0, 55.0, "Caution"))
+        if len(batch_j) >= 50_000:
+            flush()
+    if batch_j:
+        flush()
+
+def drop_indexes(conn) -> list[str]:
+    """Drop the journal/temps indexes ensure_schema created; returns their DDL to restore them."""
+    rows = conn.execute("""SELECT name, sql FROM sqlite_master WHERE type='index' AND sql IS NOT NULL
+                           AND tbl_name IN ('journal', 'temps')""").fetchall()
+    for name, _ in rows:
+        conn.execute(f"DROP INDEX {name}")
+    conn.commit()
+    return [ddl for _, ddl in rows]
+
+def time_query(conn, fn, users: list[str], repeat: int) -> float:
+    """Median wall time (ms) of one read for a random user."""
+    samples = []
+    for i in range(repeat):
+        u = users[i % len(users)]
+        t = time.perf_counter()
+        fn(conn, u)
+        samples.append((time.perf_counter() - t) * 1000)
+    return statistics.median(samples)
+
+def run(sizes, n_users, repeat):
+    print(f"{'rows':>9} {'query':<18} {'no index (ms)':>14} {'indexed (ms)':>13} {'speedup':>8}")
+    for n in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bench.db")
+            conn = tanzim_db.connect(path)
+            tanzim_db.ensure_schema(conn, path)
+            populate(conn, n, n_users)
+            conn.execute("PRAGMA optimize")
+            users = [f"user{i}" for i in range(n_users)]
+            indexed = {k: time_query(conn, q, users, repeat) for k, q in QUERIES.items()}
+            dropped = drop_indexes(conn)
+            plain = {k: time_query(conn, q, users, repeat) for k, q in QUERIES.items()}
+            for ddl in dropped:
+                conn.execute(ddl)
+            for k in QUERIES:
+                sp = plain[k] / indexed[k] if indexed[k] > 0 else float("inf")
+                print(f"{n:>9} {k:<18} {plain[k]:>14.2f} {indexed[k]:>13.2f} {sp:>7.1f}x")
+            conn.close()
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    ap.add_argument("--users", type=int, default=100)
+    ap.add_argument("--repeat", type=int, default=20)
+    a = ap.parse_args()
+    run(a.sizes, a.users, a.repeat)
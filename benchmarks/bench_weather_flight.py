@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+Load test for the weather client's single-flight coalescing and shared quota: 200
+simulated sessions against the local OpenWeather stand-in.
+
+1. Stampede: every session asks for one of a few cities at the same instant (as after
+   a refresh), with and without single-flight; compares upstream requests and latency.
+2. Store refresh stampede: every session forces WeatherStore.refresh on one city.
+3. Quota: sessions keep looking up coordinates through a client with a token bucket;
+   upstream requests must stay within burst + rate × elapsed, and once a lookup has
+   been answered, going over quota serves that answer instead of an error.
+
+Each phase asserts its property (one upstream request per key per flight, the quota
+never exceeded, over-quota callers served the cached answer without an error), so a
+regression exits non-zero; tests/test_weather_flight.py runs it at a smaller scale.
+
+    python -m benchmarks.bench_weather_flight
+    python -m benchmarks.bench_weather_flight --sessions 500 --latency-ms 150 --calls-per-min 120
+"""
+import argparse, os, statistics, tempfile, threading, time
+
+import tanzim_db, tanzim_weather
+from benchmarks.openweather_standin import StandIn
+
+CITIES = ["Abu Dhabi,AE", "Dubai,AE", "Doha,QA", "Riyadh,SA", "Muscat,OM"]
+
+def _sessions(n, fn):
+    """Run fn(i) on n threads released together; (latencies ms, errors)."""
+    gate = threading.Barrier(n)
+    lat, errors, lock = [], [], threading.Lock()
+
+    def session(i):
+        gate.wait()
+        t = time.perf_counter()
+        try:
+            fn(i)
+        except Exception as e:
+            with lock:
+                errors.append(e)
+        with lock:
+            lat.append((time.perf_counter() - t) * 1000)
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return lat, errors
+
+def stampede(srv, sessions):
+    for flight in (False, True):
+        client = tanzim_weather.WeatherClient("k", base_url=srv.base, geo_url=srv.geo, pool_size=32,
+                                              single_flight=flight)
+        srv.reset()
+        lat, err = _sessions(sessions, lambda i: client.weather(CITIES[i % len(CITIES)]))
+        m = client.metrics()
+        print(f"  single-flight {'on ' if flight else 'off'}: {srv.requests:>4} upstream requests, "
+              f"{srv.connections:>3} connections, coalesced {m['weather']['coalesced'] + m['forecast']['coalesced']:>4}, "
+              f"p50 {statistics.median(lat):7.1f} ms, max {max(lat):7.1f} ms, errors {len(err)}")
+        client.close()
+        assert not err, err[:3]
+        if flight:
+            assert srv.max_per_key == 1, f"{srv.max_per_key} identical requests upstream at once"
+            for ep in ("weather", "forecast"):
+                # one upstream request per flight (its leader), every other session joined one
+                assert srv.by_endpoint[ep] == m[ep]["calls"], (ep, srv.by_endpoint[ep], m[ep]["calls"])
+                assert m[ep]["calls"] + m[ep]["coalesced"] == sessions, (ep, m[ep])
+        else:
+            assert srv.requests == 2 * sessions
+
+def store_refresh(srv, sessions):
+    client = tanzim_weather.WeatherClient("k", base_url=srv.base, geo_url=srv.geo, pool_size=32)
+    with tempfile.TemporaryDirectory() as tmp:
+        db = tanzim_db.ConnectionManager(os.path.join(tmp, "wx.db"))
+        store = tanzim_weather.WeatherStore(db, client, ttl=600)
+        srv.reset()
+        lat, err = _sessions(sessions, lambda i: store.refresh(CITIES[0]))
+        n = db.reader().execute("SELECT COUNT(*) FROM weather_obs").fetchone()[0]
+        print(f"  {sessions} forced refreshes of one city: {srv.requests} upstream requests, "
+              f"p50 {statistics.median(lat):.1f} ms, errors {len(err)}, {n} observations stored")
+        store.close(); db.close()
+    # each store flight is one current + one forecast request and one stored observation
+    assert not err and srv.max_per_key == 1 and srv.requests == 2 * n, (err[:3], srv.max_per_key, srv.requests, n)
+    client.close()
+
+def quota(srv, sessions, calls_per_min, rounds, places):
+    bucket = tanzim_weather.TokenBucket.per_minute(calls_per_min)
+    client = tanzim_weather.WeatherClient("k", base_url=srv.base, geo_url=srv.geo, pool_size=32, limiter=bucket)
+    coords = [(24.0 + k / 10, 54.0 + k / 10) for k in range(places)]
+    answered, lock = set(), threading.Lock()
+    limited, strays = [], []
+
+    def lookups(i):
+        for r in range(rounds):
+            k = (i + r * 7) % places
+            try:
+                client.current(lat=coords[k][0], lon=coords[k][1])
+                with lock:
+                    answered.add(k)
+            except tanzim_weather.RateLimited:
+                with lock:
+                    limited.append(k)
+                    if k in answered:
+                        strays.append(k)      # had an answer to serve, but raised
+            time.sleep(0.05)
+
+    srv.reset()
+    t0 = time.monotonic()
+    lat, err = _sessions(sessions, lookups)
+    elapsed = time.monotonic() - t0
+    budget = bucket.burst + bucket.rate * elapsed
+    m = client.metrics()["weather"]
+    print(f"  {sessions} sessions × {rounds} lookups over {places} places in {elapsed:.1f}s: "
+          f"{srv.requests} upstream requests (quota allows {budget:.0f}), coalesced {m['coalesced']}, "
+          f"throttled {m['throttled']}")
+    print(f"  over quota: {m['throttled'] - len(limited)} served the last answer, {len(limited)} raised "
+          f"RateLimited (all for places never answered yet: {not strays}); {len(answered)}/{places} places answered")
+    client.close()
+    assert not err, err[:3]
+    assert srv.requests <= budget, f"{srv.requests} upstream requests over a quota of {budget:.0f}"
+    assert not strays, f"{len(strays)} over-quota lookups raised although an answer was cached"
+    assert m["throttled"] > len(limited), "no over-quota lookup was served the cached answer"
+
+def run(sessions, latency_ms, calls_per_min, rounds, places):
+    srv = StandIn(latency_ms)
+    try:
+        print(f"stampede: {sessions} sessions, {len(CITIES)} cities, {latency_ms:.0f} ms upstream")
+        stampede(srv, sessions)
+        print("store:")
+        store_refresh(srv, sessions)
+        print(f"quota: {calls_per_min:.0f} calls/min")
+        quota(srv, sessions, calls_per_min, rounds, places)
+    finally:
+        srv.close()
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sessions", type=int, default=200)
+    ap.add_argument("--latency-ms", type=float, default=80)
+    ap.add_argument("--calls-per-min", type=float, default=60)
+    ap.add_argument("--rounds", type=int, default=5, help="lookups per session in the quota phase")
+    ap.add_argument("--places", type=int, default=20, help="distinct lookups; more than the burst leaves some unanswered")
+    a = ap.parse_args()
+    run(a.sessions, a.latency_ms, a.calls_per_min, a.rounds, a.places)
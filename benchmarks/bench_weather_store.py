@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+tanzim_weather.WeatherStore (persistent stale-while-revalidate weather) against the local
+OpenWeather stand-in: cold fetch, fresh and stale reads (stale ones must not wait for the
+network, and a burst of them starts one refresh), a restart and a second process on the
+same database (both served from SQLite without a fetch), and the stored history.
+
+    python -m benchmarks.bench_weather_store
+    python -m benchmarks.bench_weather_store --latency-ms 150 --readers 200
+"""
+import argparse, os, statistics, tempfile, time
+from concurrent.futures import ThreadPoolExecutor
+
+import tanzim_db, tanzim_weather
+from benchmarks.openweather_standin import StandIn
+
+CITY = "Abu Dhabi,AE"
+
+def _ms(fn):
+    t = time.perf_counter(); out = fn(); return (time.perf_counter() - t) * 1000, out
+
+def run(latency_ms, readers, ttl):
+    srv = StandIn(latency_ms)
+    client = tanzim_weather.WeatherClient("k", base_url=srv.base, geo_url=srv.geo)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "wx.db")
+        db = tanzim_db.ConnectionManager(path)
+        store = tanzim_weather.WeatherStore(db, client, ttl=ttl)
+        ms, (w, err, _) = _ms(lambda: store.get(CITY))
+        print(f"cold get: {ms:.1f} ms (network), forecast slots {len(w['forecast'])}, error {err}")
+        fresh = [_ms(lambda: store.get(CITY))[0] for _ in range(1000)]
+        print(f"fresh get: p50 {statistics.median(fresh) * 1000:.1f} µs")
+
+        time.sleep(ttl + 0.05)
+        srv.reset()
+        with ThreadPoolExecutor(32) as ex:
+            lat = list(ex.map(lambda _: _ms(lambda: store.get(CITY))[0], range(readers)))
+        stale_reqs = srv.requests
+        time.sleep(latency_ms / 1000 * 2 + 0.1)              # let the background refresh land
+        print(f"{readers} concurrent stale gets: p50 {statistics.median(lat):.2f} ms, max {max(lat):.2f} ms; "
+              f"{srv.requests} upstream requests (one refresh = current + forecast), "
+              f"{stale_reqs} issued while readers were served")
+
+        srv.reset()
+        other = tanzim_weather.WeatherStore(tanzim_db.ConnectionManager(path), client, ttl=3600)
+        ms, (w2, _, ts) = _ms(lambda: other.get(CITY))
+        print(f"second process: {ms:.2f} ms from SQLite, {srv.requests} requests, "
+              f"same reading: {w2 == store.get(CITY)[0]}")
+        store.close(); other.close(); db.close()
+
+        srv.reset()
+        db = tanzim_db.ConnectionManager(path)
+        restarted = tanzim_weather.WeatherStore(db, client, ttl=3600)
+        ms, (w3, _, _) = _ms(lambda: restarted.get(CITY))
+        print(f"after restart: {ms:.2f} ms from SQLite, {srv.requests} requests, peak hours {len(w3['peak_hours'])}")
+        for _ in range(5):
+            restarted.refresh(CITY)
+        t, fl, hum = tanzim_weather.history(db.reader(), CITY)
+        fc = db.reader().execute("SELECT COUNT(DISTINCT fetched_ms), COUNT(*) FROM weather_forecast").fetchone()
+        print(f"history: {len(t)} observations of {CITY}, {fc[0]} forecast issues / {fc[1]} slots stored")
+        restarted.close(); db.close()
+    client.close(); srv.close()
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--latency-ms", type=float, default=80)
+    ap.add_argument("--readers", type=int, default=100)
+    ap.add_argument("--ttl", type=float, default=0.5, help="revalidation age in seconds (short for the demo)")
+    a = ap.parse_args()
+    run(a.latency_ms, a.readers, a.ttl)
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+In-memory stand-in for the slice of the supabase-py query builder the app uses
+(table().select().eq().gt()/gte()/lt().order().limit().execute()), so sync benchmarks can
+count requests and transferred rows/bytes without a network.
+"""
+import json, threading
+from collections import Counter
+from types import SimpleNamespace
+
+class FakeQuery:
+    def __init__(self, client, table):
+        self.client, self.table = client, table
+        self.cols, self.filters, self.order_by, self.desc, self.n = None, [], None, False, None
+
+    def select(self, cols):
+        self.cols = [c.strip() for c in cols.split(",")]; return self
+    def eq(self, col, v):
+        self.filters.append(lambda r: r.get(col) == v); return self
+    def gt(self, col, v):
+        self.filters.append(lambda r: r.get(col) > v); return self
+    def gte(self, col, v):
+        self.filters.append(lambda r: r.get(col) >= v); return self
+    def lt(self, col, v):
+        self.filters.append(lambda r: r.get(col) < v); return self
+    def order(self, col, desc=False):
+        self.order_by, self.desc = col, desc; return self
+    def limit(self, n):
+        self.n = n; return self
+
+    def execute(self):
+        with self.client.lock:
+            rows = [r for r in self.client.tables.get(self.table, []) if all(f(r) for f in self.filters)]
+        if self.order_by:
+            rows.sort(key=lambda r: r[self.order_by], reverse=self.desc)
+        if self.n is not None:
+            rows = rows[:self.n]
+        if self.cols:
+            rows = [{c: r.get(c) for c in self.cols} for r in rows]
+        self.client.stats["requests"] += 1
+        self.client.stats["rows"] += len(rows)
+        self.client.stats["bytes"] += len(json.dumps(rows))
+        return SimpleNamespace(data=rows)
+
+    def insert(self, row):
+        with self.client.lock:
+            self.client.tables.setdefault(self.table, []).append(dict(row))
+        return self
+
+class FakeSupabase:
+    def __init__(self):
+        self.tables: dict[str, list[dict]] = {}
+        self.lock = threading.Lock()
+        self.stats = Counter()
+
+    def table(self, name):
+        return FakeQuery(self, name)
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+tanzim_weather.WeatherClient against a local HTTP stand-in for OpenWeather (current
+weather, 5-day forecast, direct geocoding) with configurable latency and injected
+failures (503s and dropped connections).
+
+Checks the parsed payloads, then compares the old per-call path (two sequential
+requests.get, a new connection each) with the pooled client (keep-alive, current +
+forecast concurrently) on latency and TCP connections opened, and shows retries
+absorbing the injected failures. Prints the client's per-endpoint metrics.
+tests/test_weather_client.py asserts the retry, give-up and concurrency behaviour
+against the same stand-in, using fail_next() for deterministic failures.
+
+    python -m benchmarks.openweather_standin
+    python -m benchmarks.openweather_standin --latency-ms 80 --fail-rate 0.3 --calls 100
+"""
+import argparse, json, random, socket, statistics, threading, time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+import tanzim_weather
+
+def _current(city):
+    h = sum(map(ord, city)) % 10
+    return {"main": {"temp": 38.0 + h / 10, "feels_like": 41.5 + h / 10, "humidity": 40 + h},
+            "weather": [{"description": "clear sky"}], "name": city.split(",")[0]}
+
+def _forecast(city):
+    h = sum(map(ord, city)) % 10
+    t0 = 1_719_792_000
+    return {"list": [{"dt": t0 + 10800 * i,
+                      "dt_txt": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(t0 + 10800 * i)),
+                      "main": {"temp": 33.0 + (i % 8), "feels_like": 36.0 + (i % 8) + h / 10, "humidity": 50 - i % 8},
+                      "weather": [{"description": "sunny"}]} for i in range(40)]}
+
+class StandIn:
+    """
+    ThreadingHTTPServer speaking the three OpenWeather endpoints the app calls (HTTP/1.1
+    keep-alive). Tracks requests per endpoint, how many were in flight at once, and the
+    most in flight at once for any one endpoint + place.
+    """
+    def __init__(self, latency_ms: float = 40, fail_rate: float = 0.0, seed: int = 1, slow_s: float = 1.0):
+        self.latency = latency_ms / 1000
+        self.fail_rate = fail_rate
+        self.slow_s = slow_s
+        self.rnd = random.Random(seed)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+        self.failures = 0
+        self.by_endpoint = Counter()
+        self.inflight = self.max_inflight = 0
+        self._inflight_keys = Counter()
+        self.max_per_key = 0
+        self._script: dict[str, list[str]] = {}
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)   # as real servers do
+                with standin.lock:
+                    standin.connections += 1
+
+            def log_message(self, *a):
+                pass
+
+            def do_GET(self):
+                u = urlparse(self.path)
+                q = {k: v[0] for k, v in parse_qs(u.query).items()}
+                endpoint = u.path.rstrip("/").rsplit("/", 1)[-1]
+                key = (endpoint, q.get("q"), q.get("lat"), q.get("lon"))
+                with standin.lock:
+                    standin._inflight_keys[key] += 1
+                    standin.max_per_key = max(standin.max_per_key, standin._inflight_keys[key])
+                    standin.requests += 1
+                    standin.by_endpoint[endpoint] += 1
+                    standin.inflight += 1
+                    standin.max_inflight = max(standin.max_inflight, standin.inflight)
+                    scripted = standin._script.get(endpoint)
+                    mode = scripted.pop(0) if scripted else None
+                    if mode is None:
+                        fail = standin.rnd.random() < standin.fail_rate
+                        drop = fail and standin.rnd.random() < 0.3
+                    else:
+                        fail, drop = mode in ("503", "drop"), mode == "drop"
+                    standin.failures += fail or mode == "slow"
+                try:
+                    time.sleep(standin.slow_s if mode == "slow" else standin.latency)
+                finally:
+                    with standin.lock:
+                        standin.inflight -= 1
+                        standin._inflight_keys[key] -= 1
+                if drop:                               # connection reset mid-request
+                    self.close_connection = True
+                    self.connection.shutdown(2)
+                    return
+                if fail:
+                    return self._send(503, {"cod": 503, "message": "busy"})
+                if not q.get("appid"):
+                    return self._send(401, {"cod": 401, "message": "Invalid API key"})
+                city = q.get("q") or f"{q.get('lat')},{q.get('lon')}"
+                if u.path.endswith("/data/2.5/weather"):
+                    return self._send(200, _current(city))
+                if u.path.endswith("/data/2.5/forecast"):
+                    return self._send(200, _forecast(city))
+                if u.path.endswith("/geo/1.0/direct"):
+                    return self._send(200, [] if city.startswith("Nowhere") else
+                                      [{"name": city.title(), "lat": 24.45, "lon": 54.38, "country": "AE"}])
+                self._send(404, {"cod": 404})
+
+            def _send(self, code, body):
+                raw = json.dumps(body).encode()
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    @property
+    def base(self):
+        return f"http://127.0.0.1:{self.port}/data/2.5/"
+
+    @property
+    def geo(self):
+        return f"http://127.0.0.1:{self.port}/geo/1.0/"
+
+    def fail_next(self, endpoint: str, *modes: str):
+        """Answer the next requests to endpoint ("weather", "forecast", "direct") with "503", "drop" or "slow"."""
+        with self.lock:
+            self._script.setdefault(endpoint, []).extend(modes)
+
+    def reset(self, fail_rate=None):
+        with self.lock:
+            self.connections = self.requests = self.failures = self.max_inflight = self.max_per_key = 0
+            self.by_endpoint.clear()
+            self._script.clear()
+            if fail_rate is not None:
+                self.fail_rate = fail_rate
+
+    def close(self):
+        self.server.shutdown()
+
+def legacy(base, city, key="k"):
+    """The app's old get_weather: two sequential requests.get, each on a fresh connection."""
+    params = {"q": city, "appid": key, "units": "metric", "lang": "en"}
+    r_now = requests.get(base + "weather", params=params, timeout=6)
+    r_now.raise_for_status()
+    r_fc = requests.get(base + "forecast", params=params, timeout=8)
+    r_fc.raise_for_status()
+    fc = tanzim_weather.parse_forecast(r_fc.json())
+    return {**tanzim_weather.parse_current(r_now.json()), "forecast": fc, "peak_hours": tanzim_weather.peak_hours(fc)}
+
+def _timed(fn, calls):
+    lat, errors = [], 0
+    for i in range(calls):
+        t = time.perf_counter()
+        try:
+            fn(i)
+        except Exception:
+            errors += 1
+        lat.append((time.perf_counter() - t) * 1000)
+    return statistics.median(lat), max(lat), errors
+
+def run(latency_ms, fail_rate, calls):
+    srv = StandIn(latency_ms)
+    client = tanzim_weather.WeatherClient("k", base_url=srv.base, geo_url=srv.geo, backoff=0.05)
+    cities = ["Abu Dhabi,AE", "Dubai,AE", "Doha,QA", "Riyadh,SA", "Muscat,OM"]
+    try:
+        w = client.weather("Dubai,AE")
+        ok = (w == legacy(srv.base, "Dubai,AE") and len(w["forecast"]) == tanzim_weather.FORECAST_ITEMS
+              and len(w["peak_hours"]) == 4 and client.geocode("corniche") == ("Corniche", 24.45, 54.38)
+              and client.geocode("Nowhere") == ("Nowhere", None, None)
+              and client.current(lat=24.45, lon=54.38) == tanzim_weather.parse_current(_current("24.45,54.38")))
+        bad = tanzim_weather.WeatherClient("", base_url=srv.base, geo_url=srv.geo)
+        try:
+            bad.current("Dubai,AE"); auth = False
+        except requests.HTTPError:
+            auth = bad.stats["weather.retries"] == 0     # 401 is not retried
+        print(f"payloads match the old parser: {ok}; 401 raised without retry: {auth}")
+
+        srv.reset()
+        med, mx, err = _timed(lambda i: legacy(srv.base, cities[i % len(cities)]), calls)
+        conns = srv.connections
+        print(f"old get_weather:  p50 {med:6.1f} ms  max {mx:6.1f} ms  errors {err}  connections {conns}")
+        srv.reset()
+        med, mx, err = _timed(lambda i: client.weather(cities[i % len(cities)]), calls)
+        print(f"WeatherClient:    p50 {med:6.1f} ms  max {mx:6.1f} ms  errors {err}  connections {srv.connections}")
+
+        srv.reset(fail_rate)
+        _, _, err = _timed(lambda i: legacy(srv.base, cities[i % len(cities)]), calls)
+        print(f"with {fail_rate:.0%} injected failures: old path failed {err}/{calls} calls;", end=" ")
+        srv.reset(fail_rate)
+        before = dict(client.stats)
+        med, mx, err = _timed(lambda i: client.weather(cities[i % len(cities)]), calls)
+        retried = sum(v - before.get(k, 0) for k, v in client.stats.items() if k.endswith(".retries"))
+        print(f"client failed {err}/{calls} ({retried} retries, {srv.failures} failures injected, p50 {med:.1f} ms)")
+        for ep, m in client.metrics().items():
+            print(f"  {ep:<9} calls {m['calls']:>4}  errors {m['errors']:>3}  retries {m['retries']:>3}  "
+                  f"p50 {m['p50_ms']:6.1f} ms  p95 {m['p95_ms']:6.1f} ms  max {m['max_ms']:6.1f} ms")
+    finally:
+        client.close()
+        srv.close()
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--latency-ms", type=float, default=40)
+    ap.add_argument("--fail-rate", type=float, default=0.2)
+    ap.add_argument("--calls", type=int, default=50)
+    a = ap.parse_args()
+    run(a.latency_ms, a.fail_rate, a.calls)
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+End-to-end check of tanzim_realtime.RealtimeFeed against a local websocket stand-in that
+speaks the part of the Supabase realtime (Phoenix) protocol the client uses: phx_join with
+postgres_changes bindings, heartbeats, acked broadcasts (the feed's pings) and INSERT
+change messages.
+
+It measures insert -> device-ring latency and then drops the socket while the "device"
+keeps writing to the REST stand-in, to check backoff, reconnect and gap backfill (no row
+missing, none duplicated, no polling while live).
+
+    python -m benchmarks.realtime_standin
+    python -m benchmarks.realtime_standin --readings 500 --interval-ms 10
+"""
+import argparse, asyncio, json, os, statistics, tempfile, threading, time
+from datetime import datetime, timedelta, timezone
+
+from websockets.asyncio.server import serve
+
+import tanzim_db, tanzim_realtime, tanzim_sensors
+from benchmarks.fake_supabase import FakeSupabase
+
+DEVICE = "esp8266-01"
+
+class StandIn:
+    """Websocket server + REST table sharing one in-memory 'database'."""
+    def __init__(self):
+        self.rest = FakeSupabase()
+        self.clients = set()
+        self.push_enabled = True
+        self.loop = None
+        self.port = None
+        self.binding_id = 4242
+
+    async def handler(self, ws):
+        self.clients.add(ws)
+        try:
+            async for raw in ws:
+                msg = json.loads(raw)
+                ev, topic, ref = msg.get("event"), msg.get("topic"), msg.get("ref")
+                if ev == "phx_join":
+                    binds = msg["payload"]["config"].get("postgres_changes") or []
+                    resp = {"postgres_changes": [{"id": self.binding_id, **b} for b in binds]}
+                    await ws.send(json.dumps({"topic": topic, "event": "phx_reply", "ref": ref,
+                                              "payload": {"status": "ok", "response": resp}}))
+                elif ev in ("heartbeat", "broadcast"):
+                    await ws.send(json.dumps({"topic": topic, "event": "phx_reply", "ref": ref,
+                                              "payload": {"status": "ok", "response": {}}}))
+        finally:
+            self.clients.discard(ws)
+
+    def insert(self, row):
+        """Device POST: lands in the table, then is pushed to subscribers (if the socket is up)."""
+        self.rest.table("sensor_readings").insert(row)
+        if self.push_enabled and self.clients:
+            msg = json.dumps({"topic": "realtime:tanzim-sensors", "event": "postgres_changes", "ref": None,
+                              "payload": {"ids": [self.binding_id], "data": {
+                                  "schema": "public", "table": "sensor_readings", "type": "INSERT",
+                                  "commit_timestamp": row["created_at"], "errors": None, "columns": [],
+                                  "record": row}}})
+            for ws in list(self.clients):
+                asyncio.run_coroutine_threadsafe(ws.send(msg), self.loop)
+
+    def drop_all(self):
+        for ws in list(self.clients):
+            asyncio.run_coroutine_threadsafe(ws.close(), self.loop)
+
+    def start(self):
+        ready = threading.Event()
+        async def main():
+            self.loop = asyncio.get_running_loop()
+            async with serve(self.handler, "127.0.0.1", 0) as server:
+                self.port = server.sockets[0].getsockname()[1]
+                ready.set()
+                await asyncio.Future()
+        threading.Thread(target=lambda: asyncio.run(main()), daemon=True).start()
+        ready.wait(5)
+
+def _wait(pred, timeout):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if pred():
+            return True
+        time.sleep(0.002)
+    return False
+
+def run(n, interval_ms, gap):
+    server = StandIn(); server.start()
+    t0 = datetime(2024, 7, 1, 12, tzinfo=timezone.utc)
+    mk = lambda i: {"device_id": DEVICE, "created_at": (t0 + timedelta(seconds=i)).isoformat(),
+                    "core_c": 37.0 + (i % 10) / 20, "peripheral_c": 33.0}
+    for i in range(-50, 0):
+        server.insert(mk(i))      # history before the app starts
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = tanzim_db.ConnectionManager(os.path.join(tmp, "rt.db"))
+        sync = tanzim_sensors.SensorSync(db, server.rest)
+        bufs = tanzim_sensors.DeviceBuffers(sync)
+        feed = tanzim_realtime.RealtimeFeed(sync, f"ws://127.0.0.1:{server.port}", "anon", backoff=0.2,
+                                            ping_interval=0.5, ping_timeout=1.0)
+        ring = bufs.ring(DEVICE)
+        if not _wait(lambda: feed.live, 10):
+            print("could not subscribe:", feed.last_error); return
+        feed.watch(DEVICE)
+        _wait(lambda: len(ring) >= 50, 5)
+        rest_before = server.rest.stats["requests"]
+
+        lat = []
+        for i in range(n):
+            v = ring.version
+            t = time.perf_counter()
+            server.insert(mk(i))
+            if _wait(lambda: ring.version > v, 2):
+                lat.append((time.perf_counter() - t) * 1000)
+            time.sleep(interval_ms / 1000)
+        lat.sort()
+        polls = server.rest.stats["requests"] - rest_before
+        print(f"push latency over {len(lat)}/{n} readings: p50={statistics.median(lat):.2f} ms "
+              f"p95={lat[int(len(lat) * 0.95) - 1]:.2f} ms max={lat[-1]:.2f} ms; REST requests while live: {polls}")
+
+        # drop the socket; readings keep landing in the table only
+        server.push_enabled = False
+        server.drop_all()
+        _wait(lambda: not feed.live, 5)
+        for i in range(n, n + gap):
+            server.insert(mk(i))
+        server.push_enabled = True
+        t = time.perf_counter()
+        ok = _wait(lambda: feed.live and len(ring) and ring.last_ms == int((t0 + timedelta(seconds=n + gap - 1)).timestamp() * 1000), 30)
+        print(f"reconnected + backfilled {gap} missed readings in {(time.perf_counter() - t):.2f} s: {'ok' if ok else 'FAIL'}")
+
+        conn = db.reader()
+        stored = conn.execute("SELECT COUNT(*) FROM sensor_readings WHERE device_id=?", (DEVICE,)).fetchone()[0]
+        expect = 50 + n + gap
+        w = ring.last(expect)
+        gaps = int((abs(w.t_ms[1:] - w.t_ms[:-1] - 1000) > 0).sum()) if len(w.t_ms) > 1 else 0
+        print(f"mirror rows {stored}/{expect}, ring rows {len(ring)}, irregular steps in ring: {gaps}")
+        print(f"feed stats: {dict(feed.stats)}")
+        feed.close()
+        db.close()
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--readings", type=int, default=200)
+    ap.add_argument("--interval-ms", type=float, default=20)
+    ap.add_argument("--gap", type=int, default=30, help="readings written while disconnected")
+    a = ap.parse_args()
+    run(a.readings, a.interval_ms, a.gap)
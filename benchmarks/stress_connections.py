@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+Concurrency stress test for tanzim_db.ConnectionManager.
+
+Many threads (stand-ins for Streamlit sessions) mix journal inserts, prefs upserts,
+page reads and a deliberately failing transaction. At the end it checks that:
+  * every committed insert is present exactly once and no rolled-back row leaked,
+  * each thread read its own writes immediately after committing,
+  * no operation hit 'database is locked' or any other error.
+Exits non-zero if the manager fails any of these (tests/test_connections.py runs the
+same workload under pytest).
+
+Also runs the same workload against a single shared connection (the old get_conn())
+to show the errors/latency that layout produces.
+
+    python -m benchmarks.stress_connections
+    python -m benchmarks.stress_connections --threads 64 --ops 300
+"""
+import argparse, os, random, sqlite3, statistics, sys, tempfile, threading, time
+
+import tanzim_db, tanzim_journal
+
+def _entry(rnd, i):
+    return {"type": "NOTE", "at": f"2024-01-01T00:00:{i % 60:02d}Z", "note": f"stress {i}",
+            "symptoms": rnd.sample(["Dizziness", "Fatigue", "Numbness"], 2), "actions": ["Drank water"]}
+
+def worker_pool(mgr, tid, ops, out, barrier):
+    rnd = random.Random(tid)
+    user = f"user{tid}"
+    lat, errors, stale, written = [], 0, 0, 0
+    with mgr.transaction() as conn:
+        conn.execute("INSERT OR IGNORE INTO users VALUES (?, 'x')", (user,))
+    barrier.wait()
+    for i in range(ops):
+        t = time.perf_counter()
+        try:
+            op = rnd.random()
+            if op < 0.45:
+                with mgr.transaction() as conn:
+                    tanzim_journal.insert_entry(conn, user, f"2024-01-01T{tid:03d}:{i:06d}", _entry(rnd, i))
+                written += 1
+                # read-your-writes on this thread's reader
+                if tanzim_journal.count_entries(mgr.reader(), user) != written:
+                    stale += 1
+            elif op < 0.55:
+                with mgr.transaction() as conn:
+                    tanzim_db.write_user_prefs(conn, user, {"home_city": rnd.choice(["Dubai,AE", "Doha,QA"])},
+                                               "2024-01-01T00:00:00Z")
+            elif op < 0.60:
+                try:
+                    with mgr.transaction() as conn:
+                        tanzim_journal.insert_entry(conn, user, "9999-rolled-back", _entry(rnd, i))
+                        raise RuntimeError("abort")
+                except RuntimeError:
+                    pass
+            else:
+                tanzim_journal.page(mgr.reader(), user, limit=12)
+        except sqlite3.Error:
+            errors += 1
+        lat.append((time.perf_counter() - t) * 1000)
+    out[tid] = (lat, errors, stale, written)
+
+def worker_shared(conn, tid, ops, out, barrier):
+    """The old layout: one connection, implicit transactions, commit() after each write."""
+    rnd = random.Random(tid)
+    user = f"user{tid}"
+    lat, errors, stale, written = [], 0, 0, 0
+    barrier.wait()
+    for i in range(ops):
+        t = time.perf_counter()
+        try:
+            op = rnd.random()
+            if op < 0.55:
+                tanzim_journal.insert_entry(conn, user, f"2024-01-01T{tid:03d}:{i:06d}", _entry(rnd, i))
+                conn.commit()
+                written += 1
+            elif op < 0.60:
+                tanzim_journal.insert_entry(conn, user, "9999-rolled-back", _entry(rnd, i))
+                conn.rollback()
+            else:
+                tanzim_journal.page(conn, user, limit=12)
+        except Exception:   # the shared connection also surfaces SystemError/InterfaceError
+            errors += 1
+        lat.append((time.perf_counter() - t) * 1000)
+    out[tid] = (lat, errors, stale, written)
+
+def _run(target, arg, threads, ops):
+    out, barrier = {}, threading.Barrier(threads)
+    ts = [threading.Thread(target=target, args=(arg, i, ops, out, barrier)) for i in range(threads)]
+    t0 = time.perf_counter()
+    for t in ts: t.start()
+    for t in ts: t.join()
+    return out, time.perf_counter() - t0
+
+def _report(label, out, wall, conn):
+    lat = sorted(x for v in out.values() for x in v[0])
+    errors = sum(v[1] for v in out.values())
+    stale = sum(v[2] for v in out.values())
+    written = sum(v[3] for v in out.values())
+    stored = conn.execute("SELECT COUNT(*) FROM journal WHERE date != '9999-rolled-back'").fetchone()[0]
+    leaked = conn.execute("SELECT COUNT(*) FROM journal WHERE date = '9999-rolled-back'").fetchone()[0]
+    orphans = conn.execute("SELECT COUNT(*) FROM journal_symptoms WHERE journal_id NOT IN (SELECT id FROM journal)"
+                           ).fetchone()[0]
+    ok = errors == 0 and stale == 0 and leaked == 0 and orphans == 0 and stored == written
+    print(f"{label:<14} ops/s={len(lat) / wall:>8.0f}  p50={statistics.median(lat):.2f} ms  "
+          f"p99={lat[int(len(lat) * 0.99) - 1]:.2f} ms  errors={errors}  stale-reads={stale}  "
+          f"committed={written} stored={stored} leaked={leaked} orphans={orphans}  {'OK' if ok else 'FAIL'}")
+    return ok
+
+def run(threads, ops):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "pool.db")
+        mgr = tanzim_db.ConnectionManager(path)
+        out, wall = _run(worker_pool, mgr, threads, ops)
+        ok = _report("manager", out, wall, mgr.reader())
+        print(f"{'':<14} {dict(mgr.stats)}")
+        mgr.close()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "shared.db")
+        conn = tanzim_db.connect(path, check_same_thread=False)
+        tanzim_db.ensure_schema(conn, path)
+        conn.executemany("INSERT INTO users VALUES (?, 'x')", [(f"user{i}",) for i in range(threads)])
+        conn.commit()
+        out, wall = _run(worker_shared, conn, threads, ops)
+        _report("shared conn", out, wall, conn)     # expected to fail: the layout being replaced
+        conn.close()
+    return ok
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--threads", type=int, default=32)
+    ap.add_argument("--ops", type=int, default=200)
+    a = ap.parse_args()
+    sys.exit(0 if run(a.threads, a.ops) else 1)
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+# TANZIM MS — Device alerts, evaluated without a browser session (no Streamlit imports)
+# -----------------------------------------------------------------------------------------
+# Users register the devices they watch (the monitor does it on first view). tick() scores
+# every registration's newest reading in one NumPy pass against its owner's home-city
+# weather and writes ALERT_AUTO journal entries. Every alert claims a key in alert_log first,
+# so the worker, the monitor and any replay of the same tick journal it once.
+
+import sqlite3, time
+from datetime import datetime, timezone
+from typing import NamedTuple
+
+import numpy as np
+
+import tanzim_journal, tanzim_risk
+
+DEFAULT_CITY = "Abu Dhabi,AE"
+STALE_MS = 10 * 60_000                                 # older newest reading: device is not evaluated
+ALERT_LEVEL = tanzim_risk.STATUS_LEVEL["High"]         # risk alerts fire on escalation to High or above
+UHTHOFF_REASON = "ΔCore ≥ 0.5°C (Uhthoff)"
+
+ALERTS_SQL = (
+    """CREATE TABLE IF NOT EXISTS user_devices(
+        username TEXT NOT NULL,
+        device_id TEXT NOT NULL,
+        registered_at TEXT,
+        PRIMARY KEY (username, device_id)
+    ) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS alert_log(
+        id INTEGER PRIMARY KEY,
+        username TEXT NOT NULL,
+        device_id TEXT NOT NULL,
+        key TEXT NOT NULL,               -- 'uhthoff:<episode id>' or 'risk:<reading ms>:<level>'
+        level INTEGER,
+        reading_ms INTEGER,
+        created_at TEXT,
+        journal_id INTEGER,
+        UNIQUE (username, device_id, key)
+    )""",
+    """CREATE TABLE IF NOT EXISTS alert_state(
+        username TEXT NOT NULL,
+        device_id TEXT NOT NULL,
+        level INTEGER NOT NULL,          -- last evaluated level (index into STATUSES)
+        episode_id INTEGER,              -- last Uhthoff episode alerted
+        updated_ms INTEGER,
+        PRIMARY KEY (username, device_id)
+    ) WITHOUT ROWID""",
+)
+
+def create_tables(conn: sqlite3.Connection):
+    for ddl in ALERTS_SQL:
+        conn.execute(ddl)
+
+def _iso(ms: int | None = None) -> str:
+    dt = datetime.now(timezone.utc) if ms is None else datetime.fromtimestamp(ms / 1000, tz=timezone.utc)
+    return dt.isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+# ================== REGISTRY ==================
+def register_device(conn: sqlite3.Connection, username: str, device_id: str):
+    """Caller commits."""
+    conn.execute("INSERT OR IGNORE INTO user_devices(username, device_id, registered_at) VALUES (?,?,?)",
+                 (username, device_id, _iso()))
+
+def devices(conn: sqlite3.Connection) -> list[str]:
+    """Every registered device id (each synced once, whoever watches it)."""
+    return [d for (d,) in conn.execute("SELECT DISTINCT device_id FROM user_devices ORDER BY device_id")]
+
+def claim(conn: sqlite3.Connection, username: str, device_id: str, key: str, level: int | None = None,
+          reading_ms: int | None = None) -> int | None:
+    """Reserve an alert key; returns the alert_log id, or None if it was already raised. Caller commits."""
+    cur = conn.execute("""INSERT OR IGNORE INTO alert_log(username, device_id, key, level, reading_ms, created_at)
+                          VALUES (?,?,?,?,?,?)""", (username, device_id, key, level, reading_ms, _iso()))
+    return cur.lastrowid if cur.rowcount else None
+
+def journal_alert(conn: sqlite3.Connection, username: str, device_id: str, keys: list[str], entry: dict,
+                  level: int | None = None, reading_ms: int | None = None) -> int | None:
+    """
+    Journal `entry` once: claims every key and writes the entry if any of them was new.
+    Returns the journal id, or None if all keys had been raised already. Caller commits.
+    """
+    ids = [i for i in (claim(conn, username, device_id, k, level, reading_ms) for k in keys) if i is not None]
+    if not ids:
+        return None
+    jid = tanzim_journal.insert_entry(conn, username, entry["at"], entry)
+    conn.executemany("UPDATE alert_log SET journal_id=? WHERE id=?", [(jid, i) for i in ids])
+    return jid
+
+# ================== EVALUATION ==================
+SNAPSHOT_SQL = """
+    SELECT d.username, d.device_id, COALESCE(p.home_city, ?), s.baseline, u.last_ms, r.core_c, u.episode_id,
+           a.level, a.episode_id
+    FROM user_devices d
+    LEFT JOIN user_prefs p ON p.username = d.username
+    LEFT JOIN sensor_sync s ON s.device_id = d.device_id
+    LEFT JOIN uhthoff_state u ON u.device_id = d.device_id
+    LEFT JOIN sensor_readings r ON r.device_id = u.device_id AND r.t_ms = u.last_ms
+    LEFT JOIN alert_state a ON a.username = d.username AND a.device_id = d.device_id
+"""
+
+class Snapshot(NamedTuple):
+    username: list
+    device_id: list
+    city: np.ndarray          # object: home city per registration
+    baseline: np.ndarray      # float64, DEFAULT_BASELINE where unset
+    last_ms: np.ndarray       # int64, -1 = no reading yet
+    core: np.ndarray          # float64, NaN = missing
+    episode: np.ndarray       # int64 open Uhthoff episode, -1 = none
+    level: np.ndarray         # int8 last evaluated level, -1 = never evaluated
+    alerted: np.ndarray       # int64 last episode alerted, -1 = none
+
+def snapshot(conn: sqlite3.Connection, default_city: str = DEFAULT_CITY) -> Snapshot:
+    """Newest reading + detector/alert state for every registration, in one indexed query."""
+    rows = conn.execute(SNAPSHOT_SQL, (default_city,)).fetchall()
+    if not rows:
+        return Snapshot([], [], np.array([], dtype=object), *(np.array([]),) * 6)
+    user, dev, city, base, last, core, ep, lvl, alerted = zip(*rows)
+    num = lambda v, fill, dtype: np.array([fill if x is None else x for x in v], dtype=dtype)
+    return Snapshot(list(user), list(dev), np.array(city, dtype=object),
+                    num(base, tanzim_risk.DEFAULT_BASELINE, np.float64), num(last, -1, np.int64),
+                    num(core, np.nan, np.float64), num(ep, -1, np.int64), num(lvl, -1, np.int8),
+                    num(alerted, -1, np.int64))
+
+def tick(db, weather_for, now_ms: int | None = None, default_city: str = DEFAULT_CITY) -> dict:
+    """
+    Evaluate every registered device once. `weather_for(city)` returns the weather dict
+    (feels_like, humidity) or None; it is called once per distinct home city. Devices whose
+    newest reading is older than STALE_MS keep their state untouched. An alert fires on a
+    new Uhthoff episode, or when the level rises to High or above; state and alerts are
+    written in one transaction.
+    """
+    now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+    t0 = time.perf_counter()
+    s = snapshot(db.reader(), default_city)
+    n = len(s.username)
+    stats = {"devices": n, "evaluated": 0, "alerts": 0, "cities": 0}
+    if not n:
+        return stats
+    cities, ci = np.unique(s.city, return_inverse=True)
+    wx = [weather_for(c) for c in cities]
+    stats["cities"] = len(cities)
+    fl = np.array([w["feels_like"] if w else np.nan for w in wx], dtype=np.float64)[ci]
+    hum = np.array([w["humidity"] if w else np.nan for w in wx], dtype=np.float64)[ci]
+    risk = tanzim_risk.assess(fl, hum, s.core, s.baseline)
+
+    fresh = (s.last_ms >= 0) & (now_ms - s.last_ms <= STALE_MS)
+    escalated = fresh & (risk.level >= ALERT_LEVEL) & (risk.level > s.level)
+    new_episode = fresh & (s.episode >= 0) & (s.episode != s.alerted)
+    changed = fresh & ((risk.level != s.level) | new_episode)
+    stats["evaluated"] = int(fresh.sum())
+
+    with db.transaction() as conn:
+        idx = np.flatnonzero(changed).tolist()
+        conn.executemany("""INSERT INTO alert_state(username, device_id, level, episode_id, updated_ms)
+                            VALUES (?,?,?,?,?)
+                            ON CONFLICT(username, device_id) DO UPDATE SET
+                              level=excluded.level,
+                              episode_id=COALESCE(excluded.episode_id, alert_state.episode_id),
+                              updated_ms=excluded.updated_ms""",
+                         [(s.username[i], s.device_id[i], int(risk.level[i]),
+                           int(s.episode[i]) if new_episode[i] else None, now_ms) for i in idx])
+        for i in np.flatnonzero(escalated | new_episode).tolist():
+            lvl, core, base = int(risk.level[i]), s.core[i], s.baseline[i]
+            status = tanzim_risk.STATUSES[lvl]
+            keys, reasons = [], []
+            if new_episode[i]:
+                keys.append(f"uhthoff:{int(s.episode[i])}"); reasons.append(UHTHOFF_REASON)
+            if escalated[i]:
+                keys.append(f"risk:{int(s.last_ms[i])}:{lvl}"); reasons.append(f"Risk {status}")
+            entry = {
+                "type": "ALERT_AUTO", "at": _iso(now_ms),
+                "core_temp": None if np.isnan(core) else round(float(core), 2), "baseline": round(float(base), 2),
+                "delta_core": None if np.isnan(core) else round(float(core - base), 2),
+                "reasons": reasons, "symptoms": [], "status": status,
+                "city": s.city[i],
+                "feels_like": None if np.isnan(fl[i]) else float(fl[i]),
+                "humidity": None if np.isnan(hum[i]) else float(hum[i]),
+                "device_id": s.device_id[i], "source": "worker",
+            }
+            if journal_alert(conn, s.username[i], s.device_id[i], keys, entry, lvl, int(s.last_ms[i])) is not None:
+                stats["alerts"] += 1
+    stats["elapsed_ms"] = (time.perf_counter() - t0) * 1000
+    return stats
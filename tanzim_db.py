@@ -0,0 +1,530 @@
+# -*- coding: utf-8 -*-
+# TANZIM MS — SQLite storage layer (no Streamlit imports; safe for workers & benchmarks)
+# -----------------------------------------------------------------------------------------
+# Connections are opened in WAL mode so page reruns (readers) never block the writer,
+# and every hot query (username + date) is served by a composite index.
+
+import atexit, pathlib, sqlite3, threading, time
+from collections import Counter
+from contextlib import contextmanager
+
+import tanzim_alerts, tanzim_episodes, tanzim_journal, tanzim_rollup, tanzim_sensors, tanzim_weather
+
+DB_PATH = "tanzim_ms.db"
+
+# Tuned per-connection settings. WAL + synchronous=NORMAL is durable across app crashes
+# and only risks the last commits on power loss, which is fine for a journal app.
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL;",
+    "PRAGMA synchronous = NORMAL;",
+    "PRAGMA foreign_keys = ON;",
+    "PRAGMA busy_timeout = 5000;",       # wait for the writer instead of failing with 'database is locked'
+    "PRAGMA cache_size = -16000;",       # ~16 MiB page cache per connection
+    "PRAGMA temp_store = MEMORY;",
+    "PRAGMA mmap_size = 134217728;",     # 128 MiB memory-mapped reads
+)
+
+# ================== SCHEMA ==================
+SCHEMA_SQL = (
+    """CREATE TABLE IF NOT EXISTS users(username TEXT PRIMARY KEY, password TEXT)""",
+    """CREATE TABLE IF NOT EXISTS temps(
+        username TEXT, date TEXT, body_temp REAL, peripheral_temp REAL,
+        weather_temp REAL, feels_like REAL, humidity REAL, status TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS journal(username TEXT, date TEXT, entry TEXT)""",
+    """CREATE TABLE IF NOT EXISTS emergency_contacts(
+        username TEXT PRIMARY KEY,
+        primary_phone TEXT,
+        secondary_phone TEXT,
+        updated_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ','now')),
+        FOREIGN KEY (username) REFERENCES users(username) ON DELETE CASCADE
+    )""",
+)
+
+USER_PREFS_SQL = """CREATE TABLE IF NOT EXISTS user_prefs(
+    username TEXT PRIMARY KEY,
+    home_city TEXT,
+    timezone TEXT,
+    language TEXT,
+    ai_style TEXT,
+    updated_at TEXT,
+    FOREIGN KEY (username) REFERENCES users(username) ON DELETE CASCADE
+)"""
+
+# Every per-user read filters by username and orders by date.
+INDEX_SQL = (
+    "CREATE INDEX IF NOT EXISTS idx_journal_user_date ON journal(username, date)",
+    "CREATE INDEX IF NOT EXISTS idx_temps_user_date ON temps(username, date)",
+)
+
+def apply_pragmas(conn: sqlite3.Connection) -> sqlite3.Connection:
+    for p in PRAGMAS:
+        conn.execute(p)
+    return conn
+
+def connect(path: str = DB_PATH, check_same_thread: bool = False) -> sqlite3.Connection:
+    """Open a connection with the storage PRAGMAs applied."""
+    conn = sqlite3.connect(path, check_same_thread=check_same_thread, timeout=5.0)
+    return apply_pragmas(conn)
+
+def connect_readonly(path: str = DB_PATH) -> sqlite3.Connection:
+    """Open an existing database read-only: never creates the file, migrates or sets PRAGMAs."""
+    uri = pathlib.Path(path).resolve().as_uri() + "?mode=ro"
+    return sqlite3.connect(uri, uri=True, check_same_thread=False, timeout=5.0)
+
+def create_schema(conn: sqlite3.Connection, with_indexes: bool = True):
+    c = conn.cursor()
+    for ddl in SCHEMA_SQL:
+        c.execute(ddl)
+    if with_indexes:
+        create_indexes(conn)
+    conn.commit()
+
+def create_indexes(conn: sqlite3.Connection):
+    for ddl in INDEX_SQL:
+        conn.execute(ddl)
+    conn.execute("PRAGMA optimize")
+    conn.commit()
+
+# ================== MIGRATIONS ==================
+# Ordered, append-only. Each step must also be safe on databases created before
+# schema_version existed (hence IF NOT EXISTS / column checks).
+def _m1_core_tables(conn):
+    for ddl in SCHEMA_SQL:
+        conn.execute(ddl)
+
+def _m2_contacts_updated_at(conn):
+    cols = [r[1] for r in conn.execute("PRAGMA table_info(emergency_contacts)")]
+    if "updated_at" not in cols:
+        conn.execute("ALTER TABLE emergency_contacts ADD COLUMN updated_at TEXT")
+        conn.execute("UPDATE emergency_contacts SET updated_at = strftime('%Y-%m-%dT%H:%M:%fZ','now')")
+
+def _m3_user_prefs(conn):
+    conn.execute(USER_PREFS_SQL)
+
+def _m4_user_date_indexes(conn):
+    for ddl in INDEX_SQL:
+        conn.execute(ddl)
+
+def _m5_typed_journal(conn):
+    tanzim_journal.migrate_typed_schema(conn)
+
+def _m6_journal_search(conn):
+    tanzim_journal.rebuild_fts(conn)
+
+def _m7_sensor_mirror(conn):
+    tanzim_sensors.create_mirror(conn)
+
+def _m8_sensor_epoch(conn):
+    tanzim_sensors.add_epoch_columns(conn)
+
+def _m9_sensor_rollups(conn):
+    tanzim_rollup.create_rollups(conn)
+
+def _m10_uhthoff_episodes(conn):
+    tanzim_episodes.create_tables(conn)
+
+def _m11_device_alerts(conn):
+    tanzim_alerts.create_tables(conn)
+
+def _m12_weather_store(conn):
+    tanzim_weather.create_tables(conn)
+
+def _m13_journal_duration_int(conn):
+    tanzim_journal.fix_duration_types(conn)
+
+MIGRATIONS = [
+    (1, "core tables", _m1_core_tables),
+    (2, "emergency_contacts.updated_at", _m2_contacts_updated_at),
+    (3, "user_prefs", _m3_user_prefs),
+    (4, "journal/temps (username, date) indexes", _m4_user_date_indexes),
+    (5, "typed journal columns + action/symptom/trigger/reason tables", _m5_typed_journal),
+    (6, "journal_fts full-text index (EN/AR)", _m6_journal_search),
+    (7, "sensor_readings mirror + per-device sync cursor", _m7_sensor_mirror),
+    (8, "sensor_readings.t_ms epoch column + history bound", _m8_sensor_epoch),
+    (9, "sensor_rollups 1m/15m/1h + baseline/compaction state", _m9_sensor_rollups),
+    (10, "uhthoff_episodes + persisted detector state", _m10_uhthoff_episodes),
+    (11, "user_devices registry + deduplicated alert_log/alert_state", _m11_device_alerts),
+    (12, "weather_obs/weather_forecast store", _m12_weather_store),
+    (13, "journal.duration_min stored as INTEGER", _m13_journal_duration_int),
+]
+
+SCHEMA_VERSION_SQL = """CREATE TABLE IF NOT EXISTS schema_version(
+    version INTEGER PRIMARY KEY,
+    name TEXT,
+    applied_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ','now')),
+    duration_ms REAL
+)"""
+
+_MIGRATE_LOCK = threading.Lock()
+_MIGRATED: dict[str, dict] = {}   # db path -> report, so each process migrates once
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    conn.execute(SCHEMA_VERSION_SQL)
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return int(row[0] or 0)
+
+def migrate(conn: sqlite3.Connection) -> dict:
+    """
+    Apply pending migrations in one IMMEDIATE transaction. The write lock makes a second
+    process wait and then see the new version, so concurrent starts never double-apply.
+    """
+    t0 = time.perf_counter()
+    applied = []
+    conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        current = schema_version(conn)
+        for version, name, step in MIGRATIONS:
+            if version <= current:
+                continue
+            ts = time.perf_counter()
+            step(conn)
+            ms = (time.perf_counter() - ts) * 1000
+            conn.execute("INSERT INTO schema_version(version, name, duration_ms) VALUES (?,?,?)",
+                         (version, name, ms))
+            applied.append(version)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return {"from_version": current, "to_version": max([current] + applied),
+            "applied": applied, "elapsed_ms": (time.perf_counter() - t0) * 1000}
+
+def ensure_schema(conn: sqlite3.Connection, path: str = DB_PATH) -> dict:
+    """Run migrations once per process per database; later calls are a dict lookup."""
+    rep = _MIGRATED.get(path)
+    if rep is not None:
+        return rep
+    with _MIGRATE_LOCK:
+        rep = _MIGRATED.get(path)
+        if rep is None:
+            rep = migrate(conn)
+            _MIGRATED[path] = rep
+    return rep
+
+# ================== CONNECTIONS ==================
+class ConnectionManager:
+    """
+    One read-only connection per thread plus a single writer shared behind a lock.
+
+    WAL lets every reader run next to the writer, so page reruns never queue behind each
+    other; all writes go through transaction(), which serializes them in this process and
+    takes SQLite's write lock up front (BEGIN IMMEDIATE) so they can't deadlock on upgrade.
+    Connections run in autocommit mode: a reader sees every committed write on its next
+    statement, and nothing is ever left half-committed on a shared cursor.
+
+    Streamlit starts a new script thread per rerun, so readers of finished threads are
+    recycled instead of reopened.
+    """
+    def __init__(self, path: str = DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()             # guards the reader maps
+        self._write_lock = threading.RLock()      # one writer; re-entrant for nested transactions
+        self._readers: dict[int, sqlite3.Connection] = {}
+        self._idle: list[sqlite3.Connection] = []
+        self._depth = 0
+        self.stats = Counter()
+        self._writer = self._open(query_only=False)
+        ensure_schema(self._writer, path)
+
+    def _open(self, query_only: bool) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5.0, isolation_level=None)
+        apply_pragmas(conn)
+        if query_only:
+            conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    def _reap(self):
+        alive = {t.ident for t in threading.enumerate()}
+        for tid in [t for t in self._readers if t not in alive]:
+            self._idle.append(self._readers.pop(tid))
+            self.stats["readers_recycled"] += 1
+
+    def reader(self) -> sqlite3.Connection:
+        """This thread's read-only connection."""
+        tid = threading.get_ident()
+        conn = self._readers.get(tid)
+        if conn is None:
+            with self._lock:
+                self._reap()
+                if self._idle:
+                    conn = self._idle.pop()
+                else:
+                    conn = self._open(query_only=True)
+                    self.stats["readers_opened"] += 1
+                self._readers[tid] = conn
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """
+        Serialized write transaction: commits on exit, rolls back on error. Nested use in the
+        same thread becomes a savepoint, so helpers can open their own without coordination.
+        """
+        t0 = time.perf_counter()
+        with self._write_lock:
+            wait_ms = (time.perf_counter() - t0) * 1000
+            self.stats["write_wait_ms"] += wait_ms
+            self.stats["write_wait_max_ms"] = max(self.stats["write_wait_max_ms"], wait_ms)
+            conn = self._writer
+            nested = self._depth > 0
+            conn.execute(f"SAVEPOINT sp{self._depth}" if nested else "BEGIN IMMEDIATE")
+            self._depth += 1
+            try:
+                yield conn
+            except BaseException:
+                self._depth -= 1
+                if nested:
+                    conn.execute(f"ROLLBACK TO sp{self._depth}")
+                    conn.execute(f"RELEASE sp{self._depth}")
+                else:
+                    conn.execute("ROLLBACK")
+                    self.stats["rollbacks"] += 1
+                raise
+            self._depth -= 1
+            if nested:
+                conn.execute(f"RELEASE sp{self._depth}")
+            else:
+                conn.execute("COMMIT")
+                self.stats["commits"] += 1
+
+    def close(self):
+        with self._lock, self._write_lock:
+            for conn in [*self._readers.values(), *self._idle, self._writer]:
+                conn.close()
+            self._readers.clear(); self._idle.clear()
+
+# ================== GROUP COMMIT ==================
+TEMPS_INSERT_SQL = """
+    INSERT INTO temps (username, date, body_temp, peripheral_temp, weather_temp, feels_like, humidity, status)
+    VALUES (?,?,?,?,?,?,?,?)
+"""
+
+def insert_temp(conn: sqlite3.Connection, u, dt, body, peripheral, wtemp, feels, hum, status):
+    """Caller commits."""
+    conn.execute(TEMPS_INSERT_SQL, (u, dt, body, peripheral, wtemp, feels, hum, status))
+
+class GroupCommitWriter:
+    """
+    Write-behind queue: inserts from every session are applied by one background thread,
+    many per transaction, and each is committed at most `max_delay_ms` after submit().
+
+    The thread keeps a pessimistic estimate of what a commit costs (fixed + per row) and
+    caps every batch at what commits in 30% of max_delay. A write either joins the batch
+    being collected, which flushes once its oldest write is that old, or arrives during a
+    commit and goes into the next batch right after it: at most two such slices either
+    way, leaving the rest of max_delay for a commit slower than estimated. The same cap
+    bounds the queue: submit() blocks while a full batch is already waiting (or
+    `max_pending` writes are queued), so overload slows the callers down instead of
+    stretching the commit latency.
+
+    Each write runs in its own savepoint, so one bad row doesn't sink the batch.
+    wait_for(owner) / wait_seq(seq) give read-your-writes: they cut the current delay short
+    and return once everything that owner queued (or write `seq`) is committed; callers
+    that remember the seq submit() returned can skip the wait when nothing is pending.
+    Pending writes are flushed at exit.
+    """
+    def __init__(self, db: ConnectionManager, max_delay_ms: float = 50, max_batch: int = 500,
+                 max_pending: int = 1000):
+        self.db = db
+        self.max_delay = max_delay_ms / 1000
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self._cv = threading.Condition()
+        self._pending: list[tuple] = []          # (seq, owner, fn, args, submitted_at)
+        self._seq = self._done = 0
+        self._last_seq: dict[str, int] = {}      # owner -> seq of its newest queued write
+        self._urgent = self._closed = False
+        self._fixed_s, self._row_s = 0.005, 0.001     # commit cost estimate: starts high, learned per batch
+        self.stats = Counter()
+        self.last_error: str | None = None
+        self._thread = threading.Thread(target=self._run, name="tanzim-group-commit", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    COMMIT_SHARE = 0.3      # of max_delay: for collecting a batch, and again for committing it
+
+    def _cap(self) -> int:
+        """Rows that commit within COMMIT_SHARE of max_delay by the current estimate."""
+        return max(1, min(self.max_batch, self.max_pending,
+                          int((self.max_delay * self.COMMIT_SHARE - self._fixed_s) / self._row_s)))
+
+    def submit(self, owner: str, fn, *args) -> int:
+        """Queue fn(conn, *args) for the next group commit; returns its sequence number."""
+        with self._cv:
+            if len(self._pending) >= self._cap():
+                self.stats["backpressure_waits"] += 1
+                self._cv.wait_for(lambda: len(self._pending) < self._cap() or self._closed)
+            if self._closed:
+                raise RuntimeError("GroupCommitWriter is closed")
+            self._seq += 1
+            self._pending.append((self._seq, owner, fn, args, time.perf_counter()))
+            self._last_seq[owner] = self._seq
+            self._cv.notify_all()
+            return self._seq
+
+    def _wait_seq(self, target: int, timeout: float | None) -> bool:
+        with self._cv:
+            if self._done >= target:
+                return True
+            self._urgent = True
+            self._cv.notify_all()
+            return self._cv.wait_for(lambda: self._done >= target, timeout)
+
+    def committed(self, seq: int) -> bool:
+        """True once write `seq` (as returned by submit()) is committed."""
+        return self._done >= seq
+
+    def wait_seq(self, seq: int, timeout: float | None = 5.0) -> bool:
+        """Block until write `seq` (and everything queued before it) is committed."""
+        return self._wait_seq(seq, timeout)
+
+    def wait_for(self, owner: str, timeout: float | None = 5.0) -> bool:
+        """Block until every write `owner` queued is committed (read-your-writes)."""
+        return self._wait_seq(self._last_seq.get(owner, 0), timeout)
+
+    def flush(self, timeout: float | None = None) -> bool:
+        return self._wait_seq(self._seq, timeout)
+
+    def close(self, timeout: float | None = 10.0):
+        with self._cv:
+            if self._closed:
+                return
+            self._closed = True
+            self._cv.notify_all()
+        self._thread.join(timeout)
+
+    def _next_batch(self) -> list[tuple]:
+        with self._cv:
+            self._cv.wait_for(lambda: self._pending or self._closed)
+            if not self._pending:
+                return []
+            deadline = self._pending[0][4] + self.max_delay * self.COMMIT_SHARE
+            while len(self._pending) < self._cap() and not (self._urgent or self._closed):
+                left = deadline - time.perf_counter()
+                if left <= 0 or not self._cv.wait(left):
+                    break
+            self._urgent = False
+            batch = self._pending[:self.max_batch]       # all of it: leaving rows behind would make them wait two commits
+            del self._pending[:len(batch)]
+            self._cv.notify_all()                       # room for callers held back in submit()
+            return batch
+
+    def _apply(self, batch: list[tuple]):
+        try:
+            with self.db.transaction() as conn:
+                for _, _, fn, args, _ in batch:
+                    try:
+                        with self.db.transaction():      # savepoint per write
+                            fn(conn, *args)
+                    except Exception as e:
+                        self.stats["failed"] += 1
+                        self.last_error = f"{type(e).__name__}: {e}"
+        except Exception as e:                           # whole batch lost (disk full, locked, ...)
+            self.stats["failed"] += len(batch)
+            self.last_error = f"{type(e).__name__}: {e}"
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+            t0 = time.perf_counter()
+            self._apply(batch)
+            now = time.perf_counter()
+            # commit cost: jumps up to a slower batch at once, eases back down slowly
+            spent = now - t0
+            if len(batch) >= 20:
+                per_row = spent / len(batch)
+                self._row_s = per_row if per_row > self._row_s else 0.9 * self._row_s + 0.1 * per_row
+            else:
+                fixed = max(spent - self._row_s * len(batch), 0.0)
+                self._fixed_s = fixed if fixed > self._fixed_s else 0.9 * self._fixed_s + 0.1 * fixed
+            with self._cv:
+                self._done = batch[-1][0]
+                for owner in {b[1] for b in batch}:
+                    if self._last_seq.get(owner, 0) <= self._done:
+                        self._last_seq.pop(owner, None)
+                self.stats["batches"] += 1
+                self.stats["rows"] += len(batch)
+                self.stats["max_latency_ms"] = max(self.stats["max_latency_ms"], (now - batch[0][4]) * 1000)
+                self.stats["late_rows"] += sum(now - b[4] > self.max_delay for b in batch)
+                self._cv.notify_all()
+
+# ================== PREFERENCES & CONTACTS ==================
+def read_user_prefs(conn: sqlite3.Connection, username: str) -> dict:
+    row = conn.execute("SELECT home_city, timezone, language, ai_style FROM user_prefs WHERE username=?",
+                       (username,)).fetchone()
+    if not row: return {}
+    return {"home_city": row[0], "timezone": row[1], "language": row[2], "ai_style": row[3]}
+
+def home_cities(conn: sqlite3.Connection) -> list[str]:
+    """Every city some user has set as home (the weather prefetcher keeps these warm)."""
+    return [c for (c,) in conn.execute("SELECT DISTINCT home_city FROM user_prefs WHERE home_city IS NOT NULL")]
+
+def write_user_prefs(conn: sqlite3.Connection, username: str, prefs: dict, now: str):
+    """Upsert one user's prefs. Caller commits (see ConnectionManager.transaction)."""
+    conn.execute("""
+        INSERT INTO user_prefs (username, home_city, timezone, language, ai_style, updated_at)
+        VALUES (?,?,?,?,?,?)
+        ON CONFLICT(username) DO UPDATE SET
+          home_city=excluded.home_city,
+          timezone=excluded.timezone,
+          language=excluded.language,
+          ai_style=excluded.ai_style,
+          updated_at=excluded.updated_at
+    """, (username, prefs.get("home_city"), prefs.get("timezone"), prefs.get("language"), prefs.get("ai_style"), now))
+
+def read_emergency_contacts(conn: sqlite3.Connection, username: str) -> tuple[str, str]:
+    row = conn.execute("SELECT primary_phone, secondary_phone FROM emergency_contacts WHERE username=?",
+                       (username,)).fetchone()
+    if row: return row[0] or "", row[1] or ""
+    return "", ""
+
+def write_emergency_contacts(conn: sqlite3.Connection, username: str, p1: str, p2: str, now: str):
+    """Upsert one user's contacts. Caller commits."""
+    conn.execute("""
+        INSERT INTO emergency_contacts (username, primary_phone, secondary_phone, updated_at)
+        VALUES (?,?,?,?)
+        ON CONFLICT(username) DO UPDATE SET
+            primary_phone=excluded.primary_phone,
+            secondary_phone=excluded.secondary_phone,
+            updated_at=excluded.updated_at
+    """, (username, p1, p2, now))
+
+class UserCache:
+    """
+    Process-wide, write-through cache of small per-user rows (prefs, contacts), shared by all
+    sessions. Savers call put() with the row they just wrote, so a user's row is read from
+    SQLite at most once per process; `reads`/`writes` count per (kind, username).
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data: dict[tuple[str, str], object] = {}
+        self.reads, self.writes, self.hits = Counter(), Counter(), Counter()
+
+    def get(self, kind: str, username: str, loader):
+        key = (kind, username)
+        with self._lock:   # held across the load so concurrent misses don't both hit SQLite
+            if key in self._data:
+                self.hits[key] += 1
+            else:
+                self._data[key] = loader()
+                self.reads[key] += 1
+            val = self._data[key]
+        return dict(val) if isinstance(val, dict) else val
+
+    def put(self, kind: str, username: str, value):
+        with self._lock:
+            self._data[(kind, username)] = dict(value) if isinstance(value, dict) else value
+            self.writes[(kind, username)] += 1
+
+    def invalidate(self, kind: str, username: str):
+        with self._lock:
+            self._data.pop((kind, username), None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            keys = set(self.reads) | set(self.writes) | set(self.hits)
+            return {k: {"reads": self.reads[k], "writes": self.writes[k], "hits": self.hits[k]} for k in keys}
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+# TANZIM MS — Chart decimation (NumPy only)
+# -----------------------------------------------------------------------------------------
+# Long sensor ranges are reduced server-side before they reach Plotly, so a week of 10 s
+# readings costs the browser about as much as an hour. min/max keeps every spike exactly;
+# LTTB keeps the visual shape with fewer points when spikes matter less.
+
+import numpy as np
+
+def _valid(t: np.ndarray, y: np.ndarray):
+    ok = ~np.isnan(y)
+    return t[ok], y[ok]
+
+def minmax(t: np.ndarray, y: np.ndarray, buckets: int, t0: int | None = None, t1: int | None = None):
+    """
+    Per time bucket (≈ one pixel column), keep the minimum and the maximum sample, in time
+    order. Output has at most 2 * buckets points and contains the series' true extremes.
+    `t` must be sorted; NaNs are dropped.
+    """
+    t, y = _valid(np.asarray(t), np.asarray(y))
+    if len(t) <= 2 * buckets:
+        return t, y
+    t0 = int(t[0]) if t0 is None else t0
+    t1 = int(t[-1]) if t1 is None else t1
+    span = max(1, t1 - t0 + 1)
+    b = np.clip((t - t0) * buckets // span, 0, buckets - 1)
+    starts = np.flatnonzero(np.r_[True, b[1:] != b[:-1]])      # t sorted -> buckets are contiguous runs
+    seg = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(t)]))
+    keep = []
+    for ufunc in (np.minimum, np.maximum):
+        hit = np.flatnonzero(y == ufunc.reduceat(y, starts)[seg])
+        keep.append(hit[np.unique(seg[hit], return_index=True)[1]])   # first extreme per bucket
+    keep = np.unique(np.concatenate(keep))                          # sorted index = time order
+    return t[keep], y[keep]
+
+def lttb(t: np.ndarray, y: np.ndarray, n: int):
+    """Largest-Triangle-Three-Buckets down to n points (first and last kept)."""
+    t, y = _valid(np.asarray(t), np.asarray(y))
+    if n < 3 or len(t) <= n:
+        return t, y
+    tf = t.astype(np.float64)
+    edges = np.linspace(1, len(t) - 1, n - 1).astype(np.int64)   # n-2 inner buckets
+    keep = np.empty(n, dtype=np.int64)
+    keep[0], keep[-1] = 0, len(t) - 1
+    a = 0
+    for i in range(n - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nlo, nhi = hi, (edges[i + 2] if i + 2 < len(edges) else len(t))
+        cx, cy = tf[nlo:nhi].mean(), y[nlo:nhi].mean()            # next bucket's centroid
+        area = np.abs((tf[a] - cx) * (y[lo:hi] - y[a]) - (tf[a] - tf[lo:hi]) * (cy - y[a]))
+        a = lo + int(area.argmax())
+        keep[i + 1] = a
+    return t[keep], y[keep]
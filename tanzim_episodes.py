@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+# TANZIM MS — Uhthoff episode detector (no Streamlit imports)
+# -----------------------------------------------------------------------------------------
+# Every reading stored in the mirror passes through consume(), in time order, inside the
+# same transaction that stores it. The raise/clear hysteresis state lives in SQLite next
+# to the readings, so detection does not depend on anyone having the monitor open and a
+# restart resumes exactly where the last committed reading left it.
+
+import sqlite3
+
+import numpy as np
+
+import tanzim_risk
+
+GAP_CLOSE_MS = 30 * 60_000    # no reading for 30 min: an open episode ends at the last one
+
+EPISODES_SQL = (
+    """CREATE TABLE IF NOT EXISTS uhthoff_episodes(
+        id INTEGER PRIMARY KEY,
+        device_id TEXT NOT NULL,
+        baseline REAL NOT NULL,
+        start_ms INTEGER NOT NULL,
+        peak_ms INTEGER NOT NULL,
+        peak_core REAL NOT NULL,
+        end_ms INTEGER,                  -- NULL while the episode is open
+        readings INTEGER NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_uhthoff_episodes_device_start ON uhthoff_episodes(device_id, start_ms)",
+    """CREATE TABLE IF NOT EXISTS uhthoff_state(
+        device_id TEXT PRIMARY KEY,
+        last_ms INTEGER NOT NULL,        -- newest reading consumed
+        episode_id INTEGER REFERENCES uhthoff_episodes(id)   -- open episode, NULL = not raised
+    )""",
+)
+
+def create_tables(conn: sqlite3.Connection):
+    """Episode tables, backfilled by replaying the mirror through the detector."""
+    for ddl in EPISODES_SQL:
+        conn.execute(ddl)
+    conn.execute("DELETE FROM uhthoff_state")
+    conn.execute("DELETE FROM uhthoff_episodes")
+    for device_id, baseline in conn.execute("""SELECT DISTINCT r.device_id, s.baseline FROM sensor_readings r
+                                               LEFT JOIN sensor_sync s USING (device_id)""").fetchall():
+        rows = conn.execute("SELECT t_ms, core_c FROM sensor_readings WHERE device_id=? ORDER BY t_ms",
+                            (device_id,)).fetchall()
+        a = np.array(rows, dtype=np.float64)
+        consume(conn, device_id, a[:, 0].astype(np.int64), a[:, 1], baseline)
+
+def latch(t: np.ndarray, delta: np.ndarray, was_active: bool = False, last_ms: int | None = None):
+    """
+    The raise/clear hysteresis over sorted readings, as a forward fill: ΔCore ≥ UHTHOFF_RAISE
+    raises, < UHTHOFF_CLEAR clears, anything between (or NaN) holds, and more than
+    GAP_CLOSE_MS since the previous reading clears. Returns (active, begin, finish, gap,
+    prev_t): begin marks readings that open an episode, finish readings before which the
+    previous one ended (at prev_t if it ended by silence).
+    """
+    with np.errstate(invalid="ignore"):
+        s = np.where(delta >= tanzim_risk.UHTHOFF_RAISE, 1, np.where(delta < tanzim_risk.UHTHOFF_CLEAR, -1, 0))
+    prev_t = np.r_[t[0] if last_ms is None else last_ms, t[:-1]]
+    gap = t - prev_t > GAP_CLOSE_MS
+    s = np.where(gap & (s == 0), -1, s)
+    idx = np.maximum.accumulate(np.where(s != 0, np.arange(len(s)), -1))
+    active = np.where(idx >= 0, s[np.maximum(idx, 0)] == 1, was_active)
+    before = np.r_[was_active, active[:-1]]
+    begin = active & (~before | gap)       # an episode starts at this reading
+    finish = before & (~active | gap)      # the previous episode ended before this reading
+    return active, begin, finish, gap, prev_t
+
+def consume(conn: sqlite3.Connection, device_id: str, t_ms: np.ndarray, core: np.ndarray,
+            baseline: float | None = None) -> int:
+    """
+    Advance the device's detector over new readings (sorted here; anything not newer than
+    the last consumed reading is ignored). ΔCore ≥ UHTHOFF_RAISE opens an episode, it stays
+    open until ΔCore < UHTHOFF_CLEAR or the readings stop for GAP_CLOSE_MS; missing core
+    values hold the current state. Returns the number of episodes opened. Caller commits.
+    """
+    state = conn.execute("SELECT last_ms, episode_id FROM uhthoff_state WHERE device_id=?", (device_id,)).fetchone()
+    last_ms, open_id = state if state else (None, None)
+    order = np.argsort(t_ms, kind="stable")
+    t, core = np.asarray(t_ms, dtype=np.int64)[order], np.asarray(core, dtype=np.float64)[order]
+    if last_ms is not None:
+        keep = t > last_ms
+        t, core = t[keep], core[keep]
+    if not len(t):
+        return 0
+    base = tanzim_risk.DEFAULT_BASELINE if baseline is None else baseline
+    delta = core - base
+    was_active = open_id is not None
+    _, begin, finish, gap, prev_t = latch(t, delta, was_active, last_ms)
+
+    segments, cur_a, cur_id = [], (0 if was_active else None), open_id
+    for i in np.flatnonzero(begin | finish).tolist():
+        if finish[i]:
+            # closed by a clearing reading: ends there; closed by a silence: ends at its last reading
+            segments.append((cur_id, cur_a, i, int(prev_t[i] if gap[i] else t[i])))
+            cur_a, cur_id = None, None
+        if begin[i]:
+            cur_a = i
+    if cur_a is not None:
+        segments.append((cur_id, cur_a, len(t), None))
+
+    opened, open_id = 0, None
+    for ep_id, a, b, end in segments:
+        seg = np.where(np.isnan(delta[a:b]), -np.inf, delta[a:b])
+        p = a + int(np.argmax(seg)) if b > a else None     # empty: the carried episode closed at the first reading
+        if ep_id is None:
+            ep_id = conn.execute("""INSERT INTO uhthoff_episodes(device_id, baseline, start_ms, peak_ms, peak_core,
+                                                                 end_ms, readings) VALUES (?,?,?,?,?,?,?)""",
+                                 (device_id, base, int(t[a]), int(t[p]), float(core[p]), end, b - a)).lastrowid
+            opened += 1
+        else:
+            if p is not None and np.isfinite(seg[p - a]):
+                conn.execute("UPDATE uhthoff_episodes SET peak_ms=?, peak_core=? WHERE id=? AND peak_core < ?",
+                             (int(t[p]), float(core[p]), ep_id, float(core[p])))
+            conn.execute("UPDATE uhthoff_episodes SET end_ms=?, readings=readings + ? WHERE id=?",
+                         (end, b - a, ep_id))
+        if end is None:
+            open_id = ep_id
+    conn.execute("""INSERT INTO uhthoff_state(device_id, last_ms, episode_id) VALUES (?,?,?)
+                    ON CONFLICT(device_id) DO UPDATE SET last_ms=excluded.last_ms, episode_id=excluded.episode_id""",
+                 (device_id, int(t[-1]), open_id))
+    return opened
+
+def _episode(row) -> dict:
+    id_, start, peak_ms, peak, end, n, base = row
+    return {"id": id_, "start_ms": start, "peak_ms": peak_ms, "peak_core": peak, "peak_delta": round(peak - base, 2),
+            "end_ms": end, "duration_s": None if end is None else (end - start) / 1000, "readings": n,
+            "baseline": base}
+
+def open_episode(conn: sqlite3.Connection, device_id: str) -> dict | None:
+    row = conn.execute("""SELECT e.id, e.start_ms, e.peak_ms, e.peak_core, e.end_ms, e.readings, e.baseline
+                          FROM uhthoff_state s JOIN uhthoff_episodes e ON e.id = s.episode_id
+                          WHERE s.device_id=?""", (device_id,)).fetchone()
+    return _episode(row) if row else None
+
+def recent(conn: sqlite3.Connection, device_id: str, limit: int = 20) -> list[dict]:
+    """Newest episodes first (the open one, if any, included)."""
+    rows = conn.execute("""SELECT id, start_ms, peak_ms, peak_core, end_ms, readings, baseline
+                           FROM uhthoff_episodes WHERE device_id=? ORDER BY start_ms DESC LIMIT ?""",
+                        (device_id, limit)).fetchall()
+    return [_episode(r) for r in rows]
@@ -0,0 +1,341 @@
+# -*- coding: utf-8 -*-
+# TANZIM MS — Typed journal storage (no Streamlit imports)
+# -----------------------------------------------------------------------------------------
+# Each entry keeps its original JSON in `entry` (export fidelity) but every field the app
+# reads is also a typed column, and list fields live in child tables, so pages and the AI
+# context read rows with plain indexed SQL instead of json.loads per row.
+
+import html, json, math, re, sqlite3
+
+# entry list field -> child table
+LIST_TABLES = {
+    "actions": "journal_actions",
+    "symptoms": "journal_symptoms",
+    "triggers": "journal_triggers",
+    "reasons": "journal_reasons",
+}
+
+# typed column -> SQL type (order = column order after id/username/date/entry)
+TYPED_COLUMNS = {
+    "type": "TEXT", "at": "TEXT",
+    "core": "REAL", "peripheral": "REAL", "baseline": "REAL", "delta": "REAL",
+    "mood": "TEXT", "hydration": "REAL", "sleep": "REAL", "fatigue": "INTEGER",
+    "note": "TEXT",
+    "city": "TEXT", "activity": "TEXT", "start_at": "TEXT", "end_at": "TEXT",
+    "feels_like": "REAL", "humidity": "REAL",
+    "from_status": "TEXT", "to_status": "TEXT", "duration_min": "INTEGER",
+    "core_before": "REAL", "core_after": "REAL",
+    "device_id": "TEXT",
+}
+
+JOURNAL_TABLE_SQL = (
+    "CREATE TABLE {name}(\n"
+    "    id INTEGER PRIMARY KEY,\n"
+    "    username TEXT, date TEXT, entry TEXT,\n    "
+    + ",\n    ".join(f"{c} {t}" for c, t in TYPED_COLUMNS.items())
+    + "\n)"
+)
+
+JOURNAL_INDEX_SQL = (
+    "CREATE INDEX IF NOT EXISTS idx_journal_user_date ON journal(username, date)",
+    "CREATE INDEX IF NOT EXISTS idx_journal_user_type_date ON journal(username, type, date)",
+)
+
+def _child_sql(table: str) -> tuple[str, str]:
+    return (f"""CREATE TABLE IF NOT EXISTS {table}(
+        journal_id INTEGER NOT NULL REFERENCES journal(id) ON DELETE CASCADE,
+        value TEXT NOT NULL
+    )""", f"CREATE INDEX IF NOT EXISTS idx_{table}_jid ON {table}(journal_id, value)")
+
+# ================== ENTRY → ROW ==================
+def _num(v):
+    try:
+        return float(v) if v is not None and v != "" else None
+    except (TypeError, ValueError):
+        return None
+
+def _int(v):
+    f = _num(v)
+    return int(round(f)) if f is not None and math.isfinite(f) else None
+
+def _fatigue(v):
+    # UI stores "4/10"
+    if v is None: return None
+    try:
+        return int(str(v).split("/")[0])
+    except ValueError:
+        return None
+
+def typed_fields(entry: dict) -> dict:
+    """Map an entry dict (any type) onto TYPED_COLUMNS."""
+    t = entry.get("type", "NOTE")
+    core = _num(entry.get("core_temp") if entry.get("core_temp") is not None else entry.get("body_temp"))
+    base = _num(entry.get("baseline"))
+    delta = _num(entry.get("delta_core"))
+    if delta is None and core is not None and base is not None:
+        delta = round(core - base, 2)
+    note = entry.get("text") or entry.get("note") or None
+    return {
+        "type": t, "at": entry.get("at"),
+        "core": core, "peripheral": _num(entry.get("peripheral_temp")), "baseline": base, "delta": delta,
+        "mood": entry.get("mood"), "hydration": _num(entry.get("hydration_glasses")),
+        "sleep": _num(entry.get("sleep_hours")), "fatigue": _fatigue(entry.get("fatigue")),
+        "note": note.strip() if isinstance(note, str) else note,
+        "city": entry.get("city"), "activity": entry.get("activity"),
+        "start_at": entry.get("start"), "end_at": entry.get("end"),
+        "feels_like": _num(entry.get("feels_like")), "humidity": _num(entry.get("humidity")),
+        "from_status": entry.get("from_status"), "to_status": entry.get("to_status"),
+        "duration_min": _int(entry.get("duration_min")),
+        "core_before": _num(entry.get("core_before")), "core_after": _num(entry.get("core_after")),
+        "device_id": entry.get("device_id"),
+    }
+
+def parse_raw(raw) -> dict:
+    try:
+        obj = json.loads(raw)
+        return obj if isinstance(obj, dict) else {"type": "NOTE", "text": str(raw)}
+    except Exception:
+        return {"type": "NOTE", "text": str(raw)}
+
+_INSERT_SQL = (f"INSERT INTO journal(username, date, entry, {', '.join(TYPED_COLUMNS)}) "
+               f"VALUES (?,?,?,{','.join('?' * len(TYPED_COLUMNS))})")
+
+def insert_entry(conn: sqlite3.Connection, username: str, date: str, entry: dict, fts: bool = True) -> int:
+    """Insert one entry + its child rows (+ its search document). Caller commits."""
+    f = typed_fields(entry)
+    cur = conn.execute(_INSERT_SQL, (username, date, json.dumps(entry), *f.values()))
+    jid = cur.lastrowid
+    lists = {}
+    for field, table in LIST_TABLES.items():
+        vals = [str(v).strip() for v in (entry.get(field) or []) if str(v).strip()]
+        lists[field] = vals
+        if vals:
+            conn.executemany(f"INSERT INTO {table}(journal_id, value) VALUES (?,?)", [(jid, v) for v in vals])
+    if fts:
+        conn.execute("INSERT INTO journal_fts(rowid, owner, body, tags) VALUES (?,?,?,?)",
+                     (jid, *fts_document(username, {**f, **lists})))
+    return jid
+
+# ================== MIGRATION ==================
+def migrate_typed_schema(conn: sqlite3.Connection):
+    """Rebuild the legacy (username, date, entry) table with typed columns and backfill it."""
+    cols = [r[1] for r in conn.execute("PRAGMA table_info(journal)")]
+    if "id" in cols:
+        return
+    conn.execute("DROP TABLE IF EXISTS journal_new")
+    conn.execute(JOURNAL_TABLE_SQL.format(name="journal_new"))
+    legacy = conn.execute("SELECT username, date, entry FROM journal ORDER BY rowid").fetchall()
+    conn.execute("DROP TABLE journal")
+    conn.execute("ALTER TABLE journal_new RENAME TO journal")
+    for table in LIST_TABLES.values():
+        for ddl in _child_sql(table):
+            conn.execute(ddl)
+    for username, date, raw in legacy:
+        insert_entry(conn, username, date, parse_raw(raw), fts=False)   # search index comes in migration 6
+    for ddl in JOURNAL_INDEX_SQL:
+        conn.execute(ddl)
+
+# ================== FULL-TEXT SEARCH ==================
+# Contentless FTS5 index (text lives in journal; the index only stores terms). unicode61 keeps
+# Arabic letters as token characters; remove_diacritics folds Latin accents. Arabic spelling
+# variants are folded in Python on both sides (normalize_text), since SQLite can't.
+FTS_SQL = """CREATE VIRTUAL TABLE IF NOT EXISTS journal_fts USING fts5(
+    owner, body, tags,
+    content='',
+    tokenize="unicode61 remove_diacritics 2",
+    prefix='2 3'
+)"""
+
+_AR_DIACRITICS = re.compile("[\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED\u0640]")  # tashkeel + tatweel
+_AR_FOLD = str.maketrans({"أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا", "ى": "ي", "ة": "ه", "ؤ": "و", "ئ": "ي",
+                          **{chr(0x0660 + i): str(i) for i in range(10)}})
+_WORD = re.compile(r"\w+")
+_RAW_WORD = re.compile("[\\w\u0610-\u061A\u064B-\u065F\u0670\u0640]+")   # word chars + Arabic marks, for display text
+
+_AR_PREFIXES = ("وال", "بال", "كال", "فال", "لل", "ال")
+
+def normalize_text(s: str) -> str:
+    return _AR_DIACRITICS.sub("", s or "").translate(_AR_FOLD).casefold()
+
+def ar_stem(word: str) -> str:
+    """Light stemming: drop a leading article/clitic (بالدوخه -> دوخه)."""
+    for p in _AR_PREFIXES:
+        if word.startswith(p) and len(word) - len(p) >= 2:
+            return word[len(p):]
+    return word
+
+def _index_text(s: str) -> str:
+    # normalized text plus the stem of every word that has an Arabic prefix
+    norm = normalize_text(s)
+    stems = [st for w in _WORD.findall(norm) if (st := ar_stem(w)) != w]
+    return " ".join([norm, *stems])
+
+def owner_token(username: str) -> str:
+    # a single alphanumeric token, so MATCH can scope to one user inside the index
+    return "u" + (username or "").encode("utf-8").hex()
+
+def fts_document(username: str, row: dict) -> tuple[str, str, str]:
+    body = " ".join(str(row[k]) for k in ("note", "activity", "city", "mood") if row.get(k))
+    tags = " ".join([*(str(v) for f in LIST_TABLES for v in row.get(f) or []), row.get("type") or ""])
+    return owner_token(username), _index_text(body), _index_text(tags)
+
+def fix_duration_types(conn: sqlite3.Connection):
+    """Re-coerce duration_min values stored as TEXT/REAL before typed_fields converted them."""
+    rows = conn.execute("SELECT id, duration_min FROM journal WHERE typeof(duration_min) NOT IN ('integer', 'null')").fetchall()
+    conn.executemany("UPDATE journal SET duration_min=? WHERE id=?", [(_int(v), i) for i, v in rows])
+
+def rebuild_fts(conn: sqlite3.Connection):
+    conn.execute("DROP TABLE IF EXISTS journal_fts")
+    conn.execute(FTS_SQL)
+    batch = []
+    for r in attach_lists(conn, _rows(conn, f"SELECT {ROW_COLUMNS} FROM journal")):
+        batch.append((r["id"], *fts_document(r["username"], r)))
+    conn.executemany("INSERT INTO journal_fts(rowid, owner, body, tags) VALUES (?,?,?,?)", batch)
+
+def build_aliases(pairs) -> dict:
+    """[(EN list, AR list), ...] -> {normalized label: counterpart label}, for cross-language search."""
+    out = {}
+    for en, ar in pairs:
+        for a, b in zip(en, ar):
+            out[normalize_text(a)] = normalize_text(b)
+            out[normalize_text(b)] = normalize_text(a)
+    return out
+
+def _terms(query: str, aliases: dict | None) -> list[list[str]]:
+    """Each query word -> its own prefix + any counterpart labels whose words start with it."""
+    terms = []
+    for tok in _WORD.findall(normalize_text(query)):
+        alts = [f'"{tok}"*', f'"{ar_stem(tok)}"*']
+        for label, other in (aliases or {}).items():
+            if any(w.startswith(tok) for w in _WORD.findall(label)):
+                alts.append('"' + other.replace('"', "") + '"')
+        terms.append(list(dict.fromkeys(alts)))
+    return terms
+
+def search(conn, username: str, query: str, limit: int = 20, aliases: dict | None = None) -> list[dict]:
+    """Ranked (bm25; notes weigh more than tags) hits for one user, with list fields attached."""
+    terms = _terms(query, aliases)
+    if not terms:
+        return []
+    match = f"owner:{owner_token(username)} AND " + " AND ".join("(" + " OR ".join(t) + ")" for t in terms)
+    ids = [r[0] for r in conn.execute(
+        "SELECT rowid FROM journal_fts WHERE journal_fts MATCH ? ORDER BY bm25(journal_fts, 0.0, 2.0, 1.0) LIMIT ?",
+        (match, limit))]
+    if not ids:
+        return []
+    rows = _rows(conn, f"SELECT {ROW_COLUMNS} FROM journal WHERE id IN ({','.join('?' * len(ids))})", ids)
+    order = {jid: i for i, jid in enumerate(ids)}
+    rows.sort(key=lambda r: order[r["id"]])
+    for r in attach_lists(conn, rows):
+        r["_terms"] = [t.strip('"*') for alts in terms for t in alts]
+    return rows
+
+def highlight(text: str, terms: list[str], width: int = 160, mark=("<mark>", "</mark>")) -> str:
+    """HTML snippet of the original (un-normalized) text with matching words marked."""
+    if not text: return ""
+    words = [normalize_text(t) for t in terms if t]
+    hits = []
+    for m in _RAW_WORD.finditer(text):
+        w = normalize_text(m.group()); ws = ar_stem(w)
+        if any(w.startswith(t) or ws.startswith(t) or (" " in t and w in t.split()) for t in words):
+            hits.append(m.span())
+    start = max(0, hits[0][0] - width // 3) if hits else 0
+    end = min(len(text), start + width)
+    out, pos = [], start
+    for a, b in hits:
+        if a < start or b > end: continue
+        out += [html.escape(text[pos:a]), mark[0], html.escape(text[a:b]), mark[1]]; pos = b
+    out.append(html.escape(text[pos:end]))
+    return ("…" if start > 0 else "") + "".join(out) + ("…" if end < len(text) else "")
+
+# ================== QUERIES ==================
+ROW_COLUMNS = "id, username, date, " + ", ".join(TYPED_COLUMNS)
+
+def _rows(conn, sql: str, params=()) -> list[dict]:
+    cur = conn.cursor(); cur.row_factory = sqlite3.Row
+    return [dict(r) for r in cur.execute(sql, params).fetchall()]
+
+def attach_lists(conn: sqlite3.Connection, rows: list[dict]) -> list[dict]:
+    """Add actions/symptoms/triggers/reasons lists to rows with one query per child table."""
+    if not rows: return rows
+    by_id = {r["id"]: r for r in rows}
+    for r in rows:
+        for field in LIST_TABLES: r[field] = []
+    marks = ",".join("?" * len(by_id))
+    for field, table in LIST_TABLES.items():
+        for jid, val in conn.execute(
+                f"SELECT journal_id, value FROM {table} WHERE journal_id IN ({marks}) ORDER BY rowid",
+                tuple(by_id)):
+            by_id[jid][field].append(val)
+    return rows
+
+def recent_entries(conn, username: str, limit: int = 5) -> list[dict]:
+    rows = _rows(conn, f"SELECT {ROW_COLUMNS} FROM journal WHERE username=? ORDER BY date DESC LIMIT ?",
+                 (username, limit))
+    return attach_lists(conn, rows)
+
+def _type_clause(types) -> tuple[str, tuple]:
+    # One type: equality hits (username, type, date). Several: '+type' keeps the planner on
+    # (username, date) so rows come out pre-sorted and LIMIT stops early (no temp sort).
+    if types is None: return "", ()
+    if len(types) == 1: return " AND type = ?", tuple(types)
+    return f" AND +type IN ({','.join('?' * len(types))})", tuple(types)
+
+def _exists(conn, username, types, op, cursor) -> bool:
+    tc, tp = _type_clause(types)
+    return conn.execute(f"SELECT 1 FROM journal WHERE username=?{tc} AND (date, id) {op} (?, ?) LIMIT 1",
+                        (username, *tp, *cursor)).fetchone() is not None
+
+def page(conn, username: str, types=None, limit: int = 12, before=None, after=None) -> dict:
+    """
+    Keyset page of entries, newest first. `before`/`after` are (date, id) cursors taken from
+    a previous page; each call touches O(limit) index entries regardless of history length.
+    To jump to a day, pass before=(<end of that day as UTC ISO>, MAX_ID).
+    Returns {"rows", "older": cursor|None, "newer": cursor|None}.
+    """
+    if types is not None and not types:
+        return {"rows": [], "older": None, "newer": None}
+    tc, tp = _type_clause(types)
+    if after is not None:
+        rows = _rows(conn, f"""SELECT {ROW_COLUMNS} FROM journal WHERE username=?{tc} AND (date, id) > (?, ?)
+                               ORDER BY date ASC, id ASC LIMIT ?""", (username, *tp, *after, limit))
+        rows.reverse()
+    else:
+        cond = " AND (date, id) < (?, ?)" if before is not None else ""
+        rows = _rows(conn, f"""SELECT {ROW_COLUMNS} FROM journal WHERE username=?{tc}{cond}
+                               ORDER BY date DESC, id DESC LIMIT ?""",
+                     (username, *tp, *(before or ()), limit))
+    if not rows:
+        return {"rows": [], "older": None, "newer": None}
+    first, last = (rows[0]["date"], rows[0]["id"]), (rows[-1]["date"], rows[-1]["id"])
+    return {"rows": attach_lists(conn, rows),
+            "older": last if _exists(conn, username, types, "<", last) else None,
+            "newer": first if _exists(conn, username, types, ">", first) else None}
+
+MAX_ID = 2**63 - 1
+
+def count_entries(conn, username: str) -> int:
+    return conn.execute("SELECT COUNT(*) FROM journal WHERE username=?", (username,)).fetchone()[0]
+
+def top_actions(conn, username: str, since_iso: str, limit: int = 6) -> list[tuple[str, int]]:
+    return [(a, n) for a, n in conn.execute("""
+        SELECT a.value, COUNT(*) AS n
+        FROM journal j JOIN journal_actions a ON a.journal_id = j.id
+        WHERE j.username=? AND j.type='RECOVERY' AND j.date >= ?
+        GROUP BY a.value ORDER BY n DESC, a.value LIMIT ?
+    """, (username, since_iso, limit))]
+
+def recovery_stats(conn, username: str, since_iso: str) -> dict:
+    n, avg_min, avg_drop = conn.execute("""
+        SELECT COUNT(*), AVG(duration_min), AVG(core_before - core_after)
+        FROM journal WHERE username=? AND type='RECOVERY' AND date >= ?
+    """, (username, since_iso)).fetchone()
+    return {"count": n or 0, "avg_duration_min": avg_min, "avg_core_drop": avg_drop}
+
+# One row per entry with list fields flattened for Excel/CSV
+EXPORT_SQL = f"""
+    SELECT j.date, {', '.join('j.' + c for c in TYPED_COLUMNS)},
+           {', '.join(f"(SELECT group_concat(value, '; ') FROM {t} WHERE journal_id = j.id) AS {f}"
+                      for f, t in LIST_TABLES.items())}
+    FROM journal j WHERE j.username=? ORDER BY j.date ASC
+"""
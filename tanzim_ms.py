@@ -4,22 +4,34 @@
 # Built for people with MS in the Gulf: heat-aware planning, live monitoring, journal, AI companion.
 
 import streamlit as st
-import sqlite3, json, requests, random, time, zipfile
+import requests, random, time, zipfile
 from io import BytesIO
 from datetime import datetime, timedelta, timezone
 from zoneinfo import ZoneInfo
 from collections import defaultdict
 from datetime import datetime as _dt
 import re
-import statistics
-from typing import Dict, Any, Optional 
+from typing import Optional
 import matplotlib
 import matplotlib.pyplot as plt
 from matplotlib.font_manager import FontProperties
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 from textwrap import dedent as _dd
 from supabase import create_client
+import tanzim_db
+import tanzim_journal
+import tanzim_sensors
+import tanzim_realtime
+import tanzim_decimate
+import tanzim_rollup
+import tanzim_risk
+import tanzim_episodes
+import tanzim_weather
+import tanzim_alerts
+import tanzim_planner
+import tanzim_places
 
 # ================== CONFIG ==================
 st.set_page_config(page_title="Tanzim MS", page_icon="🌡️", layout="wide")
@@ -31,6 +43,10 @@ OPENWEATHER_API_KEY= st.secrets.get("OPENWEATHER_API_KEY", "")
 
 SUPABASE_URL       = st.secrets.get("SUPABASE_URL", "")
 SUPABASE_ANON_KEY  = st.secrets.get("SUPABASE_ANON_KEY", "")
+JOURNAL_WRITE_BEHIND = bool(st.secrets.get("JOURNAL_WRITE_BEHIND", False))   # group-commit journal/temps inserts
+SENSOR_REALTIME    = bool(st.secrets.get("SENSOR_REALTIME", True))            # push feed for sensor_readings
+SENSOR_RAW_RETENTION_DAYS = float(st.secrets.get("SENSOR_RAW_RETENTION_DAYS", 14))   # older raw readings live in rollups only
+OPENWEATHER_CALLS_PER_MIN = float(st.secrets.get("OPENWEATHER_CALLS_PER_MIN", 60))   # API quota, per process
 
 # Matplotlib: Arabic-safe
 matplotlib.rcParams["axes.unicode_minus"] = False
@@ -86,24 +102,24 @@ GCC_CITY_TZ = {
     "Muscat,OM":"Asia/Muscat"
 }
 def get_active_tz() -> ZoneInfo:
-    """Use user's saved timezone if set; else infer from current city; else UTC."""
+    """Use user's saved timezone if set; else infer from current city; else Asia/Dubai."""
     user = st.session_state.get("user")
-    prefs = load_user_prefs(user) if user else {}
-    tz_pref = (prefs.get("timezone") or "").strip()
+    prefs = load_user_prefs(user) if user else {}   # cached per user (see get_user_cache)
+    tz_pref = (prefs.get("timezone") or st.session_state.get("settings_tz") or "").strip()
     if tz_pref:
         try:
             return ZoneInfo(tz_pref)
         except Exception:
             st.warning(f"Unknown timezone '{tz_pref}', falling back to city.")
     city_code = st.session_state.get("current_city")
-    tz_code = GCC_CITY_TZ.get(city_code, "UTC")
+    tz_code = GCC_CITY_TZ.get(city_code, "Asia/Dubai")
     try:
         return ZoneInfo(tz_code)
     except Exception:
-        return ZoneInfo("UTC")
+        return timezone.utc
 
 # Live config
-WEATHER_TTL_SEC = 15 * 60
+WEATHER_TTL_SEC = 10 * 60    # older stored weather is served while it revalidates in the background
 ALERT_DELTA_C = 0.5
 
 # ================== I18N ==================
@@ -155,6 +171,9 @@ TEXTS = {
         "filter_by_type": "Filter by type",
         "newer": "⬅️ Newer",
         "older": "Older ➡️",
+        "latest": "⏫ Latest",
+        "jump_to_date": "Jump to date",
+        "search_journal": "🔎 Search notes, symptoms, triggers, actions",
         "reset_chat": "🧹 Reset chat",
         "thinking": "Thinking...",
         "ask_me_anything": "Ask me anything...",
@@ -221,6 +240,9 @@ TEXTS = {
         "filter_by_type": "تصفية حسب النوع",
         "newer": "⬅️ الأحدث",
         "older": "الأقدم ➡️",
+        "latest": "⏫ الأحدث أولاً",
+        "jump_to_date": "الانتقال إلى تاريخ",
+        "search_journal": "🔎 ابحث في الملاحظات والأعراض والمحفزات والإجراءات",
         "reset_chat": "🧹 إعادة تعيين المحادثة",
         "thinking": "جاري التفكير...",
         "ask_me_anything": "اسألني أي شيء...",
@@ -299,57 +321,27 @@ st.markdown(ACCESSIBLE_CSS, unsafe_allow_html=True)
 
 # ================== DB ==================
 @st.cache_resource
+def get_db():
+    # Per-thread readers + one serialized writer (see tanzim_db.ConnectionManager);
+    # schema migrations run once per process here, not on every rerun.
+    return tanzim_db.ConnectionManager(tanzim_db.DB_PATH)
+
+@st.cache_resource
+def get_journal_writer():
+    # Optional write-behind queue for journal/temps inserts (secret JOURNAL_WRITE_BEHIND)
+    return tanzim_db.GroupCommitWriter(get_db()) if JOURNAL_WRITE_BEHIND else None
+
 def get_conn():
-    conn = sqlite3.connect("tanzim_ms.db", check_same_thread=False)
-    conn.execute("PRAGMA foreign_keys = ON;")
-    return conn
-
-def ensure_emergency_contacts_schema():
-    conn = get_conn(); c = conn.cursor()
-    c.execute("PRAGMA table_info(emergency_contacts)")
-    cols = [r[1] for r in c.fetchall()]
-    if "updated_at" not in cols:
-        c.execute("ALTER TABLE emergency_contacts ADD COLUMN updated_at TEXT")
-        c.execute("UPDATE emergency_contacts SET updated_at = ?", (utc_iso_now(),))
-        conn.commit()
-
-def ensure_user_prefs_schema():
-    conn = get_conn(); c = conn.cursor()
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS user_prefs(
-            username TEXT PRIMARY KEY,
-            home_city TEXT,
-            timezone TEXT,
-            language TEXT,
-            ai_style TEXT,
-            updated_at TEXT,
-            FOREIGN KEY (username) REFERENCES users(username) ON DELETE CASCADE
-        )
-    """)
-    conn.commit()
-
-def init_db():
-    conn = get_conn(); c = conn.cursor()
-    c.execute("""CREATE TABLE IF NOT EXISTS users(username TEXT PRIMARY KEY, password TEXT)""")
-    c.execute("""CREATE TABLE IF NOT EXISTS temps(
-        username TEXT, date TEXT, body_temp REAL, peripheral_temp REAL,
-        weather_temp REAL, feels_like REAL, humidity REAL, status TEXT
-    )""")
-    c.execute("""CREATE TABLE IF NOT EXISTS journal(username TEXT, date TEXT, entry TEXT)""")
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS emergency_contacts(
-            username TEXT PRIMARY KEY,
-            primary_phone TEXT,
-            secondary_phone TEXT,
-            updated_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ','now')),
-            FOREIGN KEY (username) REFERENCES users(username) ON DELETE CASCADE
-        )
-    """)
-    conn.commit()
-    ensure_emergency_contacts_schema()
-    ensure_user_prefs_schema()
+    """This thread's read-only connection. Writes go through get_db().transaction()."""
+    wb = get_journal_writer()
+    seq = st.session_state.get("_wb_pending_seq")
+    if wb is not None and seq is not None:
+        # Read-your-writes: only a session with an insert still queued waits for the flush
+        if wb.committed(seq) or wb.wait_seq(seq):
+            del st.session_state["_wb_pending_seq"]
+    return get_db().reader()
 
-init_db()
+get_db()
 
 # ================== SUPABASE ==================
 @st.cache_resource
@@ -359,49 +351,110 @@ def get_supabase(url: str, key: str):
 sb = get_supabase(SUPABASE_URL, SUPABASE_ANON_KEY)
 
 # ================== Your fetchers (no silent fails) ==================
-def fetch_latest_sensor_sample(device_id: str) -> dict | None:
+@st.cache_resource
+def get_sensor_sync():
+    # One syncer per process: every session watching a device shares its mirror and cursor
+    return tanzim_sensors.SensorSync(get_db(), sb, raw_retention_days=SENSOR_RAW_RETENTION_DAYS or None)
+
+def _sync_sensor(device_id: str):
+    try:
+        get_sensor_sync().sync(device_id)
+    except Exception as e:
+        # Show the actual cause; the mirror still serves what we already have
+        st.error(f"Supabase error while syncing readings: {e}")
+
+@st.cache_resource
+def get_device_buffers():
+    # Shared NumPy ring per device, fed by get_sensor_sync(); sessions read views of it
+    return tanzim_sensors.DeviceBuffers(get_sensor_sync())
+
+@st.cache_resource
+def get_sensor_feed():
+    # Realtime INSERT listener; while it is live, readings are pushed and nothing polls
+    if not (SENSOR_REALTIME and SUPABASE_URL):
+        return None
+    return tanzim_realtime.RealtimeFeed(get_sensor_sync(), tanzim_realtime.realtime_url(SUPABASE_URL),
+                                        SUPABASE_ANON_KEY)
+
+def sensor_feed_live(device_id: str) -> bool:
+    feed = get_sensor_feed()
+    if feed is None:
+        return False
+    try:
+        return feed.watch(device_id)
+    except Exception as e:
+        st.error(f"Supabase error while syncing readings: {e}")
+        return False
+
+def fetch_sensor_window(device_id: str, limit: int = 240) -> tanzim_sensors.SensorSeries | None:
     if not device_id:
         st.error("Device id missing"); return None
+    ring = get_device_buffers().ring(device_id)
+    if not sensor_feed_live(device_id):
+        _sync_sensor(device_id)   # polling fallback: throttled + single-flight across all viewers
+    return ring.last(limit)
+
+# Chart ranges (seconds) and how many new readings invalidate each range's decimated cache
+CHART_RANGES = {"1h": 3600, "6h": 6 * 3600, "24h": 24 * 3600, "7d": 7 * 86400, "30d": 30 * 86400,
+                "90d": 90 * 86400}
+CHART_RANGE_REFRESH = {"1h": 1, "6h": 1, "24h": 3, "7d": 30, "30d": 90, "90d": 180}
+CHART_ROLLUP_RES = {"7d": 900, "30d": 3600, "90d": 3600}   # long ranges chart rollup buckets, not raw rows
+CHART_BUCKETS = 600   # ≈ plot width in pixels; min/max keeps at most 2 points per bucket per trace
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def _decimated_range(device_id: str, range_key: str, version: int):
+    # `version` only keys the cache (ring.version // CHART_RANGE_REFRESH[range_key])
+    now_ms = int(time.time() * 1000)
+    since_ms = now_ms - CHART_RANGES[range_key] * 1000
+    conn = get_conn()
+    above_ms = tanzim_rollup.time_above_ms(conn, device_id, since_ms)
+    if range_key in CHART_ROLLUP_RES:
+        r = tanzim_rollup.read(conn, device_id, CHART_ROLLUP_RES[range_key], since_ms)
+        return r.envelope("core"), r.envelope("peri"), int(r.n.sum()), above_ms, since_ms, now_ms
+    w = tanzim_sensors.history(conn, device_id, since_ms)
+    core = tanzim_decimate.minmax(w.t_ms, w.core, CHART_BUCKETS, since_ms, now_ms)
+    peri = tanzim_decimate.minmax(w.t_ms, w.peripheral, CHART_BUCKETS, since_ms, now_ms)
+    return core, peri, len(w.t_ms), above_ms, since_ms, now_ms
+
+def fetch_sensor_range(device_id: str, range_key: str):
+    """
+    (core (t_ms, y), peripheral (t_ms, y), reading count, ms above baseline+0.5, since_ms,
+    now_ms) for the range: min/max-decimated raw readings, or rollup buckets for long ranges.
+    """
+    since_ms = int(time.time() * 1000) - CHART_RANGES[range_key] * 1000
     try:
-        res = (sb.table("sensor_readings")
-                 .select("core_c,peripheral_c,created_at")
-                 .eq("device_id", device_id)
-                 .order("created_at", desc=True)
-                 .limit(1)
-                 .execute())
-        rows = res.data or []
-        if not rows:
-            return None
-        row = rows[0]
-        core = row.get("core_c")
-        per  = row.get("peripheral_c")
-        return {
-            "core": float(core) if core is not None else None,
-            "peripheral": float(per) if per is not None else None,
-            "at": row.get("created_at"),
-        }
+        get_sensor_sync().ensure_history(device_id, since_ms)   # one-time pull of older rows
     except Exception as e:
-        # Show the actual cause instead of pretending "no data"
-        st.error(f"Supabase error while fetching latest sample: {e}")
-        return None
+        st.error(f"Supabase error while loading history: {e}")
+    version = get_device_buffers().ring(device_id).version // CHART_RANGE_REFRESH[range_key]
+    return _decimated_range(device_id, range_key, version)
 
-@st.cache_data(ttl=30)
-def fetch_sensor_series(device_id: str, limit: int = 240):
+@st.fragment(run_every=1.0)
+def _live_refresh(device_id: str, seen_version: int):
+    # In-memory check only (no queries): rerun the page as soon as the device ring grows,
+    # whether the rows were pushed or pulled by another session.
+    if get_device_buffers().ring(device_id).version != seen_version:
+        st.rerun(scope="app")
+
+def fetch_latest_sensor_sample(device_id: str) -> dict | None:
+    w = fetch_sensor_window(device_id, 1)
+    return w.latest() if w is not None else None
+
+def fetch_uhthoff_episode(device_id: str) -> dict | None:
+    """The device's open Uhthoff episode, as tracked over every stored reading."""
+    return tanzim_episodes.open_episode(get_conn(), device_id) if device_id else None
+
+def register_device(device_id: str):
+    """Put the user's device under the headless alert worker (alert_worker.py); once per session."""
+    user = st.session_state.get("user")
+    if not (user and device_id) or st.session_state.get("_registered_device") == (user, device_id):
+        return
     try:
-        res = (
-            sb.table("sensor_readings")
-              .select("core_c,peripheral_c,created_at")
-              .eq("device_id", device_id)
-              .order("created_at", desc=True)
-              .limit(limit)
-              .execute()
-        )
-        data = res.data or []
-        data = sorted(data, key=lambda r: r["created_at"])
-        return data
+        with get_db().transaction() as conn:
+            tanzim_alerts.register_device(conn, user, device_id)
+        st.session_state["_registered_device"] = (user, device_id)
     except Exception as e:
-        st.error(f"Supabase error while fetching series: {e}")
-        return []
+        st.error(f"Could not register device for alerts: {e}")
 
 
 # ================== UTILS ==================
@@ -415,21 +468,29 @@ def normalize_phone(s: str) -> str:
 def tel_href(s: str) -> str:
     return normalize_phone(s)
 
+def _fmt_num(v):
+    """12.0 -> 12, 7.5 -> 7.5 (typed REAL columns read back as floats)."""
+    return int(v) if float(v).is_integer() else v
+
 def utc_iso_now():
     return datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
 
 def insert_temp_row(u, dt, body, peripheral, wtemp, feels, hum, status):
-    c = get_conn().cursor()
-    c.execute("""
-        INSERT INTO temps (username, date, body_temp, peripheral_temp, weather_temp, feels_like, humidity, status)
-        VALUES (?,?,?,?,?,?,?,?)
-    """, (u, dt, body, peripheral, wtemp, feels, hum, status))
-    get_conn().commit()
+    wb = get_journal_writer()
+    if wb is not None:
+        st.session_state["_wb_pending_seq"] = wb.submit(u, tanzim_db.insert_temp, u, dt, body, peripheral,
+                                                        wtemp, feels, hum, status)
+        return
+    with get_db().transaction() as conn:
+        tanzim_db.insert_temp(conn, u, dt, body, peripheral, wtemp, feels, hum, status)
 
 def insert_journal(u, dt, entry_obj):
-    c = get_conn().cursor()
-    c.execute("INSERT INTO journal VALUES (?,?,?)", (u, dt, json.dumps(entry_obj)))
-    get_conn().commit()
+    wb = get_journal_writer()
+    if wb is not None:
+        st.session_state["_wb_pending_seq"] = wb.submit(u, tanzim_journal.insert_entry, u, dt, entry_obj)
+        return
+    with get_db().transaction() as conn:
+        tanzim_journal.insert_entry(conn, u, dt, entry_obj)
 
 def fetch_temps_df(user):
     c = get_conn().cursor()
@@ -442,16 +503,8 @@ def fetch_temps_df(user):
     return pd.DataFrame(rows, columns=cols)
 
 def fetch_journal_df(user):
-    c = get_conn().cursor()
-    c.execute("SELECT date, entry FROM journal WHERE username=? ORDER BY date ASC", (user,))
-    rows = c.fetchall()
-    parsed = []
-    for dt, raw in rows:
-        try:
-            obj = json.loads(raw); parsed.append({"date": dt, **obj})
-        except Exception:
-            parsed.append({"date": dt, "type": "NOTE", "text": raw})
-    return pd.DataFrame(parsed)
+    # Typed columns + child lists flattened in SQL; no per-row JSON decoding
+    return pd.read_sql_query(tanzim_journal.EXPORT_SQL, get_conn(), params=(user,))
 
 def build_export_excel_or_zip(user) -> tuple[bytes, str]:
     temps = fetch_temps_df(user)
@@ -478,57 +531,54 @@ def build_export_excel_or_zip(user) -> tuple[bytes, str]:
     memzip.seek(0)
     return memzip.read(), "application/zip"
 
+TZ_DUBAI = ZoneInfo("Asia/Dubai")
+
 def dubai_now_str():
     return datetime.now(TZ_DUBAI).strftime("%Y-%m-%d %H:%M")
 
 # ================== WEATHER ==================
-@st.cache_data(ttl=600)
-def get_weather(city="Abu Dhabi,AE"):
+@st.cache_resource
+def get_weather_client():
+    # One pooled keep-alive session per process; current + forecast fetched concurrently,
+    # identical concurrent requests made once, every call charged to the shared quota
+    return tanzim_weather.WeatherClient(OPENWEATHER_API_KEY,
+                                        limiter=tanzim_weather.TokenBucket.per_minute(OPENWEATHER_CALLS_PER_MIN))
+
+@st.cache_resource
+def get_weather_store():
+    # Persistent, shared across sessions/processes/restarts; stale readings are served at once
+    return tanzim_weather.WeatherStore(get_db(), get_weather_client(), ttl=WEATHER_TTL_SEC)
+
+@st.cache_resource
+def get_weather_prefetcher():
+    # Keeps every GCC city + every user's home city warm, so page renders never wait on OpenWeather
     if not OPENWEATHER_API_KEY:
-        return None, "Missing OPENWEATHER_API_KEY"
-    try:
-        base = "https://api.openweathermap.org/data/2.5/"
-        params_now = {"q": city, "appid": OPENWEATHER_API_KEY, "units": "metric", "lang": "en"}
-        r_now = requests.get(base + "weather", params=params_now, timeout=6)
-        r_now.raise_for_status()
-        jn = r_now.json()
-        temp = float(jn["main"]["temp"])
-        feels = float(jn["main"]["feels_like"])
-        hum = float(jn["main"]["humidity"])
-        desc = jn["weather"][0]["description"]
-
-        params_fc = {"q": city, "appid": OPENWEATHER_API_KEY, "units": "metric", "lang": "en"}
-        r_fc = requests.get(base + "forecast", params=params_fc, timeout=8)
-        r_fc.raise_for_status()
-        jf = r_fc.json()
-        items = jf.get("list", [])[:16]
-        forecast = [{
-            "dt": it["dt"],
-            "time": it["dt_txt"],
-            "temp": float(it["main"]["temp"]),
-            "feels_like": float(it["main"]["feels_like"]),
-            "humidity": float(it["main"]["humidity"]),
-            "desc": it["weather"][0]["description"]
-        } for it in items]
-        top = sorted(forecast, key=lambda x: x["feels_like"], reverse=True)[:4]
-        peak_hours = [f'{t["time"][5:16]} (~{round(t["feels_like"])}°C, {int(t["humidity"])}%)' for t in top]
-        return {"temp": temp, "feels_like": feels, "humidity": hum, "desc": desc,
-                "forecast": forecast, "peak_hours": peak_hours}, None
-    except Exception as e:
-        return None, str(e)
+        return None
+    db = get_db()                                       # resolved here: the prefetch thread never touches st.cache_*
+    return tanzim_weather.WeatherPrefetcher(
+        get_weather_store(), lambda: GCC_CITIES + tanzim_db.home_cities(db.reader()),
+        calls_per_min=OPENWEATHER_CALLS_PER_MIN / 2)    # half the quota; the rest is for page lookups
+
+def get_weather(city="Abu Dhabi,AE"):
+    data, err, _ = get_weather_store().get(city, wait=False)
+    return data, err
+
+@st.cache_resource
+def get_gazetteer():
+    # Bundled GCC cities/beaches/parks/malls (EN + AR aliases); resolves most names without the API
+    return tanzim_places.Gazetteer.load()
+
+def geocode_place(q, city=None):
+    """(name, lat, lon): the local gazetteer first, the geocoding API only for unknown names."""
+    p = get_gazetteer().resolve(q, city)
+    if p is not None:
+        return (p.name_ar if app_language == "Arabic" else p.name), p.lat, p.lon
+    return _geocode_api(q)
 
 @st.cache_data(ttl=600)
-def geocode_place(q):
+def _geocode_api(q):
     try:
-        url = "https://api.openweathermap.org/geo/1.0/direct"
-        r = requests.get(url, params={"q": q, "limit": 1, "appid": OPENWEATHER_API_KEY}, timeout=6)
-        r.raise_for_status()
-        arr = r.json()
-        if not arr:
-            return q, None, None
-        it = arr[0]
-        name = it.get("name") or q
-        return name, it.get("lat"), it.get("lon")
+        return get_weather_client().geocode(q)
     except Exception:
         return q, None, None
 
@@ -537,130 +587,84 @@ def get_weather_by_coords(lat, lon):
     if not OPENWEATHER_API_KEY or lat is None or lon is None:
         return None
     try:
-        url = "https://api.openweathermap.org/data/2.5/weather"
-        r = requests.get(url, params={"lat": lat, "lon": lon, "appid": OPENWEATHER_API_KEY, "units":"metric"}, timeout=6)
-        r.raise_for_status()
-        j = r.json()
-        return {"temp": float(j["main"]["temp"]),
-                "feels_like": float(j["main"]["feels_like"]),
-                "humidity": float(j["main"]["humidity"]),
-                "desc": j["weather"][0]["description"]}
+        return get_weather_client().current(lat=lat, lon=lon)
     except Exception:
         return None
 
 def get_weather_cached(city: str):
-    st.session_state.setdefault("_weather_cache", {})
-    rec = st.session_state["_weather_cache"].get(city)
-    now = time.time()
-    needs_refresh = (rec is None) or (now - rec["ts"] > WEATHER_TTL_SEC)
-    if needs_refresh:
-        data, err = get_weather(city)
-        if data is None:
-            if rec:
-                return rec["data"], None, rec["ts"]
-            return None, err, None
-        st.session_state["_weather_cache"][city] = {"data": data, "ts": now}
-        return data, None, now
+    """(weather, error, fetched_at epoch s) from the shared weather store; never waits on the network."""
+    return get_weather_store().get(city, wait=False)
+
+def weather_error(err):
+    if err == tanzim_weather.LOADING:
+        st.info(_L("⏳ Fetching weather for this city… it will appear on the next refresh.",
+                   "⏳ جارٍ جلب الطقس لهذه المدينة… سيظهر عند التحديث التالي."))
     else:
-        return rec["data"], None, rec["ts"]
+        st.error(f"{T['weather_fail']}: {err or '—'}")
+
+def weather_freshness(city: str, fetched_at) -> str:
+    """'Weather 4 min ago • refreshing…' caption for a stored reading."""
+    if fetched_at is None:
+        return ""
+    mins = int((time.time() - fetched_at) // 60)
+    out = _L(f"Weather updated {mins} min ago", f"تحديث الطقس قبل {mins} دقيقة")
+    if get_weather_store().refreshing(city):
+        out += _L(" • refreshing…", " • جارٍ التحديث…")
+    elif time.time() - fetched_at > 2 * WEATHER_TTL_SEC:
+        out += _L(" • ⚠️ stale", " • ⚠️ قديمة")
+    return out
+
+get_weather_prefetcher()
 
 # ================== RISK MODEL ==================
-TRIGGER_WEIGHTS = {
-    "Exercise": 2, "Sauna/Hot bath": 3, "Spicy food": 1, "Hot drinks": 1, "Stress/Anxiety": 1,
-    "Direct sun exposure": 2, "Fever/Illness": 3, "Hormonal cycle": 1, "Tight clothing": 1,
-    "Poor sleep": 1, "Dehydration": 2, "Crowded place": 1, "Cooking heat": 1, "Car without AC": 2,
-    "Outdoor work": 2, "Long prayer standing": 1
-}
-SYMPTOM_WEIGHT = 0.5
-
-def risk_from_env(feels_like_c: float, humidity: float) -> int:
-    score = 0
-    if feels_like_c >= 39: score += 3
-    elif feels_like_c >= 35: score += 2
-    elif feels_like_c >= 32: score += 1
-    if humidity >= 60 and feels_like_c >= 32:
-        score += 1
-    return score
-
-def risk_from_person(body_temp: float, baseline: float) -> int:
-    delta = (body_temp - baseline) if (body_temp is not None and baseline is not None) else 0.0
-    if delta >= 1.0: return 2
-    if delta >= 0.5: return 1
-    return 0
-
-def compute_risk(feels_like, humidity, body_temp, baseline, triggers, symptoms):
-    score = 0
-    score += risk_from_env(feels_like or 0.0, humidity or 0.0)
-    score += risk_from_person(body_temp, baseline or 37.0)
-    score += sum(TRIGGER_WEIGHTS.get(t, 0) for t in (triggers or []))
-    score += SYMPTOM_WEIGHT * len(symptoms or [])
-    if score >= 7:
-        return {"score": score, "status": "Danger", "color": "red", "icon": "🔴",
-                "advice": "High risk: stay in AC, avoid exertion, cooling packs, rest; seek clinical advice if severe."}
-    elif score >= 5:
-        return {"score": score, "status": "High", "color": "orangered", "icon": "🟠",
-                "advice": "Elevated: limit outdoor time esp. midday; pre-cool and pace activities."}
-    elif score >= 3:
-        return {"score": score, "status": "Caution", "color": "orange", "icon": "🟡",
-                "advice": "Mild risk: hydrate, take breaks, prefer shade/AC, and monitor symptoms."}
-    else:
-        return {"score": score, "status": "Safe", "color": "green", "icon": "🟢",
-                "advice": "You look safe. Keep cool and hydrated."}
+# Both models live in tanzim_risk (shared with the alert worker and backtest.py)
+TRIGGER_WEIGHTS = tanzim_risk.TRIGGER_WEIGHTS
+SYMPTOM_WEIGHT = tanzim_risk.SYMPTOM_WEIGHT
+compute_risk = tanzim_risk.compute_risk
 
 # ================== PREFERENCES & CONTACTS ==================
+@st.cache_resource
+def get_user_cache():
+    # one per process: every session of the same user shares the cached prefs/contacts
+    return tanzim_db.UserCache()
+
 def save_emergency_contacts(username, primary_phone, secondary_phone):
-    conn = get_conn(); c = conn.cursor()
-    p1 = tel_href(primary_phone); p2 = tel_href(secondary_phone); now = utc_iso_now()
+    p1 = tel_href(primary_phone); p2 = tel_href(secondary_phone)
     try:
-        c.execute("""
-            INSERT INTO emergency_contacts (username, primary_phone, secondary_phone, updated_at)
-            VALUES (?,?,?,?)
-            ON CONFLICT(username) DO UPDATE SET
-                primary_phone=excluded.primary_phone,
-                secondary_phone=excluded.secondary_phone,
-                updated_at=excluded.updated_at
-        """, (username, p1, p2, now))
-        conn.commit(); return True, None
+        with get_db().transaction() as conn:
+            tanzim_db.write_emergency_contacts(conn, username, p1, p2, utc_iso_now())
+        get_user_cache().put("contacts", username, (p1, p2))
+        return True, None
     except Exception as e:
+        get_user_cache().invalidate("contacts", username)
         return False, str(e)
 
 def load_emergency_contacts(username):
-    c = get_conn().cursor()
     try:
-        c.execute("SELECT primary_phone, secondary_phone FROM emergency_contacts WHERE username=?", (username,))
-        row = c.fetchone()
-        if row: return row[0] or "", row[1] or ""
-        return "", ""
+        return get_user_cache().get("contacts", username,
+                                    lambda: tanzim_db.read_emergency_contacts(get_conn(), username))
     except Exception:
         return "", ""
 
 def load_user_prefs(username):
     if not username: return {}
-    c = get_conn().cursor()
-    c.execute("SELECT home_city, timezone, language, ai_style FROM user_prefs WHERE username=?", (username,))
-    row = c.fetchone()
-    if not row: return {}
-    return {"home_city": row[0], "timezone": row[1], "language": row[2], "ai_style": row[3]}
+    return get_user_cache().get("prefs", username, lambda: tanzim_db.read_user_prefs(get_conn(), username))
 
 def save_user_prefs(username, home_city=None, timezone=None, language=None, ai_style=None):
-    conn = get_conn(); c = conn.cursor()
     prev = load_user_prefs(username)
-    home_city = home_city if home_city is not None else prev.get("home_city")
-    timezone = timezone if timezone is not None else prev.get("timezone")
-    language  = language  if language  is not None else prev.get("language")
-    ai_style  = ai_style  if ai_style  is not None else prev.get("ai_style")
-    now = utc_iso_now()
-    c.execute("""
-        INSERT INTO user_prefs (username, home_city, timezone, language, ai_style, updated_at)
-        VALUES (?,?,?,?,?,?)
-        ON CONFLICT(username) DO UPDATE SET
-          home_city=excluded.home_city,
-          timezone=excluded.timezone,
-          language=excluded.language,
-          ai_style=excluded.ai_style,
-          updated_at=excluded.updated_at
-    """, (username, home_city, timezone, language, ai_style, now))
-    conn.commit()
+    prefs = {
+        "home_city": home_city if home_city is not None else prev.get("home_city"),
+        "timezone":  timezone  if timezone  is not None else prev.get("timezone"),
+        "language":  language  if language  is not None else prev.get("language"),
+        "ai_style":  ai_style  if ai_style  is not None else prev.get("ai_style"),
+    }
+    try:
+        with get_db().transaction() as conn:
+            tanzim_db.write_user_prefs(conn, username, prefs, utc_iso_now())
+    except Exception:
+        get_user_cache().invalidate("prefs", username)
+        raise
+    get_user_cache().put("prefs", username, prefs)
 
 # ================== AI HELPERS ==================
 ACTIONS_EN = [
@@ -676,82 +680,65 @@ ACTIONS_AR = [
 def _actions_for_lang(lang):
     return ACTIONS_AR if lang == "Arabic" else ACTIONS_EN
 
+def _utc_cutoff_iso(days: int) -> str:
+    return (_dt.now(timezone.utc) - timedelta(days=days)).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
 def get_top_actions_counts(username: str, lookback_days: int = 30) -> list[tuple[str,int]]:
     try:
-        c = get_conn().cursor()
-        c.execute("SELECT date, entry FROM journal WHERE username=? ORDER BY date DESC LIMIT 500", (username,))
-        rows = c.fetchall()
+        return tanzim_journal.top_actions(get_conn(), username, _utc_cutoff_iso(lookback_days), 6)
     except Exception:
-        rows = []
-    counts = {}
-    cutoff = _dt.now(timezone.utc) - timedelta(days=lookback_days)
-    for dt_raw, raw in rows:
-        try:
-            obj = json.loads(raw)
-        except Exception:
-            continue
-        if obj.get("type") != "RECOVERY": continue
-        try:
-            ts = _dt.fromisoformat(dt_raw.replace("Z","+00:00"))
-        except Exception:
-            ts = _dt.now(timezone.utc)
-        if ts < cutoff: continue
-        for a in obj.get("actions", []):
-            a = str(a).strip()
-            if a: counts[a] = counts.get(a, 0) + 1
-    return sorted(counts.items(), key=lambda kv: (-kv[1], kv[0]))[:6]
+        return []
+
+def get_recovery_stats(username: str, lookback_days: int = 60) -> dict:
+    try:
+        return tanzim_journal.recovery_stats(get_conn(), username, _utc_cutoff_iso(lookback_days))
+    except Exception:
+        return {"count": 0, "avg_duration_min": None, "avg_core_drop": None}
 
 def _format_top_actions_str(username: str, lang: str) -> str:
     tops = get_top_actions_counts(username, 60)
     if not tops: return ""
+    stats = get_recovery_stats(username, 60)
     if lang == "Arabic":
         lines = ["إجراءات فعّالة مؤخرًا لهذا المستخدم:"]
         lines += [f"- {a} ×{n}" for a,n in tops]
+        if stats["avg_duration_min"] is not None:
+            lines.append(f"({stats['count']} حالات تعافٍ، متوسط التحسن ~{round(stats['avg_duration_min'])} دقيقة)")
     else:
         lines = ["Top effective actions for this user recently:"]
         lines += [f"- {a} ×{n}" for a,n in tops]
+        if stats["avg_duration_min"] is not None:
+            lines.append(f"({stats['count']} recoveries, typically improved in ~{round(stats['avg_duration_min'])} min)")
     return "\n".join(lines)
 
 def get_recent_journal_context(username: str, max_entries: int = 5) -> str:
     try:
-        c = get_conn().cursor()
-        c.execute("""
-            SELECT date, entry FROM journal 
-            WHERE username=? ORDER BY date DESC LIMIT ?
-        """, (username, max_entries))
-        rows = c.fetchall()
+        rows = tanzim_journal.recent_entries(get_conn(), username, max_entries)
     except Exception:
         rows = []
     if not rows:
         return "No recent journal entries."
     lines = []
-    for dt, raw in rows:
-        try: entry = json.loads(raw)
-        except Exception: 
-            entry = {"type":"NOTE", "text":str(raw)}
-        t = entry.get("type","NOTE")
+    for r in rows:
+        t = r["type"] or "NOTE"
         if t == "DAILY":
-            lines.append(f"Daily: mood={entry.get('mood','?')}, hydration={entry.get('hydration_glasses','?')}glasses, sleep={entry.get('sleep_hours','?')}h, fatigue={entry.get('fatigue','?')}")
+            fat = f"{r['fatigue']}/10" if r["fatigue"] is not None else "?"
+            hyd = int(r["hydration"]) if r["hydration"] is not None else "?"
+            slp = _fmt_num(r["sleep"]) if r["sleep"] is not None else "?"
+            lines.append(f"Daily: mood={r['mood'] or '?'}, hydration={hyd}glasses, sleep={slp}h, fatigue={fat}")
         elif t in ("ALERT","ALERT_AUTO"):
-            core = entry.get("core_temp") or entry.get("body_temp"); base = entry.get("baseline")
+            core = r["core"]; base = r["baseline"]
             delta = f"+{round(core-base,1)}°C" if (core is not None and base is not None) else ""
-            lines.append(f"Alert: core={core}°C {delta}; reasons={entry.get('reasons',[])}; symptoms={entry.get('symptoms',[])}")
+            lines.append(f"Alert: core={core}°C {delta}; reasons={r['reasons']}; symptoms={r['symptoms']}")
         elif t == "PLAN":
-            lines.append(f"Plan: {entry.get('activity','?')} in {entry.get('city','?')} ({entry.get('start','?')}→{entry.get('end','?')})")
+            lines.append(f"Plan: {r['activity'] or '?'} in {r['city'] or '?'} ({r['start_at'] or '?'}→{r['end_at'] or '?'})")
         elif t == "RECOVERY":
-            from_s = entry.get("from_status","?"); to_s = entry.get("to_status","?")
-            acts = entry.get("actions",[])
-            core_b = entry.get("core_before"); core_a = entry.get("core_after")
-            d = None
-            try:
-                if core_a is not None and core_b is not None:
-                    d = round(core_a - core_b,1)
-            except Exception:
-                pass
+            core_b = r["core_before"]; core_a = r["core_after"]
+            d = round(core_a - core_b,1) if (core_a is not None and core_b is not None) else None
             tail = f" Δcore {d:+.1f}°C" if d is not None else ""
-            lines.append(f"Recovery: {from_s}→{to_s}; actions={acts}{tail}")
+            lines.append(f"Recovery: {r['from_status'] or '?'}→{r['to_status'] or '?'}; actions={r['actions']}{tail}")
         else:
-            note = (entry.get("text") or entry.get("note") or "").strip()
+            note = (r["note"] or "").strip()
             if note: lines.append("Note: " + note[:100] + ("..." if len(note)>100 else ""))
     return "\n".join(lines[:10])
 
@@ -772,19 +759,9 @@ def get_weather_context(city: str | None):
 
 def resolve_city_for_chat(prompt_text: str | None) -> str | None:
     """Try to infer a city from prompt or user prefs; avoid defaulting to Dubai unless chosen."""
-    txt = (prompt_text or "").lower()
-    mapping = {
-        "abu dhabi": "Abu Dhabi,AE","abudhabi":"Abu Dhabi,AE","أبوظبي":"Abu Dhabi,AE",
-        "dubai":"Dubai,AE","دبي":"Dubai,AE","sharjah":"Sharjah,AE","الشارقة":"Sharjah,AE",
-        "doha":"Doha,QA","qatar":"Doha,QA","الدوحة":"Doha,QA","قطر":"Doha,QA",
-        "kuwait":"Kuwait City,KW","الكويت":"Kuwait City,KW",
-        "manama":"Manama,BH","المنامة":"Manama,BH",
-        "riyadh":"Riyadh,SA","الرياض":"Riyadh,SA","jeddah":"Jeddah,SA","جدة":"Jeddah,SA",
-        "dammam":"Dammam,SA","الدمام":"Dammam,SA","muscat":"Muscat,OM","مسقط":"Muscat,OM",
-        "al rayyan":"Al Rayyan,QA","الريان":"Al Rayyan,QA"
-    }
-    for k,v in mapping.items():
-        if k in txt: return v
+    # first city (or landmark that pins one city) mentioned, in English or Arabic
+    city = get_gazetteer().find_city(prompt_text or "")
+    if city: return city
     # state or prefs
     if st.session_state.get("current_city"): return st.session_state["current_city"]
     if "user" in st.session_state:
@@ -1525,28 +1502,6 @@ def render_about_page(lang: str = "English"):
     st.markdown("</div>", unsafe_allow_html=True)
 
 # ================== PLANNER ==================
-def best_windows_from_forecast(forecast, window_hours=2, top_k=8, max_feels_like=35.0, max_humidity=65, avoid_hours=(10,16)):
-    slots = []
-    for it in forecast[:16]:
-        t = it["time"]; hour = int(t[11:13])
-        if avoid_hours[0] <= hour < avoid_hours[1]: continue
-        if it["feels_like"] <= max_feels_like and it["humidity"] <= max_humidity:
-            slots.append(it)
-    cand = []
-    for i in range(len(slots)):
-        group = [slots[i]]
-        if i+1 < len(slots):
-            t1, t2 = slots[i]["time"], slots[i+1]["time"]
-            if t1[:10] == t2[:10] and (int(t2[11:13]) - int(t1[11:13]) == 3):
-                group.append(slots[i+1])
-        avg_feels = round(sum(g["feels_like"] for g in group)/len(group), 1)
-        avg_hum = int(sum(g["humidity"] for g in group)/len(group))
-        start_dt = _dt.strptime(group[0]["time"][:16], "%Y-%m-%d %H:%M")
-        end_dt = (_dt.strptime(group[-1]["time"][:16], "%Y-%m-%d %H:%M") + timedelta(hours=3)) if len(group)>1 else (start_dt + timedelta(hours=3))
-        cand.append({ "start_dt": start_dt, "end_dt": end_dt, "avg_feels": avg_feels, "avg_hum": avg_hum })
-    cand.sort(key=lambda x: x["start_dt"])
-    return cand[:top_k]
-
 def render_planner():
     st.title("🗺️ " + T["planner"])
     if "user" not in st.session_state:
@@ -1558,17 +1513,25 @@ def render_planner():
         default_city = prefs.get("home_city") or "Abu Dhabi,AE"
     city = st.selectbox("📍 " + T["quick_pick"], GCC_CITIES, index=GCC_CITIES.index(default_city) if default_city in GCC_CITIES else 0,
                         key="planner_city", format_func=lambda c: city_label(c, app_language))
-    weather, err = get_weather(city)
+    weather, err, w_at = get_weather_cached(city)
     if weather is None:
-        st.error(f"{T['weather_fail']}: {err}"); return
+        weather_error(err); return
+    st.caption(weather_freshness(city, w_at))
 
     tabs = st.tabs(["✅ " + ("Best windows" if app_language=="English" else "أفضل الأوقات"),
                     "🤔 " + ("What‑if" if app_language=="English" else "ماذا لو"),
-                    "📍 " + ("Places" if app_language=="English" else "الأماكن")])
+                    "📍 " + ("Places" if app_language=="English" else "الأماكن"),
+                    "🌍 " + ("Compare cities" if app_language=="English" else "قارن المدن")])
 
     with tabs[0]:
-        st.caption("We scanned the next 48h for cooler 2‑hour windows." if app_language=="English" else "فحصنا الـ48 ساعة القادمة للعثور على فترات أكثر برودة (ساعتين).")
-        windows = best_windows_from_forecast(weather["forecast"], window_hours=2, top_k=12, max_feels_like=35.0, max_humidity=65)
+        win_h = st.select_slider(("Window length" if app_language=="English" else "طول الفترة"),
+                                 options=[0.5, 1.0, 1.5, 2.0, 3.0, 4.0], value=2.0, key="planner_window_h",
+                                 format_func=lambda h: (f"{h:g} h" if app_language=="English" else f"{h:g} س"))
+        days = len(weather["forecast"]) * 3 // 24
+        st.caption(f"We scanned the next {days} days for the coolest {win_h:g}‑hour windows (your local time)."
+                   if app_language=="English" else f"فحصنا الأيام الـ{days} القادمة للعثور على أبرد فترات بطول {win_h:g} ساعة (بتوقيتك المحلي).")
+        windows = tanzim_planner.best_windows(weather["forecast"], hours=win_h, top_k=12, step_min=15, tz=get_active_tz(),
+                                              max_feels_like=35.0, max_humidity=65)
         if not windows:
             st.info("No optimal windows found; consider early morning or after sunset."
                     if app_language == "English" else "لم يتم العثور على فترات مثالية؛ فكر في الصباح الباكر أو بعد الغروب.")
@@ -1578,13 +1541,12 @@ def render_planner():
                 COL_DATE, COL_START, COL_END, COL_FEELS, COL_HUM = "التاريخ","البداية","النهاية","المحسوسة (°م)","الرطوبة (%)"
             else:
                 COL_DATE, COL_START, COL_END, COL_FEELS, COL_HUM = "Date","Start","End","Feels-like (°C)","Humidity (%)"
-            windows_sorted = sorted(windows, key=lambda x: x["start_dt"])
             rows = [{"idx":i,
                      COL_DATE: w["start_dt"].strftime("%a %d %b"),
                      COL_START: w["start_dt"].strftime("%H:%M"),
                      COL_END: w["end_dt"].strftime("%H:%M"),
                      COL_FEELS: round(w["avg_feels"],1),
-                     COL_HUM: int(w["avg_hum"])} for i,w in enumerate(windows_sorted)]
+                     COL_HUM: int(w["avg_hum"])} for i,w in enumerate(windows)]
             df = pd.DataFrame(rows)
             st.dataframe(df.drop(columns=["idx"]), hide_index=True, use_container_width=True)
 
@@ -1598,7 +1560,7 @@ def render_planner():
                         return f"{r[COL_DATE]} • {r[COL_START]}–{r[COL_END]} (≈{r[COL_FEELS]}°C, {r[COL_HUM]}%)"
                 options = [labeler(r) for r in rows]
                 pick_label = st.selectbox(("Choose a slot" if app_language=="English" else "اختر فترة"), options, index=0, key="plan_pick")
-                pick_idx = rows[options.index(pick_label)]["idx"]; chosen = windows_sorted[pick_idx]
+                pick_idx = rows[options.index(pick_label)]["idx"]; chosen = windows[pick_idx]
             with colB:
                 activities = ["Walk","Groceries","Beach","Errand"] if app_language=="English" else ["مشي","تسوق","شاطئ","مهمة"]
                 act = st.selectbox(("Plan" if app_language=="English" else "خطة"), activities, key="plan_act")
@@ -1657,14 +1619,19 @@ def render_planner():
         st.caption("Check a specific place in your city, like a beach or park." if app_language=="English" else "تحقق من مكان محدد في مدينتك، مثل شاطئ أو حديقة.")
         place_q = st.text_input(("Place name (e.g., Saadiyat Beach)" if app_language=="English" else "اسم المكان (مثال: شاطئ السعديات)"), key="place_q")
         if place_q:
-            place, lat, lon = geocode_place(place_q)
+            if not get_gazetteer().lookup(place_q):
+                hints = get_gazetteer().complete(place_q, 5)
+                if hints:
+                    st.caption(("Did you mean: " if app_language=="English" else "هل تقصد: ")
+                               + " • ".join((h.name_ar if app_language=="Arabic" else h.name) for h in hints))
+            place, lat, lon = geocode_place(place_q, city)
             pw = get_weather_by_coords(lat, lon) if (lat and lon) else None
             if pw:
                 st.info(f"**{place}** — feels‑like {round(pw['feels_like'],1)}°C • humidity {int(pw['humidity'])}% • {pw['desc']}")
                 better = "place" if pw["feels_like"] < weather["feels_like"] else "city"
                 st.caption(f"{'Cooler now' if app_language=='English' else 'أبرد الآن'}: **{place if better=='place' else city}**")
                 if st.button(("Plan here for the next hour" if app_language=="English" else "خطط هنا للساعة القادمة"), key="place_plan"):
-                    now_dxb = datetime.now(TZ_DUBAI)
+                    now_dxb = datetime.now(get_active_tz())
                     entry = {
                         "type":"PLAN","at": utc_iso_now(),"city": place,
                         "start": now_dxb.strftime("%Y-%m-%d %H:%M"),
@@ -1678,15 +1645,63 @@ def render_planner():
                 st.warning(("Couldn't fetch that place's weather." if app_language=="English" else "تعذر جلب طقس هذا المكان."))
         st.caption(f"**Peak heat next 48h:** " + ("; ".join(weather.get('peak_hours', [])) if weather.get('peak_hours') else "—"))
 
+    with tabs[3]:
+        render_city_comparison()
+
+def render_city_comparison():
+    """Best windows in every GCC city at once, from the stored forecasts (no network wait)."""
+    ar = app_language == "Arabic"
+    win_h = st.select_slider(("طول الفترة" if ar else "Window length"), options=[0.5, 1.0, 1.5, 2.0, 3.0, 4.0],
+                             value=2.0, key="compare_window_h", format_func=lambda h: f"{h:g} " + ("س" if ar else "h"))
+    forecasts, loading = {}, []
+    for c in GCC_CITIES:
+        w, _, _ = get_weather_cached(c)              # cold cities load in the background
+        if w and w.get("forecast"):
+            forecasts[c] = w["forecast"]
+        else:
+            loading.append(city_label(c, app_language))
+    if loading:
+        st.info(("⏳ لا يزال الطقس قيد التحميل لـ: " if ar else "⏳ Still loading weather for: ")
+                + ("، " if ar else ", ").join(loading))
+    if not forecasts:
+        return
+    tzs = {c: ZoneInfo(GCC_CITY_TZ.get(c, "UTC")) for c in forecasts}
+    cmp = tanzim_planner.compare(forecasts, tzs, hours=win_h, top_k=3, step_min=15,
+                                 max_feels_like=35.0, max_humidity=65)
+    st.caption(f"Coolest {win_h:g}‑hour window per city over the next days, in each city's local time."
+               if not ar else f"أبرد فترة بطول {win_h:g} ساعة لكل مدينة خلال الأيام القادمة، بالتوقيت المحلي لكل مدينة.")
+
+    COL_RANK, COL_CITY, COL_WHEN, COL_FEELS, COL_HUM, COL_NEXT = (
+        ("#", "المدينة", "أفضل فترة", "المحسوسة (°م)", "الرطوبة (%)", "بدائل") if ar else
+        ("#", "City", "Best window", "Feels-like (°C)", "Humidity (%)", "Runner-ups"))
+    rows = []
+    for rank, c in enumerate(cmp.cities, 1):
+        ws = cmp.windows[c]
+        fmt = lambda w: f"{w['start_dt']:%a %d %b} {w['start_dt']:%H:%M}–{w['end_dt']:%H:%M}"
+        rows.append({COL_RANK: rank if ws else "—", COL_CITY: city_label(c, app_language),
+                     COL_WHEN: fmt(ws[0]) if ws else "—",
+                     COL_FEELS: ws[0]["avg_feels"] if ws else None, COL_HUM: ws[0]["avg_hum"] if ws else None,
+                     COL_NEXT: "; ".join(fmt(w) for w in ws[1:]) or "—"})
+    st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+
+    days = [d.strftime("%a %d") for d in cmp.days]
+    fig = go.Figure(go.Heatmap(
+        z=cmp.best_feels, x=days, y=[city_label(c, app_language) for c in cmp.cities],
+        colorscale="RdYlBu_r", zmin=24, zmax=35, hoverongaps=False,
+        colorbar=dict(title="°C"),
+        hovertemplate="%{y} • %{x}: %{z:.1f}°C<extra></extra>"))
+    fig.update_layout(height=60 + 32 * len(cmp.cities), margin=dict(l=10, r=10, t=10, b=10),
+                      yaxis=dict(autorange="reversed"))
+    st.plotly_chart(fig, use_container_width=True, key="compare_heatmap")
+    st.caption("Each cell: the feels-like of that day's best window (blank = no window under the limits)."
+               if not ar else "كل خانة: درجة الحرارة المحسوسة لأفضل فترة في ذلك اليوم (فارغة = لا توجد فترة ضمن الحدود).")
+
 # =========================
 # Heat Monitor — Minimal model (Env + ΔCore) with Uhthoff floor
 # Live: 2 charts (Core+Periph) and (Core+Periph+Feels-like)
 # Demo: Core + Feels-like + Baseline only; no journaling, but same UI experience
 # =========================
 
-# ---------- Status scale ----------
-_STATUS_LEVEL = {"Safe": 0, "Caution": 1, "High": 2, "Danger": 3}
-
 # ---------- Utilities ----------
 def _is_ar() -> bool:
     return (app_language == "Arabic")
@@ -1698,24 +1713,6 @@ def _status_label() -> str:
     # Uses your T dict if available; otherwise localized fallback.
     return T.get("status", _L("Status", "الحالة"))
 
-def get_active_tz():
-    """Use user's saved timezone if available; fallback to Asia/Dubai; then UTC."""
-    tz_code = None
-    try:
-        if "user" in st.session_state:
-            prefs = load_user_prefs(st.session_state["user"]) or {}
-            tz_code = prefs.get("timezone") or st.session_state.get("settings_tz")
-    except Exception:
-        pass
-    try:
-        return ZoneInfo(tz_code) if tz_code else ZoneInfo("Asia/Dubai")
-    except Exception:
-        # Fallbacks if zoneinfo not available or invalid code
-        try:
-            return TZ_DUBAI   # if you defined it elsewhere
-        except Exception:
-            return timezone.utc
-
 # ---------- Cooling actions (use app lists if present; else defaults) ----------
 def _actions_for_ui(lang: str):
     ae = list(globals().get("ACTIONS_EN", [])) or [
@@ -1762,124 +1759,53 @@ def _symptoms_for_ui(lang: str):
             "Spasticity","Heat intolerance","Cognitive fog","Dizziness","Headache","Pain","Tingling"
         ]))
 
-# ---------- Minimal risk model: Environment (FL/H) + ΔCore only ----------
-def compute_risk_minimal(feels_like, humidity, core, baseline, lang: str = "English") -> Dict[str, Any]:
+# ---------- Minimal risk model: Environment (FL/H) + ΔCore only (see tanzim_risk) ----------
+compute_risk_minimal = tanzim_risk.compute_risk_minimal
+apply_uhthoff_floor = tanzim_risk.apply_uhthoff_floor
+
+def _risk_band(t_ms, core, weather, baseline, end_ms, to_local, city) -> list[dict]:
     """
-    Score uses only environment + ΔCore (Uhthoff).
-    Status: Safe <3; Caution 3–4.5; High 5–6.5; Danger ≥7.
-    Localized advice.
+    Plotly shapes: a thin strip under the chart colored by risk status at each plotted point,
+    scored against the weather stored for the city at that time (the current reading where
+    no stored observation covers it).
     """
-    score = 0.0
-
-    # Environment (feels-like tiers)
-    if feels_like is not None:
-        fl = float(feels_like)
-        if   fl >= 42: score += 4
-        elif fl >= 39: score += 3
-        elif fl >= 35: score += 2
-        elif fl >= 32: score += 1
-
-    # Humidity penalty when hot
-    if humidity is not None and feels_like is not None:
-        if float(humidity) >= 60 and float(feels_like) >= 32:
-            score += 1
-
-    # Uhthoff (ΔCore)
-    if core is not None and baseline is not None:
-        delta = float(core) - float(baseline)
-        if   delta >= 1.0: score += 2
-        elif delta >= 0.5: score += 1
-
-    # Localized advice text
-    texts = {
-        "Danger": {
-            "en": "High risk: move to AC, stop exertion, active cooling, hydrate; seek care if severe.",
-            "ar": "خطر مرتفع: انتقل إلى المكيّف، أوقف الجهد، استخدم تبريدًا نشطًا، رطّب؛ اطلب رعاية عند الأعراض الشديدة."
-        },
-        "High": {
-            "en": "Elevated: limit outdoor time, pre‑cool, frequent rests, hydrate.",
-            "ar": "مرتفع: قلّل الوقت خارجًا، برّد مسبقًا، خذ فترات راحة متكررة، ورطّب."
-        },
-        "Caution": {
-            "en": "Mild risk: hydrate, pace yourself, prefer shade/AC.",
-            "ar": "حذر: رطّب، نظّم جهدك، فضّل الظل/المكيّف."
-        },
-        "Safe": {
-            "en": "Safe window. Keep cool and hydrated.",
-            "ar": "فترة آمنة. ابقَ باردًا ورطّب جيدًا."
-        }
-    }
-    if score >= 7:
-        return {"score": score, "status": "Danger", "color": "red", "icon": "🔴",
-                "advice": texts["Danger"]["ar" if lang=="Arabic" else "en"]}
-    elif score >= 5:
-        return {"score": score, "status": "High", "color": "orangered", "icon": "🟠",
-                "advice": texts["High"]["ar" if lang=="Arabic" else "en"]}
-    elif score >= 3:
-        return {"score": score, "status": "Caution", "color": "orange", "icon": "🟡",
-                "advice": texts["Caution"]["ar" if lang=="Arabic" else "en"]}
-    else:
-        return {"score": score, "status": "Safe", "color": "green", "icon": "🟢",
-                "advice": texts["Safe"]["ar" if lang=="Arabic" else "en"]}
-
-# ---------- Uhthoff floor: enforce minimum severity from ΔCore ----------
-def apply_uhthoff_floor(risk: Dict[str, Any],
-                        core: Optional[float],
-                        baseline: Optional[float],
-                        lang: str = "English") -> Dict[str, Any]:
-    """ΔCore ≥0.5°C => ≥Caution; ΔCore ≥1.0°C => ≥High; never lowers severity. Localized advice."""
-    if core is None or baseline is None:
-        return risk
-    try:
-        delta = float(core) - float(baseline)
-    except Exception:
-        return risk
-
-    texts = {
-        "High": {
-            "en": "Core ≥ 1.0°C above baseline (Uhthoff). Move to AC, pre‑cool, hydrate, rest 15–20 min.",
-            "ar": "الأساسية ≥ 1.0°م فوق الأساس (أوتهوف). انتقل للمكيّف، برّد مسبقًا، رطّب، استرح 15–20 دقيقة."
-        },
-        "Caution": {
-            "en": "Core ≥ 0.5°C above baseline (Uhthoff). Pre‑cool, limit exertion, hydrate, rest 15–20 min.",
-            "ar": "الأساسية ≥ 0.5°م فوق الأساس (أوتهوف). برّد مسبقًا، قلّل الجهد، رطّب، واسترح 15–20 دقيقة."
-        }
-    }
-
-    level = _STATUS_LEVEL.get(risk.get("status", "Safe"), 0)
-    if delta >= 1.0 and level < _STATUS_LEVEL["High"]:
-        risk.update({
-            "status": "High", "color": "orangered", "icon": "🟠",
-            "advice": texts["High"]["ar" if lang=="Arabic" else "en"]
-        })
-    elif delta >= 0.5 and level < _STATUS_LEVEL["Caution"]:
-        risk.update({
-            "status": "Caution", "color": "orange", "icon": "🟡",
-            "advice": texts["Caution"]["ar" if lang=="Arabic" else "en"]
-        })
-    return risk
+    w = weather or {}
+    nan_none = lambda v: np.nan if v is None else float(v)
+    fl, hum = tanzim_weather.aligned(get_db().reader(), city, t_ms)
+    fl = np.where(np.isnan(fl), nan_none(w.get("feels_like")), fl)
+    hum = np.where(np.isnan(hum), nan_none(w.get("humidity")), hum)
+    level = tanzim_risk.assess(fl, hum, core, baseline).level
+    spans = tanzim_risk.runs(np.asarray(t_ms), level, end_ms)
+    if not spans:
+        return []
+    starts, ends, levels = zip(*spans)
+    x0, x1 = to_local(list(starts)), to_local(list(ends))
+    return [dict(type="rect", xref="x", yref="paper", x0=a, x1=b, y0=0, y1=0.05, line_width=0, opacity=0.6,
+                 fillcolor=tanzim_risk.STATUS_STYLE[tanzim_risk.STATUSES[lv]][0], layer="below")
+            for a, b, lv in zip(x0, x1, levels)]
 
 # ---------- Uhthoff hysteresis / latch ----------
-UHTHOFF_RAISE = 0.5  # raise at +0.5°C
-UHTHOFF_CLEAR = 0.3  # clear only once below +0.3°C
+UHTHOFF_RAISE = tanzim_risk.UHTHOFF_RAISE
+UHTHOFF_CLEAR = tanzim_risk.UHTHOFF_CLEAR
 
-def update_uhthoff_latch(core: Optional[float], baseline: Optional[float]):
-    """Live tab latch."""
+def update_uhthoff_latch(episode: Optional[dict]):
+    """Live tab latch: mirrors the device's open episode from the persisted detector (tanzim_episodes)."""
     st.session_state.setdefault("_uhthoff_active", False)
     st.session_state.setdefault("_uhthoff_started_iso", None)
     st.session_state.setdefault("_uhthoff_alert_journaled", False)
-    if core is None or baseline is None:
-        return
-    delta = float(core) - float(baseline)
-    active_prev = st.session_state["_uhthoff_active"]
-    if (not active_prev) and (delta >= UHTHOFF_RAISE):
-        st.session_state["_uhthoff_active"] = True
-        st.session_state["_uhthoff_started_iso"] = utc_iso_now()
-        st.session_state["_uhthoff_alert_journaled"] = False
-    if active_prev and (delta < UHTHOFF_CLEAR):
+    st.session_state.setdefault("_uhthoff_episode_id", None)
+    if episode is None:
         st.session_state["_uhthoff_active"] = False
         st.session_state["_uhthoff_started_iso"] = None
         st.session_state["_uhthoff_alert_journaled"] = False
+        st.session_state["_uhthoff_episode_id"] = None
+        return
+    if st.session_state["_uhthoff_episode_id"] != episode["id"]:     # a new episode: journal it once
+        st.session_state["_uhthoff_episode_id"] = episode["id"]
+        st.session_state["_uhthoff_alert_journaled"] = False
+    st.session_state["_uhthoff_active"] = True
+    st.session_state["_uhthoff_started_iso"] = datetime.fromtimestamp(
+        episode["start_ms"] / 1000, tz=timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
 
 def update_demo_uhthoff_latch(core: Optional[float], baseline: Optional[float]):
     """Demo tab latch (no journaling)."""
@@ -1961,27 +1887,28 @@ def render_monitor():
                                                           st.session_state["device_id"])
 
         # Weather + baseline
-        weather, w_err, _ = get_weather_cached(city)
+        weather, w_err, w_at = get_weather_cached(city)
         baseline = float(st.session_state.get("baseline", 37.0))
         st.caption(_L(f"Baseline: **{baseline:.1f}°C**", f"خط الأساس: **{baseline:.1f}°م**"))
 
         # Latest + time window
         device_id = st.session_state["device_id"]
-        sample = fetch_latest_sensor_sample(device_id)
-        series = fetch_sensor_series(device_id, limit=240)
+        series = fetch_sensor_window(device_id, limit=240)
+        sample = series.latest() if series is not None else None
+        is_push = sensor_feed_live(device_id)
+        if device_id:
+            _live_refresh(device_id, get_device_buffers().ring(device_id).version)
+            get_sensor_sync().set_baseline(device_id, baseline)   # time-above threshold for new rollups
+            register_device(device_id)
 
         # Recency
         last_update_label, is_stale = "—", True
         active_tz = get_active_tz()
-        if sample and sample.get("at"):
-            try:
-                dt = datetime.fromisoformat(sample["at"].replace("Z","+00:00"))
-                mins = int((datetime.now(timezone.utc) - dt).total_seconds() // 60)
-                last_update_label = dt.astimezone(active_tz).strftime("%Y-%m-%d %H:%M") + \
-                                    (_L(f" • {mins}m ago", f" • قبل {mins} دقيقة"))
-                is_stale = mins >= 3
-            except Exception:
-                pass
+        if series is not None and len(series):
+            mins = int((time.time() * 1000 - series.last_ms) // 60_000)
+            last_update_label = series[-1:].times(active_tz)[0].strftime("%Y-%m-%d %H:%M") + \
+                                (_L(f" • {mins}m ago", f" • قبل {mins} دقيقة"))
+            is_stale = mins >= 3
 
         # Top strip
         colA, colB, colC, colD = st.columns([1.6,1,1,1.4])
@@ -1990,7 +1917,8 @@ def render_monitor():
             st.caption(_L(
                 f"Device: {device_id} • Last: {last_update_label}",
                 f"الجهاز: {device_id} • آخر تحديث: {last_update_label}"
-            ) + ( _L(" • ⚠️ stale", " • ⚠️ قديمة") if is_stale else "" ))
+            ) + ( _L(" • ⚠️ stale", " • ⚠️ قديمة") if is_stale else "" )
+              + ( _L(" • ⚡ realtime", " • ⚡ مباشر") if is_push else "" ))
         with colB:
             fl = weather.get("feels_like") if weather else None
             st.metric(_L("Feels‑like", "المحسوسة"), f"{fl:.1f}°C" if fl is not None else "—")
@@ -1999,10 +1927,9 @@ def render_monitor():
             st.metric(_L("Humidity", "الرطوبة"), f"{int(hum)}%" if hum is not None else "—")
         with colD:
             if st.button(T.get("refresh_weather", _L("🔄 Refresh weather now", "🔄 تحديث الطقس الآن"))):
-                try: get_weather.clear()
-                except Exception: pass
-                st.session_state["_weather_cache"] = {}
-                st.rerun()
+                get_weather_store().revalidate(city)   # in the background; the page keeps the stored reading
+                st.toast(_L("Refreshing weather…", "جارٍ تحديث الطقس…"))
+            st.caption(weather_freshness(city, w_at))
 
         # Metrics
         col1, col2, col3, col4 = st.columns(4)
@@ -2046,7 +1973,7 @@ def render_monitor():
             </div>
             """, unsafe_allow_html=True)
 
-            update_uhthoff_latch(core_val, baseline)
+            update_uhthoff_latch(fetch_uhthoff_episode(device_id))
             if st.session_state["_uhthoff_active"] and not st.session_state["_uhthoff_alert_journaled"]:
                 entry = {
                     "type":"ALERT_AUTO","at": utc_iso_now(),
@@ -2059,7 +1986,11 @@ def render_monitor():
                     "humidity": float(weather["humidity"]),
                     "device_id": device_id
                 }
-                insert_journal(st.session_state.get("user","guest"), utc_iso_now(), entry)
+                # keyed by episode: the alert worker may already have journaled it
+                with get_db().transaction() as conn:
+                    tanzim_alerts.journal_alert(conn, st.session_state.get("user","guest"), device_id,
+                                                [f"uhthoff:{st.session_state['_uhthoff_episode_id']}"], entry,
+                                                tanzim_risk.STATUS_LEVEL[risk["status"]])
                 st.session_state["_uhthoff_alert_journaled"] = True
                 st.warning(_L("⚠️ Uhthoff trigger logged to Journal", "⚠️ تم تسجيل تنبيه أوتهوف في اليوميات"))
 
@@ -2087,7 +2018,7 @@ def render_monitor():
                         st.success(_L("Added to Journal", "تمت الإضافة"))
 
         elif not weather:
-            st.error(f"{T['weather_fail']}: {w_err or '—'}")
+            weather_error(w_err)
 
         # Manual alert
         with st.expander(_L("Log alert manually", "سجّل تنبيهًا يدويًا")):
@@ -2167,61 +2098,96 @@ def render_monitor():
 
         # Charts (Live)
         st.markdown("---")
-        if series:
-            times  = [datetime.fromisoformat(r["created_at"].replace("Z","+00:00")).astimezone(active_tz) for r in series]
-            core_s = [float(r["core_c"]) if r.get("core_c") is not None else None for r in series]
-            peri_s = [float(r["peripheral_c"]) if r.get("peripheral_c") is not None else None for r in series]
-            fl_s   = [float(r["feels_like"]) if ("feels_like" in r and r["feels_like"] is not None) else None for r in series]
+        if series is not None and len(series):
+            # Range (decimated server-side: payload stays ~2 points per pixel column, spikes kept)
+            rng = st.radio(_L("Range", "المدى"), list(CHART_RANGES), horizontal=True, key="monitor_range",
+                           format_func=lambda k: _L(k, k.replace("h", " س").replace("d", " ي")))
+            (tc, yc), (tp, yp), n_raw, above_ms, since_ms, now_ms = fetch_sensor_range(device_id, rng)
+            to_local = lambda t: pd.to_datetime(t, unit="ms", utc=True).tz_convert(active_tz)
+            mode = "lines+markers" if len(tc) <= 400 else "lines"
+            x_range = [to_local([since_ms])[0], to_local([now_ms])[0]]
+            band = _risk_band(tc, yc, weather, baseline, now_ms, to_local, city)
 
             # 1) Core & Peripheral
             st.subheader(_L("Core & Peripheral (Live)", "الأساسية والطرفية (مباشر)"))
             fig1 = go.Figure()
-            fig1.add_trace(go.Scatter(x=times, y=core_s, mode="lines+markers", name=_L("Core","الأساسية")))
-            fig1.add_trace(go.Scatter(x=times, y=peri_s, mode="lines+markers", name=_L("Peripheral","الطرفية")))
+            fig1.add_trace(go.Scatter(x=to_local(tc), y=yc, mode=mode, name=_L("Core","الأساسية")))
+            fig1.add_trace(go.Scatter(x=to_local(tp), y=yp, mode=mode, name=_L("Peripheral","الطرفية")))
             fig1.update_layout(height=300, margin=dict(l=10,r=10,t=10,b=10),
                                xaxis_title=_L("Time (Local)","الوقت (المحلي)"),
                                yaxis_title=_L("Temperature (°C)","درجة الحرارة (°م)"),
+                               xaxis_range=x_range, shapes=band,
                                legend=dict(orientation="h", y=1.1))
-            st.plotly_chart(fig1, use_container_width=True)
+            st.plotly_chart(fig1, use_container_width=True, key="live_chart_core")
+            above_min = above_ms / 60_000
+            st.caption(_L(f"{n_raw:,} readings in range • {len(tc) + len(tp):,} points plotted • "
+                          f"{above_min:,.0f} min ≥ baseline+0.5°C",
+                          f"{n_raw:,} قراءة في المدى • {len(tc) + len(tp):,} نقطة معروضة • "
+                          f"{above_min:,.0f} دقيقة ≥ الأساس+0.5°م"))
 
             # Raw data (after chart 1)
             with st.expander(_L("Raw data","البيانات الخام"), expanded=False):
-                df = pd.DataFrame({
-                    _L("Time (Local)","الوقت (المحلي)"): [t.strftime("%Y-%m-%d %H:%M:%S") for t in times],
-                    _L("Core (°C)","الأساسية (°م)"): core_s,
-                    _L("Peripheral (°C)","الطرفية (°م)"): peri_s,
+                # views of the shared device ring; only the time axis is converted per session
+                df = series.to_frame(active_tz)
+                df["time"] = series.labels(active_tz)
+                df[["core", "peripheral"]] = df[["core", "peripheral"]].astype("float64").round(2)   # no float32 noise
+                df = df.rename(columns={
+                    "time": _L("Time (Local)","الوقت (المحلي)"),
+                    "core": _L("Core (°C)","الأساسية (°م)"),
+                    "peripheral": _L("Peripheral (°C)","الطرفية (°م)"),
                 })
                 st.dataframe(df.iloc[::-1], use_container_width=True)
 
             # sampling caption
-            if len(times) >= 2:
-                gaps_sec = [(times[i]-times[i-1]).total_seconds() for i in range(1, len(times))]
-                med_gap = statistics.median(gaps_sec)
-                hours = (times[-1] - times[0]).total_seconds() / 3600
-                st.caption(_L(f"Sampling: ~{med_gap/60:.1f} min between points • Window: ~{hours:.1f} h",
-                              f"التقاط: ~{med_gap/60:.1f} دقيقة بين النقاط • نافذة: ~{hours:.1f} ساعة"))
+            gaps = series.gaps()
+            if gaps is not None:
+                st.caption(_L(f"Sampling: ~{gaps.median_s/60:.1f} min between points • Window: ~{gaps.span_h:.1f} h"
+                              + (f" • {gaps.gaps} gaps (longest {gaps.max_s/60:.0f} min)" if gaps.gaps else ""),
+                              f"التقاط: ~{gaps.median_s/60:.1f} دقيقة بين النقاط • نافذة: ~{gaps.span_h:.1f} ساعة"
+                              + (f" • {gaps.gaps} انقطاع (الأطول {gaps.max_s/60:.0f} دقيقة)" if gaps.gaps else "")))
+
+            # Uhthoff episodes (detected over every stored reading, not only while this page is open)
+            episodes = tanzim_episodes.recent(get_conn(), device_id, 20)
+            with st.expander(_L(f"Uhthoff episodes ({len(episodes)})", f"نوبات أوتهوف ({len(episodes)})"), expanded=False):
+                if episodes:
+                    fmt = lambda ms: (pd.Timestamp(ms, unit="ms", tz="UTC").tz_convert(active_tz).strftime("%Y-%m-%d %H:%M")
+                                      if ms is not None else _L("ongoing", "مستمرة"))
+                    st.dataframe(pd.DataFrame({
+                        _L("Start","البداية"): [fmt(e["start_ms"]) for e in episodes],
+                        _L("End","النهاية"): [fmt(e["end_ms"]) for e in episodes],
+                        _L("Duration (min)","المدة (دقيقة)"): [None if e["duration_s"] is None else round(e["duration_s"] / 60)
+                                                             for e in episodes],
+                        _L("Peak core (°C)","ذروة الأساسية (°م)"): [round(e["peak_core"], 2) for e in episodes],
+                        _L("Peak Δ (°C)","ذروة Δ (°م)"): [e["peak_delta"] for e in episodes],
+                    }), use_container_width=True, hide_index=True)
+                else:
+                    st.caption(_L("No episodes ≥ baseline+0.5°C recorded for this device.",
+                                  "لا توجد نوبات ≥ الأساس+0.5°م لهذا الجهاز."))
 
             # 2) Core, Peripheral & Feels-like
             st.subheader(_L("Core, Peripheral & Feels‑like (Live)",
                             "الأساسية، الطرفية والمحسوسة (مباشر)"))
             fig2 = go.Figure()
-            fig2.add_trace(go.Scatter(x=times, y=core_s, mode="lines+markers", name=_L("Core","الأساسية")))
-            fig2.add_trace(go.Scatter(x=times, y=peri_s, mode="lines+markers", name=_L("Peripheral","الطرفية")))
-            if any(v is not None for v in fl_s):
-                fig2.add_trace(go.Scatter(x=times, y=fl_s, mode="lines+markers", name=_L("Feels‑like","المحسوسة")))
-            else:
-                fl_now = float(weather["feels_like"]) if (weather and weather.get("feels_like") is not None) else None
-                if fl_now is not None and len(times) > 0:
-                    fig2.add_trace(go.Scatter(
-                        x=times, y=[fl_now]*len(times), mode="lines",
-                        name=_L("Feels‑like (current)","المحسوسة (الحالية)"),
-                        line=dict(dash="dash")
-                    ))
+            fig2.add_trace(go.Scatter(x=to_local(tc), y=yc, mode=mode, name=_L("Core","الأساسية")))
+            fig2.add_trace(go.Scatter(x=to_local(tp), y=yp, mode=mode, name=_L("Peripheral","الطرفية")))
+            # readings carry no feels-like; draw the current weather value across the range
+            fl_now = float(weather["feels_like"]) if (weather and weather.get("feels_like") is not None) else None
+            if fl_now is not None:
+                fig2.add_trace(go.Scatter(
+                    x=x_range, y=[fl_now, fl_now], mode="lines",
+                    name=_L("Feels‑like (current)","المحسوسة (الحالية)"),
+                    line=dict(dash="dash")
+                ))
             fig2.update_layout(height=300, margin=dict(l=10,r=10,t=10,b=10),
                                xaxis_title=_L("Time (Local)","الوقت (المحلي)"),
                                yaxis_title=_L("Temperature (°C)","درجة الحرارة (°م)"),
+                               xaxis_range=x_range, shapes=band,
                                legend=dict(orientation="h", y=1.1))
-            st.plotly_chart(fig2, use_container_width=True)
+            st.plotly_chart(fig2, use_container_width=True, key="live_chart_feels")
+            st.caption(_L("Bottom band: risk status over time (🟢 Safe • 🟡 Caution • 🟠 High • 🔴 Danger), "
+                          "scored with the weather recorded at each time (current weather where none was stored).",
+                          "الشريط السفلي: حالة الخطر عبر الوقت (🟢 آمن • 🟡 حذر • 🟠 مرتفع • 🔴 خطر)، "
+                          "محسوبة بالطقس المسجل في كل وقت (أو الطقس الحالي إن لم يُسجَّل)."))
         else:
             st.info(_L("No recent Supabase readings yet. Once your device uploads, you’ll see a live chart here.",
                        "لا توجد قراءات حديثة من Supabase بعد. عند رفع الجهاز للبيانات ستظهر الرسوم هنا."))
@@ -2354,6 +2320,11 @@ def render_monitor():
 
 
 # ================== JOURNAL (includes RECOVERY) ==================
+# EN<->AR label pairs so "dizziness" also finds "دوخة" (and vice versa)
+JOURNAL_SEARCH_ALIASES = tanzim_journal.build_aliases([
+    (TRIGGERS_EN, TRIGGERS_AR), (SYMPTOMS_EN, SYMPTOMS_AR), (ACTIONS_EN, ACTIONS_AR)
+])
+
 def render_journal():
     st.title("📒 " + T["journal"])
     if "user" not in st.session_state:
@@ -2405,28 +2376,67 @@ def render_journal():
 
     st.markdown("---")
 
-    # Load rows (SQLite as per your current implementation)
-    c = get_conn().cursor()
-    c.execute("SELECT date, entry FROM journal WHERE username=? ORDER BY date DESC", (st.session_state["user"],))
-    rows = c.fetchall()
-    if not rows:
+    # Load rows (typed columns; type filter applied in SQL)
+    conn = get_conn()
+    if tanzim_journal.count_entries(conn, st.session_state["user"]) == 0:
         st.info("No journal entries yet." if app_language=="English" else "لا توجد مدخلات بعد.")
         return
 
+    # Full-text search (FTS5): ranked hits, highlighted, instead of the paged list
+    query = st.text_input(T["search_journal"], key="jr_search").strip()
+    if query:
+        t0 = time.perf_counter()
+        hits = tanzim_journal.search(conn, st.session_state["user"], query, limit=20, aliases=JOURNAL_SEARCH_ALIASES)
+        ms = (time.perf_counter() - t0) * 1000
+        st.caption(_L(f"{len(hits)} result(s) in {ms:.1f} ms", f"{len(hits)} نتيجة خلال {ms:.1f} مللي ثانية"))
+        for h in hits:
+            try:
+                when = _dt.fromisoformat(h["date"].replace("Z","+00:00")).astimezone(active_tz).strftime("%Y-%m-%d %H:%M")
+            except Exception:
+                when = h["date"]
+            text = " • ".join(x for x in (h["note"], h["activity"], h["city"]) if x)
+            tags = ", ".join(v for f in tanzim_journal.LIST_TABLES for v in h[f])
+            body = tanzim_journal.highlight(text, h["_terms"])
+            if tags:
+                body += ("<br/>" if body else "") + "🏷️ " + tanzim_journal.highlight(tags, h["_terms"], width=240)
+            st.markdown(f"""
+            <div class="big-card" style="--left:#94a3b8;margin-bottom:12px;">
+              <h3 style="margin:0">🔎 {when} — {h['type'] or 'NOTE'}</h3>
+              <div style="margin-top:6px">{body or '—'}</div>
+            </div>
+            """, unsafe_allow_html=True)
+        return
+
     available_types = ["PLAN","ALERT","ALERT_AUTO","RECOVERY","DAILY","NOTE"]
-    type_filter = st.multiselect(T["filter_by_type"], options=available_types, default=available_types, key="jr_type_filter")
+    colf, colj = st.columns([3,1])
+    with colf:
+        type_filter = st.multiselect(T["filter_by_type"], options=available_types, default=available_types, key="jr_type_filter")
+    with colj:
+        jump = st.date_input(T["jump_to_date"], value=None, key="jr_jump_date")
     page_size = 12
-    st.session_state.setdefault("journal_offset", 0)
-    start = st.session_state["journal_offset"]; end = start + 200
-    chunk = rows[start:end]
 
-    def _render_entry(raw_entry_json):
-        try:
-            obj = json.loads(raw_entry_json)
-        except Exception:
-            obj = {"type":"NOTE","at": utc_iso_now(), "text": str(raw_entry_json)}
-        t = obj.get("type","NOTE")
-        when = obj.get("at", utc_iso_now())
+    # Keyset cursor: None (latest) | ("before", (date, id)) | ("after", (date, id))
+    st.session_state.setdefault("journal_cursor", None)
+    sig = (tuple(type_filter), jump)
+    if st.session_state.get("_jr_view_sig") != sig:
+        st.session_state["_jr_view_sig"] = sig
+        st.session_state["journal_cursor"] = None
+        if jump is not None:
+            day_end = datetime.combine(jump, datetime.max.time()).replace(tzinfo=active_tz)
+            end_iso = day_end.astimezone(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+            st.session_state["journal_cursor"] = ("before", (end_iso, tanzim_journal.MAX_ID))
+    cursor = st.session_state["journal_cursor"]
+    types = None if set(type_filter) == set(available_types) else type_filter
+    pg = tanzim_journal.page(conn, st.session_state["user"], types, page_size,
+                             before=cursor[1] if cursor and cursor[0] == "before" else None,
+                             after=cursor[1] if cursor and cursor[0] == "after" else None)
+    chunk = pg["rows"]
+    if not chunk:
+        st.info("No entries here." if app_language=="English" else "لا توجد مدخلات هنا.")
+
+    def _render_entry(obj):
+        t = obj.get("type") or "NOTE"
+        when = obj.get("at") or obj.get("date") or utc_iso_now()
         try:
             dt = _dt.fromisoformat(when.replace("Z","+00:00"))
         except Exception:
@@ -2436,7 +2446,7 @@ def render_journal():
         when_label = dt.astimezone(active_tz).strftime("%Y-%m-%d %H:%M")
 
         if t == "RECOVERY":
-            from_s = obj.get("from_status","?"); to_s = obj.get("to_status","?")
+            from_s = obj.get("from_status") or "?"; to_s = obj.get("to_status") or "?"
             acts   = obj.get("actions", []); dur = obj.get("duration_min", None)
             core_b = obj.get("core_before"); core_a = obj.get("core_after")
             delta  = (round((core_a - core_b),1) if (core_a is not None and core_b is not None) else None)
@@ -2464,8 +2474,8 @@ def render_journal():
                 return header, "\n\n".join(lines), "🧊", t
 
         elif t == "PLAN":
-            city = obj.get("city","—"); act = obj.get("activity","—")
-            start_t = obj.get("start","—"); end_t = obj.get("end","—")
+            city = obj.get("city") or "—"; act = obj.get("activity") or "—"
+            start_t = obj.get("start_at") or "—"; end_t = obj.get("end_at") or "—"
             fl = obj.get("feels_like"); hum = obj.get("humidity")
             meta = (f"Feels‑like {round(fl,1)}°C • Humidity {int(hum)}%" if (fl is not None and hum is not None) else "")
             if app_language=="Arabic":
@@ -2477,7 +2487,7 @@ def render_journal():
             return header, body, "🗓️", t
 
         elif t in ("ALERT","ALERT_AUTO"):
-            core = obj.get("core_temp") or obj.get("body_temp"); periph = obj.get("peripheral_temp"); base = obj.get("baseline")
+            core = obj.get("core"); periph = obj.get("peripheral"); base = obj.get("baseline")
             delta = (core - base) if (core is not None and base is not None) else None
             reasons = obj.get("reasons") or []; symptoms = obj.get("symptoms") or []
             if app_language=="Arabic":
@@ -2502,8 +2512,10 @@ def render_journal():
                 return header, "\n\n".join(lines), "🚨", t
 
         elif t == "DAILY":
-            mood = obj.get("mood","—"); hyd = obj.get("hydration_glasses","—")
-            sleep = obj.get("sleep_hours","—"); fat = obj.get("fatigue","—")
+            mood = obj.get("mood") or "—"
+            hyd = int(obj["hydration"]) if obj.get("hydration") is not None else "—"
+            sleep = _fmt_num(obj["sleep"]) if obj.get("sleep") is not None else "—"
+            fat = f"{obj['fatigue']}/10" if obj.get("fatigue") is not None else "—"
             if app_language=="Arabic":
                 header = f"**{when_label}** — **مُسجّل يومي**"
                 lines = [f"**المزاج:** {mood}", f"**الترطيب:** {hyd}", f"**النوم:** {sleep}س", f"**التعب:** {fat}"]
@@ -2515,17 +2527,15 @@ def render_journal():
             return header, "\n\n".join(lines), "🧩", t
 
         else:
-            text = obj.get("text") or obj.get("note") or "—"
+            text = obj.get("note") or "—"
             header = f"**{when_label}** — **Note**" if app_language=="English" else f"**{when_label}** — **ملاحظة**"
             return header, text, "📝", t
 
     parsed = []
-    for dt_raw, raw_json in chunk:
-        title, body, icon, t = _render_entry(raw_json)
-        if t not in type_filter:
-            continue
+    for row in chunk:
+        title, body, icon, t = _render_entry(row)
         try:
-            dt = _dt.fromisoformat(dt_raw.replace("Z","+00:00"))
+            dt = _dt.fromisoformat(row["date"].replace("Z","+00:00"))
         except Exception:
             dt = _dt.now(timezone.utc)
         # >>> replaced TZ_DUBAI with active_tz
@@ -2549,14 +2559,19 @@ def render_journal():
 
     colp1, colp2, colp3 = st.columns([1,1,4])
     with colp1:
-        if st.session_state["journal_offset"] > 0:
+        if pg["newer"]:
             if st.button(T["newer"], key="jr_newer"):
-                st.session_state["journal_offset"] = max(0, st.session_state["journal_offset"] - page_size)
+                st.session_state["journal_cursor"] = ("after", pg["newer"])
                 st.rerun()
     with colp2:
-        if (start + shown) < len(rows):
+        if pg["older"]:
             if st.button(T["older"], key="jr_older"):
-                st.session_state["journal_offset"] += page_size
+                st.session_state["journal_cursor"] = ("before", pg["older"])
+                st.rerun()
+    with colp3:
+        if cursor is not None:
+            if st.button(T["latest"], key="jr_latest"):
+                st.session_state["journal_cursor"] = None
                 st.rerun()
 
 
@@ -2782,9 +2797,8 @@ with st.sidebar.expander(exp_title, expanded=True):
         with col2:
             if st.button(T["register"], key="sb_reg_btn"):
                 try:
-                    c = get_conn().cursor()
-                    c.execute("INSERT INTO users VALUES (?,?)", (username, password))
-                    get_conn().commit()
+                    with get_db().transaction() as conn:
+                        conn.execute("INSERT INTO users VALUES (?,?)", (username, password))
                     st.success(T["account_created"])
                 except Exception:
                     st.error(T["user_exists"])
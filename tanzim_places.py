@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+# TANZIM MS — Offline GCC gazetteer (no Streamlit imports)
+# -----------------------------------------------------------------------------------------
+# gcc_places.json lists the GCC cities and common beaches, parks, malls and landmarks with
+# English and Arabic names and aliases. Every alias is normalized (case, Arabic letter
+# variants and diacritics, punctuation) and indexed three ways: a dict for exact lookups,
+# a sorted list for prefix completion, and an Aho-Corasick automaton over words that finds
+# every alias in a chat message in one pass. The app only calls the geocoding API for names
+# that are not in here.
+
+import bisect, json, os, re, unicodedata
+from typing import NamedTuple
+
+PLACES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gcc_places.json")
+
+_AR_FOLD = (("أ", "ا"), ("إ", "ا"), ("آ", "ا"), ("ٱ", "ا"), ("ة", "ه"), ("ى", "ي"), ("\u0640", ""))   # tatweel dropped
+_AR_MARKS = re.compile("[\u064b-\u065f\u0670]")   # tashkeel
+_JOINERS = "-'’/_."                                      # split words: al-majaz, dubai's
+_PUNCT = "!\"#$%&()*+,:;<=>?@[\\]^`{|}~،؛؟«»“”‘…"       # stripped from word edges
+_AR_PROCLITICS = "وبلفك"                                  # one-letter prefixes glued to the next word
+
+class Place(NamedTuple):
+    name: str
+    name_ar: str
+    kind: str                   # city | beach | park | mall | landmark
+    city: str                   # GCC city code, e.g. "Abu Dhabi,AE"
+    lat: float
+    lon: float
+
+def words(text: str) -> list[str]:
+    """Lowercase words with Arabic letter variants folded and diacritics and punctuation dropped."""
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    for a, b in _AR_FOLD:
+        text = text.replace(a, b)
+    text = _AR_MARKS.sub("", text)
+    for ch in _JOINERS:
+        text = text.replace(ch, " ")
+    return [w for w in (w.strip(_PUNCT) for w in text.split()) if w]
+
+def normalize(text: str) -> str:
+    return " ".join(words(text))
+
+class Gazetteer:
+    def __init__(self, places: list[Place], aliases: list[list[str]]):
+        self.places = places
+        self.index: dict[str, list[int]] = {}           # normalized alias -> place ids
+        for pid, (p, extra) in enumerate(zip(places, aliases)):
+            for a in (p.name, p.name_ar, *extra):
+                key = normalize(a)
+                if key and pid not in self.index.setdefault(key, []):
+                    self.index[key].append(pid)
+        self.keys = sorted(self.index)
+        self._build_automaton()
+
+    @classmethod
+    def load(cls, path: str = PLACES_PATH) -> "Gazetteer":
+        with open(path, encoding="utf-8") as f:
+            rows = json.load(f)["places"]
+        return cls([Place(r["name"], r["name_ar"], r["kind"], r["city"], float(r["lat"]), float(r["lon"])) for r in rows],
+                   [r.get("aliases", []) for r in rows])
+
+    # ---- Aho-Corasick over the aliases' words ----
+    def _build_automaton(self):
+        """Word-level automaton: one transition per word of the message, not per character."""
+        goto: list[dict[str, int]] = [{}]
+        out: list[list[tuple[int, str]]] = [[]]         # (alias length in words, alias)
+        for key in self.keys:
+            node = 0
+            for w in key.split():
+                nxt = goto[node].get(w)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[node][w] = nxt
+                    goto.append({})
+                    out.append([])
+                node = nxt
+            out[node].append((len(key.split()), key))
+        fail = [0] * len(goto)
+        queue = list(goto[0].values())
+        for node in queue:                               # breadth-first: parents before children
+            for w, nxt in goto[node].items():
+                f = fail[node]
+                while f and w not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(w, 0) if node else 0
+                out[nxt] = out[nxt] + out[fail[nxt]]
+                queue.append(nxt)
+        self._goto, self._fail, self._out = goto, fail, out
+        self._vocab = frozenset(w for key in self.keys for w in key.split())
+
+    def _word(self, w: str) -> str | None:
+        """The vocabulary word w stands for, or None; strips one glued Arabic proclitic (بدبي, والرياض)."""
+        if w in self._vocab:
+            return w
+        if len(w) > 2 and w[0] in _AR_PROCLITICS and w[1:] in self._vocab:
+            return w[1:]
+        return None
+
+    def find_all(self, text: str) -> list[tuple[int, str, list[Place]]]:
+        """Every alias mentioned in text, leftmost-longest and non-overlapping: (word index, alias, places)."""
+        goto, fail, out = self._goto, self._fail, self._out
+        hits, node = [], 0
+        for i, w in enumerate(words(text)):
+            w = self._word(w)
+            if w is None:                                # in no alias: every match restarts after it
+                node = 0
+                continue
+            while node and w not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(w, 0)
+            for n, key in out[node]:
+                hits.append((i + 1 - n, -n, key))
+        if len(hits) > 1:
+            hits.sort()
+        found, end = [], 0
+        for start, neg_n, key in hits:
+            if start >= end:
+                found.append((start, key, [self.places[p] for p in self.index[key]]))
+                end = start - neg_n
+        return found
+
+    # ---- lookups ----
+    def lookup(self, name: str) -> list[Place]:
+        """Places whose name or alias is exactly `name` (after normalization)."""
+        return [self.places[p] for p in self.index.get(normalize(name), ())]
+
+    def complete(self, prefix: str, limit: int = 8) -> list[Place]:
+        """Places with an alias starting with `prefix`, shortest alias first, each place once."""
+        key = normalize(prefix)
+        if not key:
+            return []
+        lo = bisect.bisect_left(self.keys, key)
+        hi = bisect.bisect_left(self.keys, key + "\uffff", lo)
+        seen, out = set(), []
+        for k in sorted(self.keys[lo:hi], key=len):
+            for p in self.index[k]:
+                if p not in seen:
+                    seen.add(p)
+                    out.append(self.places[p])
+        return out[:limit]
+
+    def find_city(self, text: str) -> str | None:
+        """City code of the first place mentioned in text that pins one city, else None."""
+        for _, _, places in self.find_all(text):
+            cities = [p for p in places if p.kind == "city"]
+            if cities:
+                return cities[0].city
+            if len({p.city for p in places}) == 1:
+                return places[0].city
+        return None
+
+    def resolve(self, query: str, city: str | None = None) -> Place | None:
+        """
+        The place a planner query names: an exact alias, else the longest alias in the query.
+        Aliases shared by several cities (corniche, القرم) are settled by a city named in
+        the query, then by `city`. A query naming only a city resolves to that city.
+        """
+        places = self.lookup(query)
+        found = self.find_all(query)
+        named = {p.city for _, _, ps in found for p in ps if p.kind == "city"}
+        if not places:
+            spots = [(len(k), ps) for _, k, ps in found if any(p.kind != "city" for p in ps)]
+            if spots:
+                places = [p for p in max(spots, key=lambda x: x[0])[1] if p.kind != "city"]
+            elif found:
+                places = found[0][2]
+        if not places:
+            return None
+        for pick in (named, {city} if city else set()):
+            inside = [p for p in places if p.city in pick]
+            if inside:
+                return inside[0]
+        return places[0]
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+# TANZIM MS — Activity planner: best outdoor windows from the forecast (no Streamlit imports)
+# -----------------------------------------------------------------------------------------
+# The 5-day forecast (3-hour steps) is interpolated onto an even grid (hourly, 15 min, …).
+# Every window of the requested length is scored at once with cumulative sums: a window
+# qualifies only if every step in it is under the feels-like/humidity limits and outside
+# the avoided local hours. Qualifying windows are ranked by mean comfort cost, and the
+# best k that do not overlap are returned. compare() scores many cities in the same pass,
+# one row per city on a shared grid.
+
+import time
+from datetime import date, datetime, timedelta, timezone, tzinfo
+from typing import NamedTuple
+
+import numpy as np
+
+HUMID_COST = (50.0, 0.1)      # each % of humidity above 50% costs like 0.1 °C of feels-like
+
+class Grid(NamedTuple):
+    t: np.ndarray             # epoch s, evenly spaced
+    feels_like: np.ndarray
+    humidity: np.ndarray
+    step_s: int
+
+def interpolate(forecast: list[dict], step_min: int = 60) -> Grid:
+    """Forecast slots ("dt" epoch s) linearly interpolated onto a step_min grid over their span."""
+    step = int(step_min * 60)
+    if not forecast:
+        return Grid(np.empty(0, np.int64), np.empty(0), np.empty(0), step)
+    t0 = np.fromiter((it["dt"] for it in forecast), dtype=np.int64, count=len(forecast))
+    fl = np.fromiter((it["feels_like"] for it in forecast), dtype=np.float64, count=len(forecast))
+    hum = np.fromiter((it["humidity"] for it in forecast), dtype=np.float64, count=len(forecast))
+    t = np.arange(t0[0], t0[-1] + 1, step, dtype=np.int64)
+    return Grid(t, np.interp(t, t0, fl), np.interp(t, t0, hum), step)
+
+def comfort_cost(feels_like: np.ndarray, humidity: np.ndarray) -> np.ndarray:
+    """Lower is better: feels-like °C plus a humidity surcharge."""
+    return feels_like + np.maximum(humidity - HUMID_COST[0], 0.0) * HUMID_COST[1]
+
+def local_hours(t: np.ndarray, tz: tzinfo) -> np.ndarray:
+    """Local wall-clock hour (float) of each epoch second."""
+    if not len(t):
+        return np.empty(0)
+    first = tz.utcoffset(datetime.fromtimestamp(int(t[0]), tz))
+    last = tz.utcoffset(datetime.fromtimestamp(int(t[-1]), tz))
+    if first == last:                        # fixed offset over the horizon (every GCC zone)
+        off = np.int64(first.total_seconds())
+    else:
+        off = np.fromiter((tz.utcoffset(datetime.fromtimestamp(int(s), tz)).total_seconds() for s in t),
+                          dtype=np.int64, count=len(t))
+    return ((t + off) % 86400) / 3600.0
+
+def _window_scores(t: np.ndarray, fl: np.ndarray, hum: np.ndarray, hours: np.ndarray, n: int, now: float,
+                   step_s: int, max_feels_like: float, max_humidity: float, avoid_hours):
+    """
+    Rows are cities on a shared grid t (NaN = outside that city's forecast). Returns the
+    mean comfort cost of every window [i, i+n) (inf if it does not qualify or starts before
+    now) and the window sums of feels-like and humidity, all shaped (rows, len(t) - n + 1).
+    """
+    m = len(t) - n + 1
+    ok = (fl <= max_feels_like) & (hum <= max_humidity)          # NaN compares False
+    if avoid_hours:
+        ok &= ~((hours >= avoid_hours[0]) & (hours < avoid_hours[1]))
+    # window sums from prefix sums: bad steps, cost, feels-like, humidity
+    pre = np.zeros((4, fl.shape[0], len(t) + 1))
+    np.cumsum(~ok, axis=1, out=pre[0, :, 1:])
+    np.cumsum(np.where(ok, comfort_cost(fl, hum), 0.0), axis=1, out=pre[1, :, 1:])
+    np.cumsum(np.where(ok, fl, 0.0), axis=1, out=pre[2, :, 1:])
+    np.cumsum(np.where(ok, hum, 0.0), axis=1, out=pre[3, :, 1:])
+    sums = pre[:, :, n:n + m] - pre[:, :, :m]
+    score = np.where(sums[0] == 0, sums[1] / n, np.inf)
+    score[:, t[:m] < now - step_s / 2] = np.inf
+    return score, sums[2], sums[3]
+
+def _top(score: np.ndarray, t: np.ndarray, fl_sum: np.ndarray, hum_sum: np.ndarray, n: int, step_s: int,
+         top_k: int, tz: tzinfo) -> list[dict]:
+    """Best top_k non-overlapping windows of one row; consumes `score`."""
+    out = []
+    for _ in range(top_k):
+        i = int(np.argmin(score))
+        if not np.isfinite(score[i]):
+            break
+        out.append({"start_dt": datetime.fromtimestamp(int(t[i]), tz),
+                    "end_dt": datetime.fromtimestamp(int(t[i]) + n * step_s, tz),
+                    "avg_feels": round(float(fl_sum[i] / n), 1), "avg_hum": int(hum_sum[i] / n),
+                    "score": round(float(score[i]), 2)})
+        score[max(0, i - n + 1):i + n] = np.inf             # drop every window overlapping this one
+    return out
+
+def best_windows(forecast: list[dict], hours: float = 2.0, top_k: int = 8, step_min: int = 60,
+                 tz: tzinfo = timezone.utc, now: float | None = None, max_feels_like: float = 35.0,
+                 max_humidity: float = 65.0, avoid_hours=(10, 16)) -> list[dict]:
+    """
+    Up to top_k non-overlapping windows of `hours`, best (lowest mean comfort cost) first.
+    Windows start no earlier than `now` (epoch s, default: the current time) and every step
+    inside them stays under the limits and outside avoid_hours [start, end) local time.
+    start_dt / end_dt are aware datetimes in tz.
+    """
+    g = interpolate(forecast, step_min)
+    n = max(1, int(round(hours * 3600 / g.step_s)))      # steps per window
+    if len(g.t) < n:
+        return []
+    score, fl_sum, hum_sum = _window_scores(
+        g.t, g.feels_like[None], g.humidity[None], local_hours(g.t, tz)[None], n,
+        time.time() if now is None else now, g.step_s, max_feels_like, max_humidity, avoid_hours)
+    return _top(score[0], g.t, fl_sum[0], hum_sum[0], n, g.step_s, top_k, tz)
+
+class Comparison(NamedTuple):
+    cities: list[str]               # best first (cities without any window last)
+    windows: dict[str, list[dict]]  # per city, best first, times local to the city
+    days: list[date]                # heatmap columns
+    best_feels: np.ndarray          # (cities, days): mean feels-like of the best window starting that local day, NaN = none
+    best_score: np.ndarray          # (cities, days): its comfort cost
+
+def compare(forecasts: dict[str, list[dict]], tzs: dict[str, tzinfo], hours: float = 2.0, top_k: int = 3,
+            step_min: int = 60, days: int = 5, now: float | None = None, max_feels_like: float = 35.0,
+            max_humidity: float = 65.0, avoid_hours=(10, 16)) -> Comparison:
+    """
+    best_windows for many cities in one pass: every forecast is interpolated onto one
+    shared grid (NaN outside its own span) and all rows are scored together. Limits and
+    avoided hours apply in each city's own timezone (tzs, default UTC); the heatmap has
+    one column per local day starting today.
+    """
+    now = time.time() if now is None else now
+    step = int(step_min * 60)
+    names = [c for c, fc in forecasts.items() if fc]
+    n = max(1, int(round(hours * 3600 / step)))
+    day0 = datetime.fromtimestamp(now, tzs.get(names[0], timezone.utc) if names else timezone.utc).date()
+    cols = [day0 + timedelta(days=d) for d in range(days)]
+    empty = Comparison(names, {c: [] for c in forecasts}, cols, np.full((len(names), days), np.nan),
+                       np.full((len(names), days), np.inf))
+    if not names:
+        return empty
+    t0 = min(fc[0]["dt"] for c, fc in forecasts.items() if fc)
+    t1 = max(fc[-1]["dt"] for c, fc in forecasts.items() if fc)
+    t = np.arange(t0 - t0 % step, t1 + 1, step, dtype=np.int64)
+    if len(t) < n:
+        return empty
+    fl = np.empty((len(names), len(t)))
+    hum = np.empty_like(fl)
+    hrs = np.empty_like(fl)
+    off = np.empty((len(names), 1), dtype=np.int64)
+    for r, c in enumerate(names):
+        ts = np.fromiter((it["dt"] for it in forecasts[c]), dtype=np.int64, count=len(forecasts[c]))
+        fl[r] = np.interp(t, ts, [it["feels_like"] for it in forecasts[c]], left=np.nan, right=np.nan)
+        hum[r] = np.interp(t, ts, [it["humidity"] for it in forecasts[c]], left=np.nan, right=np.nan)
+        tz = tzs.get(c, timezone.utc)
+        hrs[r] = local_hours(t, tz)
+        off[r] = int(tz.utcoffset(datetime.fromtimestamp(int(t[0]), tz)).total_seconds())
+    score, fl_sum, hum_sum = _window_scores(t, fl, hum, hrs, n, now, step, max_feels_like, max_humidity, avoid_hours)
+    m = score.shape[1]
+
+    # heatmap: best window per (city, local day of its start)
+    day = (t[None, :m] + off) // 86400 - (int(now) + off) // 86400
+    best_feels = np.full((len(names), days), np.nan)
+    best_score = np.full((len(names), days), np.inf)
+    for d in range(days):
+        s = np.where(day == d, score, np.inf)
+        i = np.argmin(s, axis=1)
+        v = s[np.arange(len(names)), i]
+        hit = np.isfinite(v)
+        best_score[hit, d] = v[hit]
+        best_feels[hit, d] = fl_sum[hit, i[hit]] / n
+
+    windows = {c: [] for c in forecasts}
+    for r, c in enumerate(names):
+        windows[c] = _top(score[r].copy(), t, fl_sum[r], hum_sum[r], n, step, top_k, tzs.get(c, timezone.utc))
+    order = sorted(range(len(names)), key=lambda r: windows[names[r]][0]["score"] if windows[names[r]] else np.inf)
+    return Comparison([names[r] for r in order], windows, cols, best_feels[order], best_score[order])
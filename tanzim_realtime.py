@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+# TANZIM MS — Realtime sensor feed (no Streamlit imports)
+# -----------------------------------------------------------------------------------------
+# Listens to Supabase realtime INSERTs on `sensor_readings` and pushes each new row into the
+# local mirror / device rings as it arrives, so the monitor needs no polling queries while
+# the socket is up. On every (re)connect the gap is backfilled through the REST cursor sync.
+
+import asyncio, random, threading, time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from realtime import (AsyncRealtimeClient, RealtimeAcknowledgementStatus, RealtimePostgresChangesListenEvent,
+                      RealtimeSubscribeStates)
+
+# broadcast acks on: the server answers every push, which is how a dead socket is noticed
+CHANNEL_PARAMS = {"config": {"broadcast": {"ack": True, "self": False},
+                             "presence": {"key": "", "enabled": False}, "private": False}}
+
+def realtime_url(supabase_url: str) -> str:
+    return supabase_url.rstrip("/") + "/realtime/v1"
+
+class RealtimeFeed:
+    """
+    Background listener (own thread + asyncio loop) feeding a tanzim_sensors.SensorSync.
+
+    Only watched devices are stored. Pushed rows and the post-connect backfill run on one
+    I/O worker in arrival order, so rows pushed while a backfill is in flight land after it
+    and the cursor never skips the gap. Reconnects use capped exponential backoff with
+    jitter; `live` is set only while a subscription is confirmed. A session ends when the
+    subscribe-state callback reports a failure, the channel leaves the joined state, or an
+    acked ping (every `ping_interval` s) gets no reply within `ping_timeout` s.
+    """
+    def __init__(self, sync, url: str, key: str, table: str = "sensor_readings", schema: str = "public",
+                 backoff: float = 1.0, max_backoff: float = 60.0, subscribe_timeout: float = 10.0,
+                 ping_interval: float = 5.0, ping_timeout: float = 5.0):
+        self.sync = sync
+        self.url, self.key = url, key
+        self.table, self.schema = table, schema
+        self.backoff, self.max_backoff = backoff, max_backoff
+        self.subscribe_timeout = subscribe_timeout
+        self.ping_interval, self.ping_timeout = ping_interval, ping_timeout
+        self._watched: set[str] = set()
+        self._stale: set[str] = set()             # watched, but the catch-up pull failed
+        self._connected = threading.Event()
+        self._stop = threading.Event()
+        self._io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tanzim-realtime-io")
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self.stats = Counter()
+        self.last_error: str | None = None
+        self.last_event_at: float | None = None
+        self._thread = threading.Thread(target=self._run, name="tanzim-realtime", daemon=True)
+        self._thread.start()
+
+    @property
+    def live(self) -> bool:
+        return self._connected.is_set()
+
+    def watch(self, device_id: str) -> bool:
+        """
+        Start storing pushed rows for this device; returns True if pushes cover it (the
+        caller can skip polling). A device first watched while live is caught up once
+        through REST; if that fails it stays on polling until a retry succeeds.
+        """
+        if not device_id:
+            return False
+        if device_id not in self._watched or device_id in self._stale:
+            with self.sync.device_lock(device_id):   # no pushed row can move the cursor before the catch-up
+                first = device_id not in self._watched
+                self._watched.add(device_id)
+                if not self.live:
+                    return False                      # the backfill on connect covers it
+                if not first and not self.sync.due(device_id):
+                    return False
+                self._stale.add(device_id)
+                self.sync.pull(device_id)
+                self._stale.discard(device_id)
+        return self.live
+
+    def close(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(lambda: None)
+        self._thread.join(timeout)
+        self._io.shutdown(wait=False)
+
+    # ---- I/O worker (ordered) ----
+    def _ingest(self, record: dict):
+        device_id = record.get("device_id")
+        if device_id not in self._watched:
+            return
+        try:
+            self.sync.ingest(device_id, [record])
+            self.stats["events_stored"] += 1
+        except Exception as e:
+            self.stats["ingest_errors"] += 1
+            self.last_error = f"ingest: {e}"
+
+    def _backfill(self):
+        for device_id in list(self._watched):
+            try:
+                with self.sync.device_lock(device_id):
+                    self.stats["backfill_rows"] += self.sync.pull(device_id)
+                self._stale.discard(device_id)
+            except Exception as e:
+                self._stale.add(device_id)
+                self.stats["backfill_errors"] += 1
+                self.last_error = f"backfill: {e}"
+
+    # ---- listener thread ----
+    def _on_insert(self, payload):
+        record = (payload.get("data") or {}).get("record") or {}
+        self.stats["events"] += 1
+        self.last_event_at = time.time()
+        self._io.submit(self._ingest, record)
+
+    async def _session(self):
+        client = AsyncRealtimeClient(self.url, self.key, auto_reconnect=False, max_retries=1)
+        subscribed, lost = asyncio.Event(), asyncio.Event()
+        failed: list[str] = []
+
+        def on_state(state, err):
+            if state == RealtimeSubscribeStates.SUBSCRIBED:
+                # queued before any pushed row of this session, so it runs first
+                self._io.submit(self._backfill)
+            else:
+                failed.append(f"{state}: {err}")
+                lost.set()
+            subscribed.set()
+
+        try:
+            channel = client.channel("tanzim-sensors", CHANNEL_PARAMS)
+            channel.on_postgres_changes(RealtimePostgresChangesListenEvent.Insert, self._on_insert,
+                                        table=self.table, schema=self.schema)
+            await channel.subscribe(on_state)
+            await asyncio.wait_for(subscribed.wait(), self.subscribe_timeout)
+            if failed:
+                raise ConnectionError(failed[0])
+            self._connected.set()
+            self.stats["connects"] += 1
+            next_ping = time.monotonic() + self.ping_interval
+            while not self._stop.is_set() and not lost.is_set() and channel.is_joined:
+                if time.monotonic() >= next_ping:
+                    ping = await channel.push("broadcast", {"type": "broadcast", "event": "tanzim-ping", "payload": {}},
+                                              self.ping_timeout)
+                    ping.receive(RealtimeAcknowledgementStatus.Timeout, lost.set)
+                    next_ping = time.monotonic() + self.ping_interval
+                try:
+                    await asyncio.wait_for(lost.wait(), min(0.5, max(0.0, next_ping - time.monotonic())))
+                except asyncio.TimeoutError:
+                    pass
+            if self._stop.is_set():
+                return
+            if failed:
+                raise ConnectionError(failed[-1])
+            if lost.is_set():
+                self.stats["ping_timeouts"] += 1
+                raise ConnectionError(f"no reply to a ping within {self.ping_timeout:g}s")
+            raise ConnectionError(f"channel {channel.state}")
+        finally:
+            if self._connected.is_set():
+                self.stats["disconnects"] += 1
+            self._connected.clear()
+            try:
+                await client.close()
+            except Exception:
+                pass
+
+    async def _main(self):
+        attempt = 0
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                await self._session()
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+            if self._stop.is_set():
+                return
+            if time.monotonic() - started > 30:     # a session that held up resets the backoff
+                attempt = 0
+            delay = min(self.max_backoff, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+            attempt += 1
+            self.stats["reconnects"] += 1
+            deadline = time.monotonic() + delay
+            while not self._stop.is_set() and time.monotonic() < deadline:
+                await asyncio.sleep(min(0.25, deadline - time.monotonic()))
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        try:
+            self._loop.run_until_complete(self._main())
+        finally:
+            self._loop.close()
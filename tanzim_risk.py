@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+# TANZIM MS — Heat risk model: environment (feels-like / humidity) + ΔCore (no Streamlit imports)
+# -----------------------------------------------------------------------------------------
+# Two scoring rules, each with two entry points: the scalar functions the monitor cards
+# use, and assess() / assess_full(), which score whole arrays in one NumPy pass (risk
+# timelines, the alert worker, backtest.py). Both must agree exactly; bench_risk.py and
+# backtest.py check that.
+
+from typing import Any, Dict, NamedTuple, Optional
+
+import numpy as np
+
+# Status: Safe <3; Caution 3–4.5; High 5–6.5; Danger ≥7
+STATUSES = ("Safe", "Caution", "High", "Danger")
+STATUS_LEVEL = {s: i for i, s in enumerate(STATUSES)}
+STATUS_STYLE = {"Safe": ("green", "🟢"), "Caution": ("orange", "🟡"),
+                "High": ("orangered", "🟠"), "Danger": ("red", "🔴")}
+LEVEL_SCORE = (3, 5, 7)                 # score at which Caution / High / Danger start
+
+FEELS_TIERS = ((42, 4), (39, 3), (35, 2), (32, 1))
+HUMID_PENALTY = (60, 32)                # humidity ≥ 60% while feels-like ≥ 32°C: +1
+DELTA_TIERS = ((1.0, 2), (0.5, 1))      # ΔCore (Uhthoff) points
+DELTA_FLOOR = ((1.0, "High"), (0.5, "Caution"))   # ΔCore never scores below these
+
+# compute_risk (environment + ΔCore + logged triggers/symptoms): no 42°C tier, no floor
+FULL_FEELS_TIERS = ((39, 3), (35, 2), (32, 1))
+TRIGGER_WEIGHTS = {
+    "Exercise": 2, "Sauna/Hot bath": 3, "Spicy food": 1, "Hot drinks": 1, "Stress/Anxiety": 1,
+    "Direct sun exposure": 2, "Fever/Illness": 3, "Hormonal cycle": 1, "Tight clothing": 1,
+    "Poor sleep": 1, "Dehydration": 2, "Crowded place": 1, "Cooking heat": 1, "Car without AC": 2,
+    "Outdoor work": 2, "Long prayer standing": 1
+}
+SYMPTOM_WEIGHT = 0.5
+
+DEFAULT_BASELINE = 37.0
+UHTHOFF_RAISE = 0.5     # raise at +0.5°C
+UHTHOFF_CLEAR = 0.3     # clear only once below +0.3°C
+
+ADVICE = {
+    "Danger": {
+        "en": "High risk: move to AC, stop exertion, active cooling, hydrate; seek care if severe.",
+        "ar": "خطر مرتفع: انتقل إلى المكيّف، أوقف الجهد، استخدم تبريدًا نشطًا، رطّب؛ اطلب رعاية عند الأعراض الشديدة."
+    },
+    "High": {
+        "en": "Elevated: limit outdoor time, pre‑cool, frequent rests, hydrate.",
+        "ar": "مرتفع: قلّل الوقت خارجًا، برّد مسبقًا، خذ فترات راحة متكررة، ورطّب."
+    },
+    "Caution": {
+        "en": "Mild risk: hydrate, pace yourself, prefer shade/AC.",
+        "ar": "حذر: رطّب، نظّم جهدك، فضّل الظل/المكيّف."
+    },
+    "Safe": {
+        "en": "Safe window. Keep cool and hydrated.",
+        "ar": "فترة آمنة. ابقَ باردًا ورطّب جيدًا."
+    }
+}
+
+UHTHOFF_ADVICE = {
+    "High": {
+        "en": "Core ≥ 1.0°C above baseline (Uhthoff). Move to AC, pre‑cool, hydrate, rest 15–20 min.",
+        "ar": "الأساسية ≥ 1.0°م فوق الأساس (أوتهوف). انتقل للمكيّف، برّد مسبقًا، رطّب، استرح 15–20 دقيقة."
+    },
+    "Caution": {
+        "en": "Core ≥ 0.5°C above baseline (Uhthoff). Pre‑cool, limit exertion, hydrate, rest 15–20 min.",
+        "ar": "الأساسية ≥ 0.5°م فوق الأساس (أوتهوف). برّد مسبقًا، قلّل الجهد، رطّب، واسترح 15–20 دقيقة."
+    }
+}
+
+def _lang(lang: str) -> str:
+    return "ar" if lang == "Arabic" else "en"
+
+# ================== SCALAR ==================
+def compute_risk_minimal(feels_like, humidity, core, baseline, lang: str = "English") -> Dict[str, Any]:
+    """
+    Score uses only environment + ΔCore (Uhthoff).
+    Status: Safe <3; Caution 3–4.5; High 5–6.5; Danger ≥7.
+    Localized advice.
+    """
+    score = 0.0
+    if feels_like is not None:
+        fl = float(feels_like)
+        score += next((pts for t, pts in FEELS_TIERS if fl >= t), 0)
+    if humidity is not None and feels_like is not None:
+        if float(humidity) >= HUMID_PENALTY[0] and float(feels_like) >= HUMID_PENALTY[1]:
+            score += 1
+    if core is not None and baseline is not None:
+        delta = float(core) - float(baseline)
+        score += next((pts for t, pts in DELTA_TIERS if delta >= t), 0)
+    status = STATUSES[sum(score >= s for s in LEVEL_SCORE)]
+    color, icon = STATUS_STYLE[status]
+    return {"score": score, "status": status, "color": color, "icon": icon, "advice": ADVICE[status][_lang(lang)]}
+
+def apply_uhthoff_floor(risk: Dict[str, Any],
+                        core: Optional[float],
+                        baseline: Optional[float],
+                        lang: str = "English") -> Dict[str, Any]:
+    """ΔCore ≥0.5°C => ≥Caution; ΔCore ≥1.0°C => ≥High; never lowers severity. Localized advice."""
+    if core is None or baseline is None:
+        return risk
+    try:
+        delta = float(core) - float(baseline)
+    except Exception:
+        return risk
+    floor = next((s for t, s in DELTA_FLOOR if delta >= t), None)
+    if floor is not None and STATUS_LEVEL.get(risk.get("status", "Safe"), 0) < STATUS_LEVEL[floor]:
+        color, icon = STATUS_STYLE[floor]
+        risk.update({"status": floor, "color": color, "icon": icon, "advice": UHTHOFF_ADVICE[floor][_lang(lang)]})
+    return risk
+
+def risk_from_env(feels_like_c: float, humidity: float) -> int:
+    score = next((pts for t, pts in FULL_FEELS_TIERS if feels_like_c >= t), 0)
+    if humidity >= HUMID_PENALTY[0] and feels_like_c >= HUMID_PENALTY[1]:
+        score += 1
+    return score
+
+def risk_from_person(body_temp: float, baseline: float) -> int:
+    delta = (body_temp - baseline) if (body_temp is not None and baseline is not None) else 0.0
+    return next((pts for t, pts in DELTA_TIERS if delta >= t), 0)
+
+def trigger_score(triggers, symptoms) -> float:
+    return sum(TRIGGER_WEIGHTS.get(t, 0) for t in (triggers or [])) + SYMPTOM_WEIGHT * len(symptoms or [])
+
+def compute_risk(feels_like, humidity, body_temp, baseline, triggers, symptoms):
+    score = 0
+    score += risk_from_env(feels_like or 0.0, humidity or 0.0)
+    score += risk_from_person(body_temp, baseline or DEFAULT_BASELINE)
+    score += trigger_score(triggers, symptoms)
+    if score >= 7:
+        return {"score": score, "status": "Danger", "color": "red", "icon": "🔴",
+                "advice": "High risk: stay in AC, avoid exertion, cooling packs, rest; seek clinical advice if severe."}
+    elif score >= 5:
+        return {"score": score, "status": "High", "color": "orangered", "icon": "🟠",
+                "advice": "Elevated: limit outdoor time esp. midday; pre-cool and pace activities."}
+    elif score >= 3:
+        return {"score": score, "status": "Caution", "color": "orange", "icon": "🟡",
+                "advice": "Mild risk: hydrate, take breaks, prefer shade/AC, and monitor symptoms."}
+    else:
+        return {"score": score, "status": "Safe", "color": "green", "icon": "🟢",
+                "advice": "You look safe. Keep cool and hydrated."}
+
+# ================== BATCH ==================
+class RiskArrays(NamedTuple):
+    score: np.ndarray         # float64, compute_risk_minimal's score
+    level: np.ndarray         # int8 index into STATUSES, after the Uhthoff floor
+    floored: np.ndarray       # bool, level was raised by the floor (Uhthoff advice applies)
+
+def _tiers(x: np.ndarray, tiers, dtype=np.float64) -> np.ndarray:
+    # NaN compares False everywhere, which is exactly the scalar "is None" branch
+    return np.select([x >= t for t, _ in tiers], [v for _, v in tiers], 0).astype(dtype, copy=False)
+
+def assess(feels_like, humidity, core, baseline) -> RiskArrays:
+    """
+    compute_risk_minimal + apply_uhthoff_floor over arrays (or scalars, broadcast).
+    Missing values are NaN and count as None does in the scalar functions.
+    """
+    fl, hum, core, base = np.broadcast_arrays(*(np.asarray(v, dtype=np.float64)
+                                                for v in (feels_like, humidity, core, baseline)))
+    delta = core - base
+    with np.errstate(invalid="ignore"):
+        score = _tiers(fl, FEELS_TIERS)
+        score += (hum >= HUMID_PENALTY[0]) & (fl >= HUMID_PENALTY[1])
+        score += _tiers(delta, DELTA_TIERS)
+        level = sum((score >= s).astype(np.int8) for s in LEVEL_SCORE)
+        floor = _tiers(delta, [(t, STATUS_LEVEL[s]) for t, s in DELTA_FLOOR], np.int8)
+    floored = floor > level
+    return RiskArrays(score, np.maximum(level, floor).astype(np.int8), floored)
+
+def assess_full(feels_like, humidity, core, baseline, extra=0.0) -> RiskArrays:
+    """
+    compute_risk over arrays; `extra` is trigger_score() per point (or one value). NaN
+    stands for None: missing weather scores as 0°C / 0%, a missing baseline as the default.
+    """
+    fl, hum, core, base, extra = np.broadcast_arrays(*(np.asarray(v, dtype=np.float64)
+                                                       for v in (feels_like, humidity, core, baseline, extra)))
+    fl, hum = np.nan_to_num(fl, nan=0.0), np.nan_to_num(hum, nan=0.0)
+    base = np.where(np.isnan(base) | (base == 0), DEFAULT_BASELINE, base)
+    with np.errstate(invalid="ignore"):
+        score = _tiers(fl, FULL_FEELS_TIERS)
+        score += (hum >= HUMID_PENALTY[0]) & (fl >= HUMID_PENALTY[1])
+        score += _tiers(core - base, DELTA_TIERS)
+    score += extra
+    level = sum((score >= s).astype(np.int8) for s in LEVEL_SCORE).astype(np.int8)
+    return RiskArrays(score, level, np.zeros(score.shape, dtype=bool))
+
+def runs(t_ms: np.ndarray, level: np.ndarray, end_ms: int | None = None) -> list[tuple[int, int, int]]:
+    """Contiguous (start_ms, end_ms, level) spans of a risk timeline, for drawing a band."""
+    if not len(t_ms):
+        return []
+    starts = np.flatnonzero(np.r_[True, level[1:] != level[:-1]])
+    ends = np.r_[t_ms[starts[1:]], t_ms[-1] if end_ms is None else end_ms]
+    return list(zip(t_ms[starts].tolist(), ends.tolist(), level[starts].tolist()))
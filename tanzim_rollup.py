@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+# TANZIM MS — Sensor rollups (no Streamlit imports)
+# -----------------------------------------------------------------------------------------
+# 1-minute, 15-minute and hourly aggregates per device, merged in the same transaction
+# that stores new readings. Raw readings older than the retention horizon are then
+# deleted (their rollups already hold them), so months of history stay small on disk and
+# long chart ranges read a few hundred rows instead of hundreds of thousands.
+
+import sqlite3, time
+from typing import NamedTuple
+
+import numpy as np
+
+import tanzim_risk
+
+RESOLUTIONS = (60, 900, 3600)                     # bucket width, seconds
+RETENTION_DAYS = {60: 90, 900: 730, 3600: None}   # None = keep forever
+DEFAULT_BASELINE = tanzim_risk.DEFAULT_BASELINE
+ABOVE_DELTA = tanzim_risk.UHTHOFF_RAISE   # "time above" counts core ≥ baseline + 0.5 °C
+GAP_CAP_MS = 120_000       # a reading stands for at most 2 min of wear time
+
+ROLLUP_SQL = """CREATE TABLE IF NOT EXISTS sensor_rollups(
+    device_id TEXT NOT NULL,
+    res INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    n INTEGER NOT NULL,
+    core_n INTEGER NOT NULL, core_min REAL, core_max REAL, core_sum REAL,
+    peri_n INTEGER NOT NULL, peri_min REAL, peri_max REAL, peri_sum REAL,
+    above_ms INTEGER NOT NULL,
+    PRIMARY KEY (device_id, res, bucket)
+) WITHOUT ROWID"""
+
+# min/max of NULL-able columns: SQLite's scalar MIN() returns NULL if either side is NULL
+MERGE_SQL = """INSERT INTO sensor_rollups VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)
+    ON CONFLICT(device_id, res, bucket) DO UPDATE SET
+      n=n + excluded.n,
+      core_n=core_n + excluded.core_n,
+      core_min=MIN(COALESCE(core_min, excluded.core_min), COALESCE(excluded.core_min, core_min)),
+      core_max=MAX(COALESCE(core_max, excluded.core_max), COALESCE(excluded.core_max, core_max)),
+      core_sum=COALESCE(core_sum, 0) + COALESCE(excluded.core_sum, 0),
+      peri_n=peri_n + excluded.peri_n,
+      peri_min=MIN(COALESCE(peri_min, excluded.peri_min), COALESCE(excluded.peri_min, peri_min)),
+      peri_max=MAX(COALESCE(peri_max, excluded.peri_max), COALESCE(excluded.peri_max, peri_max)),
+      peri_sum=COALESCE(peri_sum, 0) + COALESCE(excluded.peri_sum, 0),
+      above_ms=above_ms + excluded.above_ms"""
+
+def create_rollups(conn: sqlite3.Connection):
+    """Rollup table + per-device baseline/compaction state, backfilled from the mirror."""
+    conn.execute(ROLLUP_SQL)
+    cols = [r[1] for r in conn.execute("PRAGMA table_info(sensor_sync)")]
+    if "baseline" not in cols:
+        conn.execute("ALTER TABLE sensor_sync ADD COLUMN baseline REAL")
+    if "compacted_to" not in cols:
+        conn.execute("ALTER TABLE sensor_sync ADD COLUMN compacted_to INTEGER")   # raw rows below were deleted
+    conn.execute("DELETE FROM sensor_rollups")
+    for (device_id,) in conn.execute("SELECT DISTINCT device_id FROM sensor_readings").fetchall():
+        rows = conn.execute("""SELECT t_ms, core_c, peripheral_c FROM sensor_readings
+                               WHERE device_id=? ORDER BY t_ms""", (device_id,)).fetchall()
+        a = np.array(rows, dtype=np.float64)
+        merge(conn, device_id, a[:, 0].astype(np.int64), a[:, 1], a[:, 2])
+
+def _nulls(a: np.ndarray) -> list:
+    return [None if v != v else v for v in a.tolist()]
+
+def merge(conn: sqlite3.Connection, device_id: str, t_ms: np.ndarray, core: np.ndarray, peripheral: np.ndarray,
+          prev_ms: int | None = None, baseline: float | None = None):
+    """
+    Add new readings (not already counted) to every resolution. The first reading's share
+    of time is measured from prev_ms, the device's reading just before it. Caller commits.
+    """
+    if not len(t_ms):
+        return
+    order = np.argsort(t_ms, kind="stable")
+    t = np.asarray(t_ms, dtype=np.int64)[order]
+    core = np.asarray(core, dtype=np.float64)[order]
+    peri = np.asarray(peripheral, dtype=np.float64)[order]
+    dt = np.clip(np.diff(t, prepend=t[0] if prev_ms is None else prev_ms), 0, GAP_CAP_MS)
+    thr = (DEFAULT_BASELINE if baseline is None else baseline) + ABOVE_DELTA
+    with np.errstate(invalid="ignore"):
+        above = np.where(core >= thr, dt, 0)
+    has_c, has_p = ~np.isnan(core), ~np.isnan(peri)
+    for res in RESOLUTIONS:
+        b = t - t % (res * 1000)
+        starts = np.flatnonzero(np.r_[True, b[1:] != b[:-1]])    # t sorted -> buckets are contiguous runs
+        agg = lambda ufunc, v: ufunc.reduceat(v, starts)
+        conn.executemany(MERGE_SQL, zip(
+            [device_id] * len(starts), [res] * len(starts), b[starts].tolist(),
+            np.diff(np.r_[starts, len(t)]).tolist(),
+            agg(np.add, has_c).tolist(), _nulls(agg(np.fmin, core)), _nulls(agg(np.fmax, core)),
+            agg(np.add, np.where(has_c, core, 0.0)).tolist(),
+            agg(np.add, has_p).tolist(), _nulls(agg(np.fmin, peri)), _nulls(agg(np.fmax, peri)),
+            agg(np.add, np.where(has_p, peri, 0.0)).tolist(),
+            agg(np.add, above).tolist()))
+
+def compact(conn: sqlite3.Connection, device_id: str, now_ms: int, raw_days: float,
+            retention: dict = RETENTION_DAYS) -> int:
+    """
+    Delete raw readings older than raw_days (hour-aligned) and rollups past their own
+    retention. Every stored reading was merged when it arrived, so nothing is lost at the
+    kept resolutions. Returns the number of raw rows deleted. Caller commits.
+    """
+    horizon = (now_ms - int(raw_days * 86_400_000)) // 3_600_000 * 3_600_000
+    # history below the horizon now lives in rollups only; never pull it again
+    conn.execute("""UPDATE sensor_sync SET
+                      history_from=COALESCE(history_from,
+                          (SELECT MIN(t_ms) FROM sensor_readings WHERE device_id=?1)),
+                      compacted_to=MAX(COALESCE(compacted_to, 0), ?2)
+                    WHERE device_id=?1""", (device_id, horizon))
+    before = conn.total_changes
+    conn.execute("DELETE FROM sensor_readings WHERE device_id=? AND t_ms < ?", (device_id, horizon))
+    deleted = conn.total_changes - before
+    for res, days in retention.items():
+        if days is not None:
+            conn.execute("DELETE FROM sensor_rollups WHERE device_id=? AND res=? AND bucket < ?",
+                         (device_id, res, now_ms - int(days * 86_400_000)))
+    return deleted
+
+class Rollup(NamedTuple):
+    """One device's buckets at one resolution, oldest first (NaN = no reading)."""
+    res: int                  # bucket width, seconds
+    bucket: np.ndarray        # int64 bucket start, UTC epoch ms
+    n: np.ndarray
+    core_min: np.ndarray
+    core_mean: np.ndarray
+    core_max: np.ndarray
+    peri_min: np.ndarray
+    peri_mean: np.ndarray
+    peri_max: np.ndarray
+    above_ms: np.ndarray
+
+    def envelope(self, which: str = "core"):
+        """(t_ms, y) with each bucket's min then max, for a line chart that keeps every spike."""
+        lo, hi = getattr(self, f"{which}_min"), getattr(self, f"{which}_max")
+        t = np.empty(2 * len(self.bucket), dtype=np.int64)
+        t[0::2] = self.bucket
+        t[1::2] = self.bucket + self.res * 500     # max drawn at the bucket midpoint
+        y = np.empty(2 * len(self.bucket), dtype=np.float32)
+        y[0::2], y[1::2] = lo, hi
+        ok = ~np.isnan(y)
+        return t[ok], y[ok]
+
+def read(conn: sqlite3.Connection, device_id: str, res: int, since_ms: int, until_ms: int | None = None) -> Rollup:
+    rows = conn.execute("""SELECT bucket, n, core_min, core_sum / NULLIF(core_n, 0), core_max,
+                                  peri_min, peri_sum / NULLIF(peri_n, 0), peri_max, above_ms
+                           FROM sensor_rollups WHERE device_id=? AND res=? AND bucket >= ? AND bucket <= ?
+                           ORDER BY bucket""",
+                        (device_id, res, since_ms - since_ms % (res * 1000),
+                         until_ms if until_ms is not None else 2**62)).fetchall()
+    a = np.array(rows, dtype=np.float64).reshape(-1, 9)
+    f32 = lambda i: a[:, i].astype(np.float32)
+    return Rollup(res, a[:, 0].astype(np.int64), a[:, 1].astype(np.int64), f32(2), f32(3), f32(4),
+                  f32(5), f32(6), f32(7), a[:, 8].astype(np.int64))
+
+def time_above_ms(conn: sqlite3.Connection, device_id: str, since_ms: int, until_ms: int | None = None) -> int:
+    """Wear time with core ≥ baseline + 0.5 °C in the range, from the finest rollup covering it."""
+    kept_1m = time.time() * 1000 - RETENTION_DAYS[60] * 86_400_000
+    res = 60 if since_ms >= kept_1m else 3600
+    row = conn.execute("""SELECT COALESCE(SUM(above_ms), 0) FROM sensor_rollups
+                          WHERE device_id=? AND res=? AND bucket >= ? AND bucket <= ?""",
+                       (device_id, res, since_ms - since_ms % (res * 1000),
+                        until_ms if until_ms is not None else 2**62)).fetchone()
+    return int(row[0])
@@ -0,0 +1,470 @@
+# -*- coding: utf-8 -*-
+# TANZIM MS — Sensor readings mirror (no Streamlit imports)
+# -----------------------------------------------------------------------------------------
+# A local SQLite copy of Supabase `sensor_readings`, kept current per device by pulling only
+# rows past the device's cursor. The monitor's latest sample and live series are then
+# plain indexed reads; the network only carries readings we haven't seen.
+
+import sqlite3, threading, time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+import tanzim_episodes, tanzim_rollup
+
+MIRROR_SQL = (
+    """CREATE TABLE IF NOT EXISTS sensor_readings(
+        device_id TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        core_c REAL,
+        peripheral_c REAL,
+        PRIMARY KEY (device_id, created_at)
+    ) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS sensor_sync(
+        device_id TEXT PRIMARY KEY,
+        cursor TEXT,
+        synced_at REAL,
+        rows_pulled INTEGER DEFAULT 0
+    )""",
+)
+
+SELECT_COLUMNS = "core_c,peripheral_c,created_at"
+
+def create_mirror(conn: sqlite3.Connection):
+    for ddl in MIRROR_SQL:
+        conn.execute(ddl)
+
+def add_epoch_columns(conn: sqlite3.Connection):
+    """Integer epoch-ms time on readings (range reads without parsing ISO) + history bound."""
+    cols = [r[1] for r in conn.execute("PRAGMA table_info(sensor_readings)")]
+    if "t_ms" not in cols:
+        conn.execute("ALTER TABLE sensor_readings ADD COLUMN t_ms INTEGER")
+        rows = conn.execute("SELECT device_id, created_at FROM sensor_readings").fetchall()
+        if rows:
+            conn.executemany("UPDATE sensor_readings SET t_ms=? WHERE device_id=? AND created_at=?",
+                             zip(epoch_ms([r[1] for r in rows]).tolist(), (r[0] for r in rows), (r[1] for r in rows)))
+    # covering: range reads for charts never touch the table itself
+    conn.execute("""CREATE INDEX IF NOT EXISTS idx_sensor_readings_device_t
+                    ON sensor_readings(device_id, t_ms, core_c, peripheral_c)""")
+    if "history_from" not in [r[1] for r in conn.execute("PRAGMA table_info(sensor_sync)")]:
+        conn.execute("ALTER TABLE sensor_sync ADD COLUMN history_from INTEGER")   # epoch ms mirrored back to
+
+# ================== MIRROR READS ==================
+def latest(conn: sqlite3.Connection, device_id: str) -> dict | None:
+    row = conn.execute("""SELECT core_c, peripheral_c, created_at FROM sensor_readings
+                          WHERE device_id=? ORDER BY created_at DESC LIMIT 1""", (device_id,)).fetchone()
+    if not row:
+        return None
+    return {"core": row[0], "peripheral": row[1], "at": row[2]}
+
+def series(conn: sqlite3.Connection, device_id: str, limit: int = 240) -> "SensorSeries":
+    """Newest `limit` readings, oldest first."""
+    rows = conn.execute("""SELECT t_ms, core_c, peripheral_c FROM (
+                               SELECT t_ms, core_c, peripheral_c FROM sensor_readings WHERE device_id=?
+                               ORDER BY t_ms DESC LIMIT ?)
+                           ORDER BY t_ms""", (device_id, limit)).fetchall()
+    return _columns(rows)
+
+def history(conn: sqlite3.Connection, device_id: str, since_ms: int, until_ms: int | None = None) -> "SensorSeries":
+    """All mirrored readings in [since_ms, until_ms], oldest first."""
+    rows = conn.execute("""SELECT t_ms, core_c, peripheral_c FROM sensor_readings
+                           WHERE device_id=? AND t_ms >= ? AND t_ms <= ? ORDER BY t_ms""",
+                        (device_id, since_ms, until_ms if until_ms is not None else 2**62)).fetchall()
+    return _columns(rows)
+
+def _columns(rows: list[tuple]) -> "SensorSeries":
+    if not rows:
+        return SensorSeries.empty()
+    a = np.array(rows, dtype=np.float64)      # NULL -> NaN; epoch ms is exact in float64
+    return SensorSeries(a[:, 0].astype(np.int64), a[:, 1].astype(np.float32), a[:, 2].astype(np.float32))
+
+def get_cursor(conn: sqlite3.Connection, device_id: str) -> str | None:
+    row = conn.execute("SELECT cursor FROM sensor_sync WHERE device_id=?", (device_id,)).fetchone()
+    return row[0] if row else None
+
+# ================== MIRROR WRITES ==================
+def store_rows(conn: sqlite3.Connection, device_id: str, rows: list[dict]) -> int:
+    """
+    Insert readings not mirrored yet, merge them into the rollups, run them through the
+    Uhthoff episode detector and advance the device cursor. Readings below the compaction
+    horizon only go to the rollups. Caller commits.
+    """
+    if not rows:
+        return 0
+    rows = list({r["created_at"]: r for r in rows}.values())
+    baseline, compacted_to = conn.execute("SELECT baseline, compacted_to FROM sensor_sync WHERE device_id=?",
+                                          (device_id,)).fetchone() or (None, None)
+    keys = [r["created_at"] for r in rows]
+    seen = {k for (k,) in conn.execute("""SELECT created_at FROM sensor_readings
+                                          WHERE device_id=? AND created_at BETWEEN ? AND ?""",
+                                       (device_id, min(keys), max(keys)))}
+    new = [r for r in rows if r["created_at"] not in seen]   # each reading is counted in the rollups once
+    if new:
+        t_ms = epoch_ms([r["created_at"] for r in new])
+        core = np.array([r.get("core_c") for r in new], dtype=np.float64)
+        peri = np.array([r.get("peripheral_c") for r in new], dtype=np.float64)
+        prev = conn.execute("SELECT MAX(t_ms) FROM sensor_readings WHERE device_id=? AND t_ms < ?",
+                            (device_id, int(t_ms.min()))).fetchone()[0]
+        keep = t_ms >= (compacted_to or 0)
+        conn.executemany("""INSERT INTO sensor_readings(device_id, created_at, core_c, peripheral_c, t_ms)
+                            VALUES (?,?,?,?,?)""",
+                         [(device_id, r["created_at"], r.get("core_c"), r.get("peripheral_c"), t)
+                          for r, t, k in zip(new, t_ms.tolist(), keep.tolist()) if k])
+        tanzim_rollup.merge(conn, device_id, t_ms, core, peri, prev_ms=prev, baseline=baseline)
+        tanzim_episodes.consume(conn, device_id, t_ms, core, baseline)
+    conn.execute("""INSERT INTO sensor_sync(device_id, cursor, synced_at, rows_pulled) VALUES (?,?,?,?)
+                    ON CONFLICT(device_id) DO UPDATE SET
+                      cursor=MAX(COALESCE(sensor_sync.cursor, ''), excluded.cursor),
+                      synced_at=excluded.synced_at,
+                      rows_pulled=sensor_sync.rows_pulled + excluded.rows_pulled""",
+                 (device_id, max(keys), time.time(), len(new)))
+    return len(new)
+
+def set_baseline(conn: sqlite3.Connection, device_id: str, baseline: float):
+    """Baseline used for new readings' time-above-threshold in the rollups. Caller commits."""
+    conn.execute("""INSERT INTO sensor_sync(device_id, baseline) VALUES (?,?)
+                    ON CONFLICT(device_id) DO UPDATE SET baseline=excluded.baseline""", (device_id, baseline))
+
+# ================== SYNC ==================
+class SensorSync:
+    """
+    Pulls new `sensor_readings` rows from Supabase into the mirror, one device at a time.
+
+    The first sync of a device takes the newest `initial_limit` rows; after that only rows
+    with created_at > cursor are requested, paging through any backlog in time order.
+    Syncs of one device are single-flight and at most one per `min_interval` seconds, so
+    any number of reruns and viewers cost one small REST call per interval.
+
+    With raw_retention_days set, raw readings older than that are compacted away (at most
+    once per compact_every seconds per device); the rollups keep their history.
+    """
+    def __init__(self, db, client, table: str = "sensor_readings", min_interval: float = 5.0,
+                 initial_limit: int = 240, page_size: int = 500, raw_retention_days: float | None = None,
+                 compact_every: float = 3600.0):
+        self.db = db                  # tanzim_db.ConnectionManager
+        self.client = client          # supabase Client
+        self.table = table
+        self.min_interval = min_interval
+        self.initial_limit = initial_limit
+        self.page_size = page_size
+        self.raw_retention_days = raw_retention_days
+        self.compact_every = compact_every
+        self._compacted: dict[str, float] = {}
+        self._baselines: dict[str, float] = {}
+        self._locks: dict[str, threading.Lock] = {}
+        self._last: dict[str, float] = {}
+        self._guard = threading.Lock()
+        self.listeners = []           # fn(device_id, rows oldest-first), called after each commit
+        self.stats = Counter()
+
+    def device_lock(self, device_id: str) -> threading.Lock:
+        """Held for every pull/store of the device; keeps its cursor moving in order."""
+        with self._guard:
+            return self._locks.setdefault(device_id, threading.Lock())
+
+    def _query(self, device_id: str):
+        return self.client.table(self.table).select(SELECT_COLUMNS).eq("device_id", device_id)
+
+    def _pull(self, device_id: str, cursor: str | None) -> list[dict]:
+        if cursor is None:
+            res = self._query(device_id).order("created_at", desc=True).limit(self.initial_limit).execute()
+            self.stats["requests"] += 1
+            return res.data or []
+        out = []
+        while True:
+            res = (self._query(device_id).gt("created_at", cursor)
+                   .order("created_at").limit(self.page_size).execute())
+            self.stats["requests"] += 1
+            rows = res.data or []
+            out.extend(rows)
+            if len(rows) < self.page_size:
+                return out
+            cursor = rows[-1]["created_at"]
+
+    def due(self, device_id: str) -> bool:
+        return time.monotonic() - self._last.get(device_id, float("-inf")) >= self.min_interval
+
+    def sync(self, device_id: str, force: bool = False) -> int:
+        """Bring one device's mirror up to date; returns the number of new readings stored."""
+        if not device_id:
+            return 0
+        if not force and not self.due(device_id):
+            self.stats["throttled"] += 1
+            return 0
+        with self.device_lock(device_id):
+            if not force and not self.due(device_id):
+                self.stats["throttled"] += 1
+                return 0       # another session synced while we waited
+            return self.pull(device_id)
+
+    def pull(self, device_id: str) -> int:
+        """Unthrottled cursor pull + store; the caller holds device_lock(device_id)."""
+        try:
+            rows = self._pull(device_id, get_cursor(self.db.reader(), device_id))
+            return self._store(device_id, rows)
+        finally:
+            self._last[device_id] = time.monotonic()   # failures back off for one interval too
+            self._maybe_compact(device_id)
+
+    def _maybe_compact(self, device_id: str):
+        if self.raw_retention_days is None:
+            return
+        now = time.monotonic()
+        if now - self._compacted.get(device_id, float("-inf")) < self.compact_every:
+            return
+        self._compacted[device_id] = now
+        with self.db.transaction() as conn:
+            self.stats["rows_compacted"] += tanzim_rollup.compact(conn, device_id, int(time.time() * 1000),
+                                                                  self.raw_retention_days)
+
+    def set_baseline(self, device_id: str, baseline: float):
+        """Threshold base for time-above in rollups; written only when it changes."""
+        if not device_id or self._baselines.get(device_id) == baseline:
+            return
+        with self.db.transaction() as conn:
+            set_baseline(conn, device_id, baseline)
+        self._baselines[device_id] = baseline
+
+    def _store(self, device_id: str, rows: list[dict], notify: bool = True) -> int:
+        with self.db.transaction() as conn:
+            added = store_rows(conn, device_id, rows)
+        self.stats["rows_received"] += len(rows)
+        self.stats["rows_added"] += added
+        if rows and notify:
+            rows = sorted(rows, key=lambda r: r["created_at"])
+            for fn in self.listeners:
+                fn(device_id, rows)
+        return added
+
+    def ensure_history(self, device_id: str, since_ms: int, page_size: int = 1000) -> int:
+        """
+        Make sure the mirror reaches back to since_ms, pulling the older rows once (paged,
+        oldest first) below what is already mirrored. Returns the number of rows added.
+        """
+        def have():
+            row = self.db.reader().execute("SELECT history_from FROM sensor_sync WHERE device_id=?",
+                                           (device_id,)).fetchone()
+            return row[0] if row else None
+        h = have()
+        if h is not None and h <= since_ms:
+            return 0
+        with self.device_lock(device_id):
+            h = have()
+            if h is not None and h <= since_ms:
+                return 0
+            if h is None:
+                row = self.db.reader().execute("SELECT MIN(t_ms) FROM sensor_readings WHERE device_id=?",
+                                               (device_id,)).fetchone()
+                h = row[0] if row and row[0] is not None else int(time.time() * 1000) + 1
+            iso = lambda ms: datetime.fromtimestamp(ms / 1000, tz=timezone.utc).isoformat()
+            lower, upper, added = iso(since_ms), iso(h), 0
+            first = True
+            while True:
+                q = self._query(device_id).lt("created_at", upper)
+                q = q.gte("created_at", lower) if first else q.gt("created_at", lower)
+                rows = q.order("created_at").limit(page_size).execute().data or []
+                self.stats["requests"] += 1
+                if rows:
+                    added += self._store(device_id, rows, notify=False)   # older than any ring
+                    lower, first = rows[-1]["created_at"], False
+                if len(rows) < page_size:
+                    break
+            with self.db.transaction() as conn:
+                conn.execute("""INSERT INTO sensor_sync(device_id, history_from) VALUES (?,?)
+                                ON CONFLICT(device_id) DO UPDATE SET history_from=excluded.history_from""",
+                             (device_id, since_ms))
+            return added
+
+    def ingest(self, device_id: str, rows: list[dict]) -> int:
+        """Store rows that arrived by push (realtime); same path as a pull, minus the request."""
+        with self.device_lock(device_id):
+            return self._store(device_id, rows)
+
+# ================== SENSOR SERIES ==================
+def epoch_ms(iso_values) -> np.ndarray:
+    """ISO-8601 strings (any offset) -> int64 UTC epoch milliseconds, vectorized."""
+    if len(iso_values) < 16:     # realtime appends: a few rows, pandas setup would dominate
+        dts = (datetime.fromisoformat(v) for v in iso_values)
+        return np.array([int((d if d.tzinfo else d.replace(tzinfo=timezone.utc)).timestamp() * 1000) for d in dts],
+                        dtype=np.int64)
+    # Supabase timestamps are UTC; NumPy parses offset-free ISO strings without pandas' per-value checks
+    naive = [v[:-6] if v.endswith("+00:00") else v[:-1] if v.endswith("Z") else None for v in iso_values]
+    if None not in naive:
+        return np.array(naive, dtype="datetime64[ms]").astype(np.int64)
+    return pd.to_datetime(pd.Series(iso_values), utc=True, format="ISO8601").dt.as_unit("ms").astype("int64").to_numpy()
+
+def _f32(values) -> np.ndarray:
+    return np.array([np.nan if v is None else v for v in values], dtype=np.float32)
+
+class GapStats(NamedTuple):
+    median_s: float           # typical spacing between readings
+    max_s: float              # longest silence
+    span_h: float             # first -> last reading
+    gaps: int                 # silences longer than 3x the median spacing
+
+class SensorSeries:
+    """
+    One device's readings as parallel columns, oldest first: int64 UTC epoch ms and
+    float32 values (NaN = missing). Slicing returns views, so a series cut from a shared
+    ring or a history read costs nothing to pass around.
+    """
+    __slots__ = ("t_ms", "core", "peripheral")
+
+    def __init__(self, t_ms: np.ndarray, core: np.ndarray, peripheral: np.ndarray):
+        self.t_ms, self.core, self.peripheral = t_ms, core, peripheral
+
+    @classmethod
+    def empty(cls) -> "SensorSeries":
+        return cls(np.empty(0, np.int64), np.empty(0, np.float32), np.empty(0, np.float32))
+
+    @classmethod
+    def from_rows(cls, rows: list[dict]) -> "SensorSeries":
+        """Supabase-shaped rows (created_at, core_c, peripheral_c), parsed in one pass."""
+        if not rows:
+            return cls.empty()
+        return cls(epoch_ms([r["created_at"] for r in rows]),
+                   _f32([r.get("core_c") for r in rows]), _f32([r.get("peripheral_c") for r in rows]))
+
+    def __len__(self) -> int:
+        return len(self.t_ms)
+
+    def __getitem__(self, key: slice) -> "SensorSeries":
+        return SensorSeries(self.t_ms[key], self.core[key], self.peripheral[key])
+
+    def between(self, since_ms: int, until_ms: int | None = None) -> "SensorSeries":
+        """Readings with since_ms <= t <= until_ms (binary search; views)."""
+        lo = int(np.searchsorted(self.t_ms, since_ms, side="left"))
+        hi = len(self) if until_ms is None else int(np.searchsorted(self.t_ms, until_ms, side="right"))
+        return self[lo:hi]
+
+    @property
+    def last_ms(self) -> int | None:
+        return int(self.t_ms[-1]) if len(self) else None
+
+    def times(self, tz=None) -> pd.DatetimeIndex:
+        """Timestamps as a tz-aware index (UTC, or converted to tz)."""
+        idx = pd.to_datetime(self.t_ms, unit="ms", utc=True)
+        return idx.tz_convert(tz) if tz is not None else idx
+
+    def gaps(self) -> GapStats | None:
+        if len(self) < 2:
+            return None
+        d = np.diff(self.t_ms) / 1000
+        med = float(np.median(d))
+        return GapStats(med, float(d.max()), float(self.t_ms[-1] - self.t_ms[0]) / 3_600_000,
+                        int((d > 3 * med).sum()))
+
+    def labels(self, tz, fmt: str = "%Y-%m-%d %H:%M:%S") -> pd.Index:
+        """Local wall-clock strings (formatting tz-naive times is much faster than tz-aware)."""
+        return self.times(tz).tz_localize(None).strftime(fmt)
+
+    def to_frame(self, tz=None) -> pd.DataFrame:
+        return pd.DataFrame({"time": self.times(tz), "core": self.core, "peripheral": self.peripheral})
+
+    def latest(self) -> dict | None:
+        if not len(self):
+            return None
+        nan_none = lambda v: None if np.isnan(v) else float(v)
+        at = datetime.fromtimestamp(int(self.t_ms[-1]) / 1000, tz=timezone.utc).isoformat()
+        return {"core": nan_none(self.core[-1]), "peripheral": nan_none(self.peripheral[-1]), "at": at}
+
+# ================== SHARED BUFFERS ==================
+class DeviceRing:
+    """
+    Fixed-capacity ring of one device's readings.
+
+    Every value is written twice, at i % cap and i % cap + cap, so the newest n <= cap
+    readings are always one contiguous slice and last(n) returns views, not copies. A view
+    of n readings is not touched by the next cap - n appends, which is what lets many
+    sessions render from it while the fetcher keeps appending.
+    """
+    def __init__(self, capacity: int = 4096):
+        self.capacity = capacity
+        self._t = np.zeros(2 * capacity, dtype=np.int64)
+        self._core = np.full(2 * capacity, np.nan, dtype=np.float32)
+        self._peri = np.full(2 * capacity, np.nan, dtype=np.float32)
+        for a in (self._t, self._core, self._peri):
+            a.flags.writeable = False
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return min(self._total, self.capacity)
+
+    @property
+    def version(self) -> int:
+        """Total readings ever appended; changes whenever new data lands."""
+        return self._total
+
+    @property
+    def last_ms(self) -> int | None:
+        return int(self._t[self._end() - 1]) if self._total else None
+
+    def _end(self) -> int:
+        return (self._total - 1) % self.capacity + self.capacity + 1
+
+    def extend(self, t_ms: np.ndarray, core: np.ndarray, peripheral: np.ndarray) -> int:
+        """Append readings (oldest first); anything not newer than the last reading is skipped."""
+        with self._lock:
+            if self._total:
+                keep = t_ms > self._t[self._end() - 1]
+                t_ms, core, peripheral = t_ms[keep], core[keep], peripheral[keep]
+            n = len(t_ms)
+            if n > self.capacity:
+                t_ms, core, peripheral = t_ms[-self.capacity:], core[-self.capacity:], peripheral[-self.capacity:]
+                self._total += n - self.capacity
+                n = self.capacity
+            pos = (self._total + np.arange(n)) % self.capacity
+            for arr, vals in ((self._t, t_ms), (self._core, core), (self._peri, peripheral)):
+                arr.flags.writeable = True
+                arr[pos] = vals
+                arr[pos + self.capacity] = vals
+                arr.flags.writeable = False
+            self._total += n
+            return n
+
+    def extend_series(self, s: "SensorSeries") -> int:
+        return self.extend(s.t_ms, s.core, s.peripheral)
+
+    def extend_rows(self, rows: list[dict]) -> int:
+        return self.extend_series(SensorSeries.from_rows(rows))
+
+    def last(self, n: int) -> SensorSeries:
+        with self._lock:
+            n = min(n, len(self))
+            end = self._end() if self._total else 0
+            return SensorSeries(self._t[end - n:end], self._core[end - n:end], self._peri[end - n:end])
+
+class DeviceBuffers:
+    """
+    One DeviceRing per device, shared by every session in the process and fed only by the
+    SensorSync listener, so parsing cost scales with devices, not with viewers.
+    """
+    def __init__(self, sync: SensorSync, capacity: int = 4096):
+        self.sync = sync
+        self.capacity = capacity
+        self._rings: dict[str, DeviceRing] = {}
+        self._guard = threading.Lock()
+        sync.listeners.append(self._on_rows)
+
+    def _on_rows(self, device_id: str, rows: list[dict]):
+        ring = self._rings.get(device_id)
+        if ring is not None:
+            ring.extend_rows(rows)
+
+    def ring(self, device_id: str) -> DeviceRing:
+        """The device's ring, seeded from the local mirror the first time it is asked for."""
+        ring = self._rings.get(device_id)
+        if ring is not None:
+            return ring
+        with self.sync.device_lock(device_id):     # no sync can commit between the seed read and registration
+            with self._guard:
+                ring = self._rings.get(device_id)
+                if ring is None:
+                    ring = DeviceRing(self.capacity)
+                    ring.extend_series(series(self.sync.db.reader(), device_id, self.capacity))
+                    self._rings[device_id] = ring
+        return ring
@@ -0,0 +1,517 @@
+# -*- coding: utf-8 -*-
+# TANZIM MS — OpenWeather client (no Streamlit imports)
+# -----------------------------------------------------------------------------------------
+# One WeatherClient per process: a pooled keep-alive session shared by every call, current
+# conditions and forecast fetched concurrently, transient failures retried with jittered
+# backoff, and per-endpoint latency kept for metrics(). Identical concurrent requests share
+# one HTTP call (SingleFlight) and every attempt spends a token from the process-wide quota
+# (TokenBucket); over quota the last answer to the same request is served instead. WeatherStore
+# puts a persistent stale-while-revalidate cache in front of it, shared by the app and the
+# alert worker.
+
+import random, sqlite3, threading, time
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+BASE_URL = "https://api.openweathermap.org/data/2.5/"
+GEO_URL = "https://api.openweathermap.org/geo/1.0/"
+FORECAST_ITEMS = 40     # 3-hour steps: the whole 5-day forecast (the planner searches all of it)
+PEAK_ITEMS = 16         # peak_hours looks at the next 48 h
+RETRY_STATUS = {429, 500, 502, 503, 504}
+TIMEOUTS = {"weather": 6.0, "forecast": 8.0, "geocode": 6.0}
+LAST_KEEP = 512         # answers remembered per client for serving over quota
+
+def parse_current(j: dict) -> dict:
+    return {"temp": float(j["main"]["temp"]), "feels_like": float(j["main"]["feels_like"]),
+            "humidity": float(j["main"]["humidity"]), "desc": j["weather"][0]["description"]}
+
+def parse_forecast(j: dict, items: int = FORECAST_ITEMS) -> list[dict]:
+    return [{
+        "dt": it["dt"],
+        "time": it["dt_txt"],
+        "temp": float(it["main"]["temp"]),
+        "feels_like": float(it["main"]["feels_like"]),
+        "humidity": float(it["main"]["humidity"]),
+        "desc": it["weather"][0]["description"]
+    } for it in j.get("list", [])[:items]]
+
+def peak_hours(forecast: list[dict], items: int = PEAK_ITEMS) -> list[str]:
+    top = sorted(forecast[:items], key=lambda x: x["feels_like"], reverse=True)[:4]
+    return [f'{t["time"][5:16]} (~{round(t["feels_like"])}°C, {int(t["humidity"])}%)' for t in top]
+
+class RateLimited(RuntimeError):
+    """The local OpenWeather quota is spent and there is no earlier answer to serve."""
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, at most `burst` saved up."""
+    def __init__(self, rate: float, burst: float):
+        self.rate, self.burst = rate, burst
+        self._tokens = burst
+        self._t = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def per_minute(cls, calls: float, burst: float | None = None) -> "TokenBucket":
+        return cls(calls / 60.0, burst if burst is not None else max(1.0, calls / 6))   # ~10 s of quota
+
+    def try_acquire(self, n: float = 1.0) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._t) * self.rate)
+            self._t = now
+            if self._tokens < n:
+                return False
+            self._tokens -= n
+            return True
+
+class SingleFlight:
+    """Concurrent do() calls with the same key share one run of fn: its result or its exception."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict = {}
+
+    def do(self, key, fn) -> tuple[object, bool]:
+        """(result, shared); shared is True for callers that joined another caller's run."""
+        with self._lock:
+            fut = self._calls.get(key)
+            leader = fut is None
+            if leader:
+                fut = self._calls[key] = Future()
+        if not leader:
+            return fut.result(), True
+        try:
+            fut.set_result(fn())
+        except BaseException as e:
+            fut.set_exception(e)
+        finally:
+            with self._lock:
+                del self._calls[key]
+        return fut.result(), False
+
+class WeatherClient:
+    """
+    Pooled, retrying OpenWeather client; thread-safe. Connection errors, timeouts and
+    429/5xx answers are retried up to `retries` times, sleeping a random time up to
+    backoff * 2**attempt (capped, and never less than a 429's Retry-After). Other HTTP
+    errors raise at once. Identical requests in flight at the same time are made once;
+    with a `limiter` every attempt needs a token, and a request that gets none (or a final
+    429) is answered with its last successful response, else RateLimited.
+    """
+    def __init__(self, api_key: str, base_url: str = BASE_URL, geo_url: str = GEO_URL, pool_size: int = 16,
+                 retries: int = 2, backoff: float = 0.25, max_backoff: float = 2.0, timeouts: dict | None = None,
+                 limiter: TokenBucket | None = None, single_flight: bool = True):
+        self.api_key = api_key
+        self.limiter = limiter
+        self._flight = SingleFlight() if single_flight else None
+        self._last: OrderedDict = OrderedDict()
+        self.base_url, self.geo_url = base_url, geo_url
+        self.retries, self.backoff, self.max_backoff = retries, backoff, max_backoff
+        self.timeouts = {**TIMEOUTS, **(timeouts or {})}
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._pool = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="tanzim-weather")
+        self._lock = threading.Lock()
+        self._latency: dict[str, deque] = {}
+        self.stats = Counter()
+
+    def _record(self, endpoint: str, ms: float, ok: bool, retries: int):
+        with self._lock:
+            self._latency.setdefault(endpoint, deque(maxlen=1000)).append(ms)
+            self.stats[f"{endpoint}.calls"] += 1
+            self.stats[f"{endpoint}.retries"] += retries
+            if not ok:
+                self.stats[f"{endpoint}.errors"] += 1
+
+    def _get(self, endpoint: str, url: str, params: dict, stale_ok: bool = True):
+        key = (url, tuple(sorted(params.items())))
+        if self._flight is None:
+            return self._call(endpoint, url, params, key, stale_ok)
+        out, shared = self._flight.do((key, stale_ok), lambda: self._call(endpoint, url, params, key, stale_ok))
+        if shared:
+            with self._lock:
+                self.stats[f"{endpoint}.coalesced"] += 1
+        return out
+
+    def _over_quota(self, endpoint: str, key, stale_ok: bool, t0: float, attempt: int, exc: Exception):
+        with self._lock:
+            last = self._last.get(key) if stale_ok else None
+            self.stats[f"{endpoint}.throttled"] += 1
+        self._record(endpoint, (time.perf_counter() - t0) * 1000, last is not None, attempt)
+        if last is None:
+            raise exc
+        return last
+
+    def _call(self, endpoint: str, url: str, params: dict, key, stale_ok: bool):
+        t0 = time.perf_counter()
+        attempt = 0
+        while True:
+            if self.limiter is not None and not self.limiter.try_acquire():
+                return self._over_quota(endpoint, key, stale_ok, t0, attempt, RateLimited(f"OpenWeather quota spent ({endpoint})"))
+            try:
+                r = self.session.get(url, params={**params, "appid": self.api_key}, timeout=self.timeouts[endpoint])
+                if r.status_code == 429 and attempt >= self.retries:
+                    return self._over_quota(endpoint, key, stale_ok, t0, attempt, requests.HTTPError(f"429 for {url}", response=r))
+                if r.status_code not in RETRY_STATUS or attempt >= self.retries:
+                    r.raise_for_status()
+                    out = r.json()
+                    self._record(endpoint, (time.perf_counter() - t0) * 1000, True, attempt)
+                    with self._lock:
+                        self._last[key] = out
+                        self._last.move_to_end(key)
+                        if len(self._last) > LAST_KEEP:
+                            self._last.popitem(last=False)
+                    return out
+                wait = float(r.headers.get("Retry-After") or 0) if r.status_code == 429 else 0.0
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.retries:
+                    self._record(endpoint, (time.perf_counter() - t0) * 1000, False, attempt)
+                    raise
+                wait = 0.0
+            except Exception:
+                self._record(endpoint, (time.perf_counter() - t0) * 1000, False, attempt)
+                raise
+            time.sleep(max(wait, random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))))
+            attempt += 1
+
+    def current(self, city: str | None = None, lat: float | None = None, lon: float | None = None,
+                stale_ok: bool = True) -> dict:
+        where = {"q": city} if city is not None else {"lat": lat, "lon": lon}
+        return parse_current(self._get("weather", self.base_url + "weather",
+                                       {**where, "units": "metric", "lang": "en"}, stale_ok))
+
+    def forecast(self, city: str, stale_ok: bool = True) -> list[dict]:
+        return parse_forecast(self._get("forecast", self.base_url + "forecast",
+                                        {"q": city, "units": "metric", "lang": "en"}, stale_ok))
+
+    def weather(self, city: str, forecast: bool = True, stale_ok: bool = True) -> dict:
+        """
+        Current conditions + the 5-day forecast and the four hottest slots of the next 48 h,
+        fetched in parallel.
+        stale_ok=False raises over quota instead of serving the last answer (WeatherStore keeps
+        its own, correctly dated).
+        """
+        fut = self._pool.submit(self.forecast, city, stale_ok) if forecast else None
+        try:
+            out = self.current(city, stale_ok=stale_ok)
+        except Exception:
+            if fut is not None:
+                fut.cancel()
+            raise
+        fc = fut.result() if fut is not None else []
+        return {**out, "forecast": fc, "peak_hours": peak_hours(fc)}
+
+    def geocode(self, q: str) -> tuple[str, float | None, float | None]:
+        arr = self._get("geocode", self.geo_url + "direct", {"q": q, "limit": 1})
+        if not arr:
+            return q, None, None
+        it = arr[0]
+        return it.get("name") or q, it.get("lat"), it.get("lon")
+
+    def metrics(self) -> dict:
+        """Per endpoint: calls, errors, retries, coalesced/throttled requests and latency percentiles (ms, incl. retries)."""
+        with self._lock:
+            out = {}
+            for ep, lat in self._latency.items():
+                a = np.fromiter(lat, dtype=np.float64)
+                out[ep] = {"calls": self.stats[f"{ep}.calls"], "errors": self.stats[f"{ep}.errors"],
+                           "retries": self.stats[f"{ep}.retries"], "coalesced": self.stats[f"{ep}.coalesced"],
+                           "throttled": self.stats[f"{ep}.throttled"], "p50_ms": float(np.percentile(a, 50)),
+                           "p95_ms": float(np.percentile(a, 95)), "max_ms": float(a.max())}
+            return out
+
+    def close(self):
+        self._pool.shutdown(wait=False)
+        self.session.close()
+
+# ================== STORE ==================
+STORE_SQL = (
+    """CREATE TABLE IF NOT EXISTS weather_obs(
+        city TEXT NOT NULL,
+        fetched_ms INTEGER NOT NULL,
+        temp REAL, feels_like REAL, humidity REAL, description TEXT,
+        PRIMARY KEY (city, fetched_ms)
+    ) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS weather_forecast(
+        city TEXT NOT NULL,
+        fetched_ms INTEGER NOT NULL,     -- the observation fetch this forecast came with
+        dt INTEGER NOT NULL,             -- forecast slot, epoch s
+        time TEXT, temp REAL, feels_like REAL, humidity REAL, description TEXT,
+        PRIMARY KEY (city, fetched_ms, dt)
+    ) WITHOUT ROWID""",
+)
+FORECAST_KEEP_DAYS = 30      # observations are kept for good; forecast issues this long
+LOADING = "loading"          # WeatherStore.get(wait=False) error while a first fetch runs
+
+def create_tables(conn: sqlite3.Connection):
+    for ddl in STORE_SQL:
+        conn.execute(ddl)
+
+def save(conn: sqlite3.Connection, city: str, fetched_ms: int, data: dict):
+    """One fetch: the observation + the forecast that came with it. Caller commits."""
+    conn.execute("""INSERT OR REPLACE INTO weather_obs(city, fetched_ms, temp, feels_like, humidity, description)
+                    VALUES (?,?,?,?,?,?)""",
+                 (city, fetched_ms, data["temp"], data["feels_like"], data["humidity"], data["desc"]))
+    conn.executemany("""INSERT OR REPLACE INTO weather_forecast(city, fetched_ms, dt, time, temp, feels_like,
+                                                                humidity, description) VALUES (?,?,?,?,?,?,?,?)""",
+                     [(city, fetched_ms, f["dt"], f["time"], f["temp"], f["feels_like"], f["humidity"], f["desc"])
+                      for f in data.get("forecast") or []])
+    conn.execute("DELETE FROM weather_forecast WHERE city=? AND fetched_ms < ?",
+                 (city, fetched_ms - FORECAST_KEEP_DAYS * 86_400_000))
+
+def latest(conn: sqlite3.Connection, city: str) -> tuple[dict | None, int | None]:
+    """(weather dict as WeatherClient.weather returns it, fetched_ms) of the newest fetch, or (None, None)."""
+    row = conn.execute("""SELECT fetched_ms, temp, feels_like, humidity, description FROM weather_obs
+                          WHERE city=? ORDER BY fetched_ms DESC LIMIT 1""", (city,)).fetchone()
+    if not row:
+        return None, None
+    fetched, temp, fl, hum, desc = row
+    fc = [{"dt": dt, "time": t, "temp": tp, "feels_like": f, "humidity": h, "desc": d}
+          for dt, t, tp, f, h, d in conn.execute("""SELECT dt, time, temp, feels_like, humidity, description
+                                                    FROM weather_forecast WHERE city=? AND fetched_ms=?
+                                                    ORDER BY dt""", (city, fetched))]
+    return {"temp": temp, "feels_like": fl, "humidity": hum, "desc": desc,
+            "forecast": fc, "peak_hours": peak_hours(fc)}, fetched
+
+def history(conn: sqlite3.Connection, city: str, since_ms: int = 0, until_ms: int | None = None):
+    """(t_ms, feels_like, humidity) arrays of every stored observation in range, oldest first."""
+    rows = conn.execute("""SELECT fetched_ms, feels_like, humidity FROM weather_obs
+                           WHERE city=? AND fetched_ms BETWEEN ? AND ? ORDER BY fetched_ms""",
+                        (city, since_ms, until_ms if until_ms is not None else 2**62)).fetchall()
+    a = np.array(rows, dtype=np.float64).reshape(-1, 3)
+    return a[:, 0].astype(np.int64), a[:, 1], a[:, 2]
+
+def aligned(conn: sqlite3.Connection, city: str, t_ms, max_gap_ms: int = 3 * 3_600_000):
+    """
+    (feels_like, humidity) of the stored observations at each t_ms: interpolated between
+    two observations at most max_gap_ms apart, else the previous one if no older than
+    max_gap_ms, else NaN (no history covers that time).
+    """
+    t = np.asarray(t_ms, dtype=np.int64)
+    if not len(t):
+        return np.empty(0), np.empty(0)
+    wt, fl, hum = history(conn, city, int(t.min()) - max_gap_ms, int(t.max()) + max_gap_ms)
+    if not len(wt):
+        return np.full(len(t), np.nan), np.full(len(t), np.nan)
+    j = np.searchsorted(wt, t, side="right") - 1          # newest observation not after t
+    prev, nxt = np.clip(j, 0, len(wt) - 1), np.clip(j + 1, 0, len(wt) - 1)
+    between = (j >= 0) & (j + 1 < len(wt)) & (wt[nxt] - wt[prev] <= max_gap_ms)
+    held = (j >= 0) & (t - wt[prev] <= max_gap_ms)
+    pick = lambda a: np.where(between, np.interp(t, wt, a), np.where(held, a[prev], np.nan))
+    return pick(fl), pick(hum)
+
+class WeatherStore:
+    """
+    Stale-while-revalidate weather per city, persisted in SQLite and shared by every
+    session and process on the database (the app, the alert worker).
+
+    get() answers from memory, or from the newest stored fetch after a restart. Past `ttl`
+    the stale reading is returned at once and one background refresh per city is started;
+    only a city never fetched by anyone waits for the network. Every fetch is stored, so
+    the observation history can be joined against later. A city with nothing stored whose
+    fetch failed reports that error and is retried with exponential backoff (from
+    `retry_after` seconds, capped at `ttl`) instead of on every get. `fetch_fn(city)`
+    replaces the client in benchmarks.
+    """
+    def __init__(self, db, client: WeatherClient | None, ttl: float = 600.0, fetch_fn=None, workers: int = 2,
+                 retry_after: float = 15.0):
+        self.db = db                    # tanzim_db.ConnectionManager
+        self.client = client
+        self.ttl = ttl
+        self.fetch_fn = fetch_fn
+        self._mem: dict[str, tuple[dict, float]] = {}
+        self._inflight: set[str] = set()
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tanzim-weather-refresh")
+        self.retry_after = retry_after
+        self.errors: dict[str, str] = {}
+        self._retry: dict[str, tuple[float, int]] = {}   # city -> (next attempt epoch s, failures in a row)
+        self.stats = Counter()
+
+    def _configured(self) -> bool:
+        return self.fetch_fn is not None or bool(self.client and self.client.api_key)
+
+    def _fetch(self, city: str) -> dict:
+        if self.fetch_fn is not None:
+            return self.fetch_fn(city)
+        if not self._configured():
+            raise RuntimeError("Missing OPENWEATHER_API_KEY")
+        return self.client.weather(city, stale_ok=False)
+
+    def refresh(self, city: str) -> tuple[dict | None, str | None, float | None]:
+        """Fetch now, store, and return (weather, error, fetched_at epoch s); errors keep the old reading."""
+        return self._flight.do(city, lambda: self._refresh(city))[0]   # concurrent refreshes share one fetch
+
+    def _refresh(self, city: str):
+        try:
+            data = self._fetch(city)
+        except Exception as e:
+            self.stats["errors"] += 1
+            self.errors[city] = str(e)
+            with self._lock:
+                n = self._retry.get(city, (0.0, 0))[1] + 1
+                self._retry[city] = (time.time() + min(self.ttl, self.retry_after * 2 ** (n - 1)), n)
+            rec = self._mem.get(city)
+            return (rec[0], None, rec[1]) if rec else (None, str(e), None)
+        now_ms = int(time.time() * 1000)
+        with self.db.transaction() as conn:
+            save(conn, city, now_ms, data)
+        self.stats["fetches"] += 1
+        self.errors.pop(city, None)
+        with self._lock:
+            self._retry.pop(city, None)
+            self._mem[city] = (data, now_ms / 1000)
+        return data, None, now_ms / 1000
+
+    def _claim(self, city: str) -> bool:
+        with self._lock:
+            if city in self._inflight:
+                return False
+            self._inflight.add(city)
+            return True
+
+    def _release(self, city: str):
+        with self._lock:
+            self._inflight.discard(city)
+
+    def _revalidate(self, city: str):
+        try:
+            self.refresh(city)
+        finally:
+            self._release(city)
+
+    def revalidate(self, city: str) -> bool:
+        """Start a background refresh unless one is running; True if this call started it."""
+        if not self._claim(city):
+            return False
+        self._pool.submit(self._revalidate, city)
+        return True
+
+    def refreshing(self, city: str) -> bool:
+        return city in self._inflight
+
+    def fetched_at(self, city: str) -> float | None:
+        """Epoch s of the newest reading of the city in memory or in SQLite."""
+        rec = self._mem.get(city)
+        if rec is None or time.time() - rec[1] > self.ttl:
+            rec = self._load(city) or rec
+        return rec[1] if rec else None
+
+    def _load(self, city: str):
+        data, fetched_ms = latest(self.db.reader(), city)
+        if data is None:
+            return None
+        rec = (data, fetched_ms / 1000)
+        with self._lock:
+            cur = self._mem.get(city)
+            if cur is None or cur[1] < rec[1]:
+                self._mem[city] = rec
+            return self._mem[city]
+
+    def get(self, city: str, wait: bool = True) -> tuple[dict | None, str | None, float | None]:
+        """
+        (weather, error, fetched_at epoch s); stale data is served while a refresh runs. A
+        city with nothing stored is fetched inline, or with wait=False answered with
+        (None, LOADING, None) while it loads in the background. If its last fetch failed,
+        that error is returned and the fetch is only retried once its backoff has passed.
+        """
+        now = time.time()
+        rec = self._mem.get(city)
+        if rec is None or now - rec[1] > self.ttl:
+            rec = self._load(city) or rec            # another process may have fetched it already
+        if rec is None:
+            self.stats["cold"] += 1
+            err = self.errors.get(city)
+            if err is not None and now < self._retry.get(city, (0.0, 0))[0]:
+                self.stats["backoff"] += 1
+                return None, err, None
+            if wait or not self._configured():
+                return self.refresh(city)            # without an API key this fails at once
+            self.revalidate(city)
+            return None, err or LOADING, None
+        if now - rec[1] <= self.ttl:
+            self.stats["fresh"] += 1
+            return rec[0], None, rec[1]
+        self.stats["stale"] += 1
+        self.revalidate(city)
+        return rec[0], None, rec[1]
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+class WeatherPrefetcher:
+    """
+    Background thread keeping a WeatherStore warm. Every round it refreshes each city
+    whose newest stored reading (by anyone: other sessions, processes, the alert worker)
+    is older than `refresh_age` (by default: would go stale before the next round),
+    spacing the fetches evenly over `interval` seconds and never closer than the quota
+    allows (a refresh is two calls: current + forecast). A city a page is already
+    revalidating is left to that refresh.
+    `cities_fn()` is re-read each round, so new home cities join without a restart.
+    """
+    CALLS_PER_REFRESH = 2
+
+    def __init__(self, store: WeatherStore, cities_fn, interval: float | None = None,
+                 calls_per_min: float = 60.0, refresh_age: float | None = None):
+        self.store = store
+        self.cities_fn = cities_fn
+        self.interval = interval if interval is not None else store.ttl * 0.8
+        self.refresh_age = refresh_age if refresh_age is not None else max(0.0, store.ttl - self.interval)
+        self.min_gap = 60.0 * self.CALLS_PER_REFRESH / calls_per_min
+        self.stats = Counter()
+        self.last_round: dict = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="tanzim-weather-prefetch", daemon=True)
+        self._thread.start()
+
+    def _round(self):
+        t0 = time.monotonic()
+        cities = list(dict.fromkeys(c for c in self.cities_fn() if c))
+        ages = {c: self.store.fetched_at(c) for c in cities}
+        due = sorted((c for c in cities if ages[c] is None or time.time() - ages[c] >= self.refresh_age),
+                     key=lambda c: ages[c] or 0.0)       # never-fetched first, then oldest
+        self.stats["skipped"] += len(cities) - len(due)
+        gap = max(self.min_gap, self.interval / max(len(cities), 1))
+        fetched = 0
+        for city in due:
+            if self._stop.is_set():
+                return
+            if not self.store._claim(city):
+                self.stats["inflight"] += 1
+                continue
+            done = self.store.fetched_at(city)         # a page may have refreshed it since the round began
+            if done is not None and time.time() - done < self.refresh_age:
+                self.store._release(city)
+                self.stats["skipped"] += 1
+                continue
+            s = time.monotonic()
+            try:
+                self.store.refresh(city)
+            finally:
+                self.store._release(city)
+            fetched += 1
+            self.stats["errors" if city in self.store.errors else "refreshed"] += 1
+            # cold cities go at the quota pace; the rest are spread over the interval
+            self._stop.wait(max(0.0, (self.min_gap if ages[city] is None else gap) - (time.monotonic() - s)))
+        self.last_round = {"cities": len(cities), "fetched": fetched, "seconds": time.monotonic() - t0}
+        self.stats["rounds"] += 1
+
+    def _run(self):
+        while not self._stop.is_set():
+            t0 = time.monotonic()
+            try:
+                self._round()
+            except Exception as e:                     # keep prefetching; the store serves what it has
+                self.stats["round_errors"] += 1
+                self.last_round = {"error": str(e)}
+            self._stop.wait(max(1.0, self.interval - (time.monotonic() - t0)))
+
+    def close(self, timeout: float = 5.0):
+        self._stop.set()
+        self._thread.join(timeout)
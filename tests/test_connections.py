@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+"""tanzim_db.ConnectionManager under many concurrent sessions (the stress_connections workload)."""
+import os
+
+import tanzim_db, tanzim_journal
+from benchmarks.stress_connections import _run, worker_pool
+
+def test_concurrent_sessions_lose_nothing(tmp_path):
+    mgr = tanzim_db.ConnectionManager(os.path.join(tmp_path, "pool.db"))
+    try:
+        out, _ = _run(worker_pool, mgr, 24, 120)
+        conn = mgr.reader()
+        assert sum(v[1] for v in out.values()) == 0, "operations raised sqlite3 errors"
+        assert sum(v[2] for v in out.values()) == 0, "a thread missed its own committed write"
+        assert conn.execute("SELECT COUNT(*) FROM journal WHERE date = '9999-rolled-back'").fetchone()[0] == 0
+        assert conn.execute("SELECT COUNT(*) FROM journal_symptoms "
+                            "WHERE journal_id NOT IN (SELECT id FROM journal)").fetchone()[0] == 0
+        for tid, (_, _, _, written) in out.items():
+            assert tanzim_journal.count_entries(conn, f"user{tid}") == written
+    finally:
+        mgr.close()
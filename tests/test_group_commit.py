@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+"""tanzim_db.GroupCommitWriter: read-your-writes by sequence number and the commit latency bound."""
+import os
+
+import tanzim_db, tanzim_journal
+from benchmarks.bench_group_commit import _entry
+
+def test_wait_seq_sees_own_writes(tmp_path):
+    mgr = tanzim_db.ConnectionManager(os.path.join(tmp_path, "gc.db"))
+    wb = tanzim_db.GroupCommitWriter(mgr, max_delay_ms=200)
+    try:
+        seqs = [wb.submit("u", tanzim_journal.insert_entry, "u", f"2024-06-01T00:{i:06d}", _entry(i))
+                for i in range(20)]
+        assert wb.wait_seq(seqs[-1])
+        assert all(wb.committed(s) for s in seqs)
+        assert tanzim_journal.count_entries(mgr.reader(), "u") == 20
+        assert wb.committed(seqs[-1]) and wb.wait_seq(seqs[-1], timeout=0)   # nothing pending: no wait
+    finally:
+        wb.close()
+        mgr.close()
+
+def test_commit_latency_stays_under_max_delay(tmp_path):
+    mgr = tanzim_db.ConnectionManager(os.path.join(tmp_path, "gc.db"))
+    wb = tanzim_db.GroupCommitWriter(mgr, max_delay_ms=100)
+    try:
+        for i in range(400):
+            wb.submit("u", tanzim_journal.insert_entry, "u", f"2024-06-01T00:{i:06d}", _entry(i))
+        assert wb.flush(10)
+        assert wb.stats["failed"] == 0
+        assert wb.stats["late_rows"] == 0 and wb.stats["max_latency_ms"] <= 100
+    finally:
+        wb.close()
+        mgr.close()
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""tanzim_weather.WeatherClient against the local OpenWeather stand-in: retries, giving up, concurrency, metrics."""
+import time
+
+import pytest
+import requests
+
+import tanzim_weather
+from benchmarks.openweather_standin import StandIn
+
+@pytest.fixture(scope="module")
+def srv():
+    s = StandIn(latency_ms=100, slow_s=0.6)
+    yield s
+    s.close()
+
+@pytest.fixture
+def client(srv):
+    while srv.inflight:                                 # let requests the last test timed out on finish
+        time.sleep(0.01)
+    srv.reset(0.0)
+    c = tanzim_weather.WeatherClient("k", base_url=srv.base, geo_url=srv.geo, retries=2, backoff=0.01,
+                                     timeouts={"weather": 0.3, "forecast": 0.3, "geocode": 0.3})
+    yield c
+    c.close()
+
+@pytest.mark.parametrize("mode", ["503", "drop", "slow"])
+def test_retries_5xx_drops_and_timeouts(srv, client, mode):
+    srv.fail_next("weather", mode, mode)
+    out = client.current("Dubai,AE")
+    assert out["feels_like"] is not None
+    assert srv.by_endpoint["weather"] == 3
+    m = client.metrics()["weather"]
+    assert (m["calls"], m["retries"], m["errors"]) == (1, 2, 0)
+
+@pytest.mark.parametrize("mode, exc", [("503", requests.HTTPError), ("drop", requests.ConnectionError),
+                                       ("slow", requests.Timeout)])
+def test_gives_up_after_max_attempts(srv, client, mode, exc):
+    srv.fail_next("weather", mode, mode, mode, mode)
+    with pytest.raises(exc):
+        client.current("Dubai,AE")
+    assert srv.by_endpoint["weather"] == 3             # first try + 2 retries, then no more
+    m = client.metrics()["weather"]
+    assert (m["calls"], m["retries"], m["errors"]) == (1, 2, 1)
+
+def test_client_errors_are_not_retried(srv):
+    srv.reset(0.0)
+    bad = tanzim_weather.WeatherClient("", base_url=srv.base, geo_url=srv.geo, backoff=0.01)
+    try:
+        with pytest.raises(requests.HTTPError):
+            bad.current("Dubai,AE")
+        assert srv.by_endpoint["weather"] == 1
+        assert bad.metrics()["weather"]["retries"] == 0
+    finally:
+        bad.close()
+
+def test_current_and_forecast_in_flight_together(srv, client):
+    t = time.perf_counter()
+    w = client.weather("Dubai,AE")
+    elapsed = time.perf_counter() - t
+    assert len(w["forecast"]) == tanzim_weather.FORECAST_ITEMS
+    assert srv.by_endpoint["weather"] == srv.by_endpoint["forecast"] == 1
+    assert srv.max_inflight == 2
+    assert elapsed < 2 * srv.latency                   # overlapped, not back to back
+
+def test_latency_metrics_cover_retries(srv, client):
+    client.current("Dubai,AE")
+    srv.fail_next("weather", "503")
+    client.current("Doha,QA")
+    m = client.metrics()["weather"]
+    assert m["calls"] == 2 and m["retries"] == 1
+    assert m["p50_ms"] >= srv.latency * 1000
+    assert m["max_ms"] >= 2 * srv.latency * 1000       # the retried call's two round trips
+    assert m["p50_ms"] <= m["p95_ms"] <= m["max_ms"]
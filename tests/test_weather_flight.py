@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""Single-flight coalescing and the shared OpenWeather quota (tanzim_weather, bench_weather_flight)."""
+import threading
+
+import pytest
+
+import tanzim_weather
+from benchmarks import bench_weather_flight
+from benchmarks.openweather_standin import StandIn
+
+@pytest.fixture(scope="module")
+def srv():
+    s = StandIn(latency_ms=80)
+    yield s
+    s.close()
+
+def test_single_flight_runs_once_per_flight():
+    flight, release, started, calls = tanzim_weather.SingleFlight(), threading.Event(), threading.Event(), []
+
+    def fetch():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {"feels_like": 40.0}
+
+    results, lock = [], threading.Lock()
+
+    def caller():
+        out = flight.do("Dubai,AE", fetch)
+        with lock:
+            results.append(out)
+
+    threads = [threading.Thread(target=caller) for _ in range(51)]
+    threads[0].start()
+    assert started.wait(5)
+    for t in threads[1:]:                              # all arrive while the leader's fetch is in flight
+        t.start()
+    threading.Event().wait(0.2)
+    release.set()
+    for t in threads:
+        t.join(5)
+    assert len(calls) == 1
+    assert len(results) == 51 and sum(shared for _, shared in results) == 50
+    assert all(r == {"feels_like": 40.0} for r, _ in results)
+    assert flight.do("Dubai,AE", fetch) == ({"feels_like": 40.0}, False) and len(calls) == 2   # next flight
+
+def test_errors_reach_the_caller():
+    def fail():
+        raise RuntimeError("503")
+    flight = tanzim_weather.SingleFlight()
+    with pytest.raises(RuntimeError):
+        flight.do("x", fail)
+    assert not flight._calls                            # the failed flight is over; the next call retries
+
+def test_over_quota_serves_the_cached_answer(srv):
+    srv.reset(0.0)
+    client = tanzim_weather.WeatherClient("k", base_url=srv.base, geo_url=srv.geo,
+                                          limiter=tanzim_weather.TokenBucket(rate=0.0, burst=1))
+    try:
+        first = client.current("Dubai,AE")
+        assert client.current("Dubai,AE") == first          # no token left: cached, no error
+        with pytest.raises(tanzim_weather.RateLimited):
+            client.current("Doha,QA")                        # nothing cached to serve
+        with pytest.raises(tanzim_weather.RateLimited):
+            client.current("Dubai,AE", stale_ok=False)
+        assert srv.requests == 1
+    finally:
+        client.close()
+
+def test_load_stampede_store_and_quota(srv):
+    bench_weather_flight.stampede(srv, 60)
+    bench_weather_flight.store_refresh(srv, 60)
+    bench_weather_flight.quota(srv, 60, 60, 3, 20)
+
+def test_alert_worker_client_falls_back_to_cached_over_quota(srv):
+    import alert_worker
+    srv.reset(0.0)
+    c = alert_worker.weather_client({"OPENWEATHER_API_KEY": "k", "OPENWEATHER_CALLS_PER_MIN": "0.001"})
+    c.base_url, c.geo_url = srv.base, srv.geo
+    try:
+        first = c.current("Dubai,AE")
+        assert c.current("Dubai,AE") == first           # quota spent: the cached answer, no error
+        assert srv.by_endpoint["weather"] == 1
+    finally:
+        c.close()